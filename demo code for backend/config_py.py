@@ -1,11 +1,23 @@
 # config.py
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # Firebase
     FIREBASE_CREDENTIALS_PATH: str = "serviceAccountKey.json"
-    FIREBASE_PROJECT_ID: str
+    FIREBASE_PROJECT_ID: str = ""
+    
+    # Plant topology JSON (ovens, buffers, conveyors, routes); empty = built-in plant
+    PLANT_TOPOLOGY_PATH: str = ""
+    
+    # Storage startup: "eager" (connect before serving), "background"
+    # (serve immediately, connect in background), "lazy" (connect on
+    # first use) or "disabled" (no Firestore, in-memory only)
+    STORAGE_CONNECT_MODE: str = "background"
+    STORAGE_RETRY_SECONDS: float = 30.0       # First reconnect delay, doubled per failure
+    STORAGE_RETRY_MAX_SECONDS: float = 300.0
+    STARTUP_BUDGET_SECONDS: float = 1.0
     
     # Simulation
     NUM_VEHICLES: int = 900
@@ -13,6 +25,77 @@ class Settings(BaseSettings):
     OVEN_PRODUCTION_RATE: int = 1
     MAX_CONVEYOR_PICK: int = 10
     
+    # Vehicle generator
+    GENERATOR_SEED: Optional[int] = None
+    GENERATOR_MODE: str = "exact"         # exact | iid
+    ARRIVAL_PATTERN: str = "shuffled"     # shuffled | bursty | sequenced
+    GENERATOR_CHUNK_SIZE: int = 10000
+    BURST_MEAN_LENGTH: float = 6.0
+    
+    # Conveyor pick strategy: "greedy" (longest front run) or "planner"
+    PICK_STRATEGY: str = "greedy"
+    PLANNER_HORIZON: int = 6          # picks looked ahead
+    PLANNER_RUN_DEPTH: int = 3        # runs visible per buffer front
+    PLANNER_TIME_BUDGET_MS: float = 5.0
+    
+    # Overflow avoidance (occupancy forecasting)
+    OVERFLOW_AVOIDANCE_ENABLED: bool = True
+    FORECAST_HORIZON_TICKS: int = Field(20, ge=1)
+    FORECAST_SMOOTHING: float = 0.2
+    
+    # Metrics history (ring buffer sizes per resolution)
+    METRICS_HISTORY_TICK_POINTS: int = 7200        # 1 hour at 0.5s ticks
+    METRICS_HISTORY_MINUTE_POINTS: int = 1440      # 1 day
+    METRICS_HISTORY_TEN_MINUTE_POINTS: int = 1008  # 7 days
+    
+    # Run export (columnar files for offline analytics)
+    EXPORT_ENABLED: bool = True
+    EXPORT_DIR: str = "exports"
+    EXPORT_FORMAT: str = "parquet"    # parquet | arrow
+    EXPORT_ROW_GROUP_SIZE: int = 5000
+    
+    # Allocation profiling (can also be switched at runtime via the API)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_EVERY_TICKS: int = 50
+    PROFILING_TOP_N: int = 15
+    PROFILING_DUMP_DIR: str = "profiles"
+    
+    # Shadow strategy evaluation
+    SHADOW_QUEUE_SIZE: int = 2000          # ticks buffered before shadows desync
+    SHADOW_REPORT_EVERY_TICKS: int = 10
+    
+    # Offline optimality benchmarking
+    OPTIMALITY_MAX_VEHICLES: int = 480      # Arrivals per gap report (prefix of the run)
+    OPTIMALITY_WINDOW_VEHICLES: int = 24    # Cars per exactly-solved window
+    OPTIMALITY_MAX_STATES: int = 200000     # Search budget per window
+    OPTIMALITY_TIME_BUDGET_SECONDS: float = 5.0
+    OPTIMALITY_REPORT_BUDGET_SECONDS: float = 120.0   # No new window after this (per report)
+    
+    # Realtime dashboard publishing (adaptive cadence)
+    REALTIME_FRESHNESS_TARGET_SECONDS: float = 2.0
+    REALTIME_MAX_WRITES_PER_SECOND: float = 10.0
+    REALTIME_MAX_BYTES_PER_SECOND: int = 50000
+    REALTIME_MAX_INTERVAL_SECONDS: float = 30.0
+    
+    # Vehicle status storage: "documents" (one write per car and transition)
+    # or "buckets" (transitions packed per STATUS_BUCKET_TICKS ticks)
+    VEHICLE_STATUS_LAYOUT: str = "documents"
+    STATUS_BUCKET_TICKS: int = 10
+    
+    # Vehicle priority (lower value = more urgent)
+    OVEN_QUEUE_MODE: str = "fifo"          # "fifo" or "priority"
+    PRIORITY_AGING_TICKS: int = 20         # Wait that offsets one priority level
+    PRIORITY_PICK_WEIGHT: float = 0.0      # > 0 trades run length for urgency in conveyor picks
+    RUSH_PRIORITY: int = 0
+    
+    # Discrete-event simulation (process times JSON; empty = built-in defaults)
+    PROCESS_TIMES_PATH: str = ""
+    EVENT_SIM_MAX_VEHICLES: int = 200000
+    
+    # Buffer maintenance planning (drain ahead of the window)
+    MAINTENANCE_DRAIN_MARGIN_TICKS: int = 5
+    MAINTENANCE_PROJECTION_MAX_TICKS: int = 600
+    
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
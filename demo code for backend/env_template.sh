@@ -5,12 +5,91 @@
 FIREBASE_CREDENTIALS_PATH=serviceAccountKey.json
 FIREBASE_PROJECT_ID=your-project-id
 
+# Plant topology JSON (empty = built-in two-oven plant)
+PLANT_TOPOLOGY_PATH=
+
+# Storage startup (eager | background | lazy | disabled)
+STORAGE_CONNECT_MODE=background
+STORAGE_RETRY_SECONDS=30
+STORAGE_RETRY_MAX_SECONDS=300
+STARTUP_BUDGET_SECONDS=1.0
+
 # Simulation Settings
 NUM_VEHICLES=900
 TICK_RATE_SECONDS=0.5
 OVEN_PRODUCTION_RATE=1
 MAX_CONVEYOR_PICK=10
 
+# Vehicle generator (exact | iid; shuffled | bursty | sequenced)
+# GENERATOR_SEED=42
+GENERATOR_MODE=exact
+ARRIVAL_PATTERN=shuffled
+GENERATOR_CHUNK_SIZE=10000
+BURST_MEAN_LENGTH=6.0
+
+# Conveyor pick strategy (greedy | planner)
+PICK_STRATEGY=greedy
+PLANNER_HORIZON=6
+PLANNER_RUN_DEPTH=3
+PLANNER_TIME_BUDGET_MS=5.0
+
+# Overflow avoidance (occupancy forecasting)
+OVERFLOW_AVOIDANCE_ENABLED=true
+FORECAST_HORIZON_TICKS=20
+FORECAST_SMOOTHING=0.2
+
+# Metrics history (ring buffer sizes per resolution)
+METRICS_HISTORY_TICK_POINTS=7200
+METRICS_HISTORY_MINUTE_POINTS=1440
+METRICS_HISTORY_TEN_MINUTE_POINTS=1008
+
+# Run export (parquet | arrow)
+EXPORT_ENABLED=true
+EXPORT_DIR=exports
+EXPORT_FORMAT=parquet
+EXPORT_ROW_GROUP_SIZE=5000
+
+# Allocation profiling
+PROFILING_ENABLED=false
+PROFILING_SAMPLE_EVERY_TICKS=50
+PROFILING_TOP_N=15
+PROFILING_DUMP_DIR=profiles
+
+# Shadow strategy evaluation
+SHADOW_QUEUE_SIZE=2000
+SHADOW_REPORT_EVERY_TICKS=10
+
+# Offline optimality benchmarking
+OPTIMALITY_MAX_VEHICLES=480
+OPTIMALITY_WINDOW_VEHICLES=24
+OPTIMALITY_MAX_STATES=200000
+OPTIMALITY_TIME_BUDGET_SECONDS=5.0
+OPTIMALITY_REPORT_BUDGET_SECONDS=120
+
+# Realtime dashboard publishing (adaptive cadence)
+REALTIME_FRESHNESS_TARGET_SECONDS=2.0
+REALTIME_MAX_WRITES_PER_SECOND=10.0
+REALTIME_MAX_BYTES_PER_SECOND=50000
+REALTIME_MAX_INTERVAL_SECONDS=30.0
+
+# Vehicle status storage (documents | buckets)
+VEHICLE_STATUS_LAYOUT=documents
+STATUS_BUCKET_TICKS=10
+
+# Vehicle priority (lower value = more urgent)
+OVEN_QUEUE_MODE=fifo
+PRIORITY_AGING_TICKS=20
+PRIORITY_PICK_WEIGHT=0.0
+RUSH_PRIORITY=0
+
+# Discrete-event simulation (process times JSON; empty = built-in defaults)
+PROCESS_TIMES_PATH=
+EVENT_SIM_MAX_VEHICLES=200000
+
+# Buffer maintenance planning (drain ahead of the window)
+MAINTENANCE_DRAIN_MARGIN_TICKS=5
+MAINTENANCE_PROJECTION_MAX_TICKS=600
+
 # API Settings
 API_HOST=0.0.0.0
 API_PORT=8000
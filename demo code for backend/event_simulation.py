@@ -0,0 +1,366 @@
+# services/event_simulation.py
+import heapq
+import itertools
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from models.process_times import DurationSpec, ProcessTimes
+from services.scheduler import PaintShopScheduler
+from services.topology import CompiledTopology
+from services.vehicle_generator import make_generator
+from services.priority_queue import LatencyTracker, DEFAULT_PRIORITY
+from config import settings, Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# Event kinds, in the order same-time events are handled: maintenance first,
+# then arrivals, oven completions, and finally the conveyors
+MAINTENANCE, ARRIVAL, OVEN_DONE, CONVEYOR_FREE = range(4)
+
+# (at_seconds, buffer_id, is_available)
+MaintenanceChange = Tuple[float, str, bool]
+
+
+def make_sampler(spec: DurationSpec, rng: np.random.Generator) -> Callable[[], float]:
+    """Draw function for a duration spec (never negative)"""
+    if spec.dist not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown duration distribution: {spec.dist}")
+    mean = spec.mean
+    if spec.dist == "fixed":
+        return lambda: mean
+    if spec.dist == "uniform":
+        low = spec.low if spec.low is not None else mean
+        high = spec.high if spec.high is not None else mean
+        return lambda: rng.uniform(low, high)
+    if spec.dist == "normal":
+        floor = spec.low if spec.low is not None else 0.0
+        sd = spec.cv * mean
+        return lambda: max(floor, rng.normal(mean, sd))
+    if spec.dist == "lognormal":
+        # Parameterized by the mean and cv of the duration itself
+        sigma = float(np.sqrt(np.log1p(spec.cv ** 2)))
+        mu = float(np.log(mean)) - sigma ** 2 / 2
+        return lambda: rng.lognormal(mu, sigma)
+    return lambda: rng.exponential(mean)
+
+
+def load_process_times(path: Optional[str] = None) -> ProcessTimes:
+    """Process times from a JSON file, or the defaults"""
+    if not path:
+        return ProcessTimes()
+    with open(path) as f:
+        return ProcessTimes(**json.load(f))
+
+
+class EventSimulation:
+    """
+    Discrete-event run of a fresh scheduler with per-car process times.
+
+    Time jumps from event to event (arrival, oven completion, conveyor free,
+    maintenance change) instead of advancing in fixed ticks. Each oven
+    processes one car at a time; a car that finds no buffer space keeps its
+    oven blocked until a pick or maintenance change frees room. Each main
+    conveyor is busy for the transfer time of the cars it picked, plus a
+    setup when its paint color changes, and sleeps while it has nothing to
+    pick; a conveyor that frees up picks on its own.
+
+    Without an interarrival distribution supply is saturated: oven queues
+    are kept topped up from the generator and latency counts from oven
+    entry rather than arrival. The scheduler's own tick counter (forecasts,
+    priority aging) advances once per conveyor pick.
+    """
+
+    def __init__(self, process_times: Optional[ProcessTimes] = None,
+                 topology: Optional[CompiledTopology] = None,
+                 overrides: Optional[Dict] = None, seed: Optional[int] = None):
+        unknown = set(overrides or {}) - set(Settings.model_fields)
+        if unknown:
+            raise ValueError(f"Unknown settings: {sorted(unknown)}")
+
+        self.scheduler = PaintShopScheduler(topology=topology, overrides=overrides)
+        self.process_times = process_times or load_process_times(settings.PROCESS_TIMES_PATH)
+        # Own stream, so process times don't mirror the generator's color draws
+        self.rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+
+        times = self.process_times
+        oven_ids = self.scheduler.topology.oven_ids
+        self._oven_default = make_sampler(times.oven_default, self.rng)
+        self._oven_samplers = {oven: make_sampler(spec, self.rng) for oven, spec in times.ovens.items()}
+        self._color_samplers = {color: make_sampler(spec, self.rng) for color, spec in times.colors.items()}
+        self._conveyor_sampler = make_sampler(times.conveyor_per_car, self.rng)
+        self._interarrival = (
+            make_sampler(times.interarrival, self.rng) if times.interarrival else None
+        )
+        unknown_ovens = set(times.ovens) - set(oven_ids)
+        if unknown_ovens:
+            raise ValueError(f"Process times for unknown ovens: {sorted(unknown_ovens)}")
+
+        self.now = 0.0
+        self._events: List[Tuple[float, int, int, object]] = []
+        self._seq = itertools.count()
+        self.events_processed = 0
+
+        # Oven state: car being processed, and since when it has been blocked
+        self.in_oven: Dict[str, Optional[int]] = {oven: None for oven in oven_ids}
+        self.blocked_since: Dict[str, Optional[float]] = {oven: None for oven in oven_ids}
+        self.oven_busy_seconds = {oven: 0.0 for oven in oven_ids}
+        self.oven_blocked_seconds = {oven: 0.0 for oven in oven_ids}
+        self.oven_blocked_episodes = {oven: 0 for oven in oven_ids}
+        self.oven_processed = {oven: 0 for oven in oven_ids}
+
+        conveyor_ids = self.scheduler.topology.conveyor_ids
+        self.conveyor_busy = {conveyor: False for conveyor in conveyor_ids}
+        self.conveyor_busy_seconds = {conveyor: 0.0 for conveyor in conveyor_ids}
+        self.conveyor_setup_seconds = {conveyor: 0.0 for conveyor in conveyor_ids}
+        self.picks = 0
+
+        self.latency = LatencyTracker()
+        self.arrived = 0
+        self._arrivals: Optional[Iterator[Dict]] = None
+        self._queue_target = 0
+
+    # Event heap
+
+    def _schedule(self, at: float, kind: int, payload=None):
+        heapq.heappush(self._events, (at, kind, next(self._seq), payload))
+
+    # Arrivals
+
+    def _arrive(self, vehicle: Dict):
+        if self._interarrival is not None:
+            vehicle['arrival_seconds'] = self.now
+        self.scheduler.vehicles_by_id[vehicle['car_id']] = vehicle
+        self.scheduler.ovens[vehicle['oven']].append(vehicle['car_id'])
+        self.arrived += 1
+
+    def _top_up(self):
+        """Saturated supply: keep every oven queue at least _queue_target long"""
+        ovens = self.scheduler.ovens
+        while self._arrivals is not None and any(len(q) < self._queue_target for q in ovens.values()):
+            vehicle = next(self._arrivals, None)
+            if vehicle is None:
+                self._arrivals = None
+                break
+            self._arrive(vehicle)
+
+    def _on_arrival(self, vehicle: Dict):
+        self._arrive(vehicle)
+        self._start_oven(vehicle['oven'])
+        following = next(self._arrivals, None)
+        if following is not None:
+            self._schedule(self.now + self._interarrival(), ARRIVAL, following)
+
+    # Ovens
+
+    def _oven_duration(self, oven: str, color: str) -> float:
+        sampler = self._color_samplers.get(color) or self._oven_samplers.get(oven) or self._oven_default
+        return sampler()
+
+    def _start_oven(self, oven: str):
+        if self.in_oven[oven] is not None:
+            return
+        if self._interarrival is None:
+            self._top_up()
+        queue = self.scheduler.ovens[oven]
+        if not queue:
+            return
+        car_id = queue.popleft()
+        self.in_oven[oven] = car_id
+        vehicle = self.scheduler.vehicles_by_id[car_id]
+        vehicle.setdefault('arrival_seconds', self.now)
+        duration = self._oven_duration(oven, vehicle['color'])
+        self.oven_busy_seconds[oven] += duration
+        self._schedule(self.now + duration, OVEN_DONE, oven)
+
+    def _release(self, oven: str) -> bool:
+        """Move the finished car into a buffer; False if the oven stays blocked"""
+        vehicle = self.scheduler.vehicles_by_id[self.in_oven[oven]]
+        result = self.scheduler.assign_vehicle_to_buffer(vehicle)
+        if not result['success']:
+            if self.blocked_since[oven] is None:
+                self.blocked_since[oven] = self.now
+                self.oven_blocked_episodes[oven] += 1
+            return False
+
+        if self.blocked_since[oven] is not None:
+            self.oven_blocked_seconds[oven] += self.now - self.blocked_since[oven]
+            self.blocked_since[oven] = None
+        self.in_oven[oven] = None
+        self.oven_processed[oven] += 1
+        self._start_oven(oven)
+        self._wake_conveyors()
+        return True
+
+    def _retry_blocked(self):
+        for oven, since in self.blocked_since.items():
+            if since is not None:
+                self._release(oven)
+
+    # Conveyor
+
+    def _wake_conveyors(self):
+        for conveyor, busy in self.conveyor_busy.items():
+            if not busy:
+                self.conveyor_busy[conveyor] = True
+                self._schedule(self.now, CONVEYOR_FREE, (conveyor, []))
+
+    def _on_conveyor_free(self, event: Tuple[str, List[int]]):
+        scheduler = self.scheduler
+        conveyor, finished = event
+        for car_id in finished:
+            vehicle = scheduler.vehicles_by_id.pop(car_id)
+            priority = vehicle.get('priority')
+            self.latency.record(
+                DEFAULT_PRIORITY if priority is None else priority,
+                scheduler.current_tick - vehicle.get('buffer_tick', scheduler.current_tick),
+                self.now - vehicle['arrival_seconds']
+            )
+
+        state = scheduler.metrics.conveyors[conveyor]
+        previous_color = state.last_color
+        scheduler.begin_tick(self.picks + 1)
+        picked = scheduler.pick_from_conveyors([conveyor]).get(conveyor)
+        if not picked:
+            self.conveyor_busy[conveyor] = False   # Woken by the next buffered car
+            return
+
+        self.picks += 1
+        duration = sum(self._conveyor_sampler() for _ in picked)
+        if previous_color and state.last_color != previous_color:
+            duration += self.process_times.changeover_seconds
+            self.conveyor_setup_seconds[conveyor] += self.process_times.changeover_seconds
+        self.conveyor_busy_seconds[conveyor] += duration
+        self._schedule(self.now + duration, CONVEYOR_FREE, (conveyor, picked))
+
+        # Cars left their buffer at pick start
+        self._retry_blocked()
+
+    # Maintenance
+
+    def _on_maintenance(self, change: Tuple[str, bool]):
+        buffer_id, is_available = change
+        self.scheduler.buffers[buffer_id].is_available = is_available
+        if is_available:
+            self._retry_blocked()
+
+    # Run
+
+    def run(self, num_vehicles: int, seed: Optional[int] = None, mode: Optional[str] = None,
+            pattern: Optional[str] = None, maintenance: Iterable[MaintenanceChange] = (),
+            horizon_seconds: Optional[float] = None) -> Dict:
+        started = time.perf_counter()
+        scheduler = self.scheduler
+
+        generator = make_generator(scheduler.assign_oven, seed, mode, pattern)
+        self._arrivals = (v for batch in generator.iter_batches(num_vehicles) for v in batch)
+        # Saturated supply keeps enough cars queued for the overflow forecast
+        self._queue_target = max(1, scheduler.settings.FORECAST_HORIZON_TICKS * scheduler.settings.OVEN_PRODUCTION_RATE)
+
+        for at_seconds, buffer_id, is_available in maintenance:
+            if buffer_id not in scheduler.buffers:
+                raise ValueError(f"Unknown buffer: {buffer_id}")
+            self._schedule(at_seconds, MAINTENANCE, (buffer_id, is_available))
+
+        if self._interarrival is not None:
+            first = next(self._arrivals, None)
+            if first is not None:
+                self._schedule(0.0, ARRIVAL, first)
+        else:
+            for oven in scheduler.ovens:
+                self._start_oven(oven)
+
+        handlers = {
+            MAINTENANCE: self._on_maintenance,
+            ARRIVAL: self._on_arrival,
+            OVEN_DONE: self._release,
+            CONVEYOR_FREE: self._on_conveyor_free
+        }
+        events = self._events
+        while events:
+            if horizon_seconds is not None and events[0][0] > horizon_seconds:
+                self.now = horizon_seconds
+                break
+            self.now, kind, _, payload = heapq.heappop(events)
+            handlers[kind](payload)
+            self.events_processed += 1
+
+        for oven, since in self.blocked_since.items():
+            if since is not None:
+                self.oven_blocked_seconds[oven] += self.now - since
+
+        return self.report(num_vehicles, time.perf_counter() - started)
+
+    def report(self, num_vehicles: int, wall_seconds: float) -> Dict:
+        scheduler = self.scheduler
+        scheduler.refresh_metrics()
+        metrics = scheduler.metrics
+        elapsed = self.now
+        hours = elapsed / 3600 if elapsed > 0 else None
+
+        def share(seconds: float) -> Optional[float]:
+            return round(min(seconds, elapsed) / elapsed * 100, 1) if elapsed > 0 else None
+
+        latency = self.latency.report()
+        return {
+            'vehicles': num_vehicles,
+            'arrived': self.arrived,
+            'painted': metrics.throughput,
+            'completed': metrics.throughput == num_vehicles,
+            'simulated_seconds': round(elapsed, 1),
+            'jph': round(metrics.throughput / hours, 2) if hours else None,
+            'events': self.events_processed,
+            'wall_ms': round(wall_seconds * 1000, 1),
+            'ovens': {
+                oven: {
+                    'processed': self.oven_processed[oven],
+                    'utilization_percent': share(self.oven_busy_seconds[oven]),
+                    'blocked_percent': share(self.oven_blocked_seconds[oven]),
+                    'blocked_episodes': self.oven_blocked_episodes[oven]
+                }
+                for oven in scheduler.topology.oven_ids
+            },
+            'conveyors': {
+                conveyor: {
+                    'picks': state.picks,
+                    'painted': state.vehicles_painted,
+                    'mean_pick_size': round(state.vehicles_painted / state.picks, 2) if state.picks else None,
+                    'paint_changeovers': state.paint_changeovers,
+                    'utilization_percent': share(self.conveyor_busy_seconds[conveyor]),
+                    'setup_percent': share(self.conveyor_setup_seconds[conveyor])
+                }
+                for conveyor, state in metrics.conveyors.items()
+            },
+            'metrics': {
+                'paint_changeovers': metrics.paint_changeovers,
+                'total_changeovers': metrics.total_changeovers,
+                'buffer_overflow_events': metrics.buffer_overflow_events,
+                'o2_stoppage_events': metrics.o2_stoppage_events
+            },
+            'latency': {
+                priority: stats['seconds'] for priority, stats in latency.items()
+            }
+        }
+
+
+def run_event_simulation(num_vehicles: int, seed: Optional[int] = None,
+                         mode: Optional[str] = None, pattern: Optional[str] = None,
+                         overrides: Optional[Dict] = None,
+                         process_times: Optional[ProcessTimes] = None,
+                         maintenance: Iterable[MaintenanceChange] = (),
+                         horizon_seconds: Optional[float] = None) -> Dict:
+    """One discrete-event run on a fresh scheduler"""
+    if num_vehicles > settings.EVENT_SIM_MAX_VEHICLES:
+        raise ValueError(f"At most {settings.EVENT_SIM_MAX_VEHICLES} vehicles per run")
+
+    simulation = EventSimulation(process_times=process_times, overrides=overrides, seed=seed)
+    report = simulation.run(num_vehicles, seed, mode, pattern, maintenance, horizon_seconds)
+    logger.info(
+        f"⏱️ Event simulation: {report['painted']}/{num_vehicles} cars in "
+        f"{report['simulated_seconds']}s simulated ({report['jph']} JPH), "
+        f"{report['events']} events in {report['wall_ms']}ms"
+    )
+    return report
@@ -1,13 +1,22 @@
 # services/firestore_service.py
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import List, Dict, Optional, Sequence
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 class FirestoreService:
+    """
+    Firestore access, connected lazily.
+    
+    Nothing is imported or opened at construction. The Firebase SDK is
+    loaded by a background connector thread, started at startup or on
+    first use, which retries with exponential backoff (STORAGE_RETRY_SECONDS
+    doubling up to STORAGE_RETRY_MAX_SECONDS). Calls never wait for it:
+    while storage is not connected they return False/[] right away.
+    """
     _instance = None
     
     def __new__(cls):
@@ -19,19 +28,115 @@ class FirestoreService:
     def __init__(self):
         if self._initialized:
             return
+        
+        self.db = None
+        self.last_error: Optional[str] = None
+        self.connect_seconds: Optional[float] = None
+        self.retry_delay: Optional[float] = None
+        self._lock = threading.Lock()
+        self._connector: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._initialized = True
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.STORAGE_CONNECT_MODE != "disabled"
+    
+    @property
+    def connected(self) -> bool:
+        return self.db is not None
+    
+    def connect(self) -> bool:
+        """Load credentials and open the Firestore client (blocking)"""
+        if not self.enabled:
+            return False
+        
+        with self._lock:
+            if self.db is not None:
+                return True
             
+            started = time.perf_counter()
+            try:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                
+                try:
+                    firebase_admin.get_app()
+                except ValueError:
+                    cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                    firebase_admin.initialize_app(cred)
+                self.db = firestore.client()
+                self.last_error = None
+                self.connect_seconds = round(time.perf_counter() - started, 3)
+                logger.info(f"✅ Firebase initialized successfully ({self.connect_seconds}s)")
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"❌ Firebase initialization failed: {e}")
+                return False
+    
+    def connect_in_background(self):
+        """Start the connector thread unless connected or already connecting (never blocks)"""
+        if not self.enabled or self.db is not None:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # A connect attempt is in progress
         try:
-            cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-            firebase_admin.initialize_app(cred)
-            self.db = firestore.client()
-            self._initialized = True
-            logger.info("✅ Firebase initialized successfully")
-        except Exception as e:
-            logger.error(f"❌ Firebase initialization failed: {e}")
-            raise
+            if self._connector is None or not self._connector.is_alive():
+                self._stopping.clear()
+                self._connector = threading.Thread(
+                    target=self._connect_with_retry, name="firestore-connect", daemon=True
+                )
+                self._connector.start()
+        finally:
+            self._lock.release()
+    
+    def _connect_with_retry(self):
+        self.retry_delay = settings.STORAGE_RETRY_SECONDS
+        while not self._stopping.is_set():
+            if self.connect():
+                self.retry_delay = None
+                return
+            logger.info(f"🔁 Retrying Firebase connection in {self.retry_delay}s")
+            if self._stopping.wait(self.retry_delay):
+                return
+            self.retry_delay = min(self.retry_delay * 2, settings.STORAGE_RETRY_MAX_SECONDS)
+    
+    def stop(self):
+        """Stop background reconnect attempts (shutdown)"""
+        self._stopping.set()
+    
+    def _client(self):
+        """Firestore client; None (without waiting) while not connected"""
+        if self.db is None:
+            self.connect_in_background()
+        return self.db
+    
+    def status(self) -> Dict:
+        """Storage connection status for health endpoints"""
+        if not self.enabled:
+            state = "disabled"
+        elif self.db is not None:
+            state = "connected"
+        elif self.last_error:
+            state = "unavailable"
+        else:
+            state = "not_connected"
+        return {
+            "state": state,
+            "mode": settings.STORAGE_CONNECT_MODE,
+            "connect_seconds": self.connect_seconds,
+            "connecting": self._connector is not None and self._connector.is_alive(),
+            "retry_delay_seconds": self.retry_delay,
+            "last_error": self.last_error
+        }
     
     def seed_vehicles(self, vehicles: List[Dict]) -> bool:
         """Batch write vehicles to Firestore"""
+        if self._client() is None:
+            logger.error("❌ Error seeding vehicles: storage unavailable")
+            return False
+        
         try:
             batch = self.db.batch()
             collection_ref = self.db.collection('vehicles')
@@ -57,6 +162,9 @@ class FirestoreService:
     
     def update_vehicle(self, car_id: int, updates: Dict) -> bool:
         """Update single vehicle"""
+        if self._client() is None:
+            return False
+        
         try:
             doc_ref = self.db.collection('vehicles').document(str(car_id))
             doc_ref.update(updates)
@@ -67,6 +175,9 @@ class FirestoreService:
     
     def batch_update_vehicles(self, updates: List[tuple]) -> bool:
         """Batch update vehicles: [(car_id, update_dict), ...]"""
+        if self._client() is None:
+            return False
+        
         try:
             batch = self.db.batch()
             
@@ -82,6 +193,9 @@ class FirestoreService:
     
     def get_waiting_vehicles(self, limit: int = 1000) -> List[Dict]:
         """Fetch vehicles with status='waiting'"""
+        if self._client() is None:
+            return []
+        
         try:
             docs = (self.db.collection('vehicles')
                    .where('status', '==', 'waiting')
@@ -99,9 +213,108 @@ class FirestoreService:
             logger.error(f"Error fetching vehicles: {e}")
             return []
     
-    def update_metrics(self, metrics: Dict) -> bool:
-        """Update real-time metrics"""
+    def get_vehicles_after(self, car_id: Optional[int], limit: int = 1000) -> List[Dict]:
+        """Fetch vehicles in car_id order, after a cursor (bucketed status layout)"""
+        if self._client() is None:
+            return []
+        
+        try:
+            query = self.db.collection('vehicles').order_by('car_id')
+            if car_id is not None:
+                query = query.start_after({'car_id': car_id})
+            
+            vehicles = []
+            for doc in query.limit(limit).stream():
+                data = doc.to_dict()
+                data['_id'] = doc.id
+                vehicles.append(data)
+            
+            return vehicles
+        except Exception as e:
+            logger.error(f"Error fetching vehicles: {e}")
+            return []
+    
+    def get_vehicle(self, car_id: int) -> Optional[Dict]:
+        """Fetch a single vehicle document"""
+        if self._client() is None:
+            return None
+        
+        try:
+            doc = self.db.collection('vehicles').document(str(car_id)).get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logger.error(f"Error fetching vehicle {car_id}: {e}")
+            return None
+    
+    def get_vehicles_by_ids(self, car_ids: List[int]) -> List[Dict]:
+        """Fetch vehicle documents by car_id, in the given order"""
+        if self._client() is None or not car_ids:
+            return []
+        
         try:
+            refs = [self.db.collection('vehicles').document(str(car_id)) for car_id in car_ids]
+            found = {}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict()
+                    data['_id'] = doc.id
+                    found[data['car_id']] = data
+            return [found[car_id] for car_id in car_ids if car_id in found]
+        except Exception as e:
+            logger.error(f"Error fetching vehicles: {e}")
+            return []
+    
+    def write_status_bucket(self, bucket_id: str, payload: Dict, meta: Optional[Dict] = None) -> bool:
+        """Write one bucket of vehicle status transitions, with the writer's meta doc"""
+        if self._client() is None:
+            return False
+        
+        try:
+            batch = self.db.batch()
+            batch.set(self.db.collection('vehicle_status').document(bucket_id), payload)
+            if meta is not None:
+                batch.set(self.db.collection('vehicle_status_meta').document('writer'), meta)
+            batch.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error writing status bucket {bucket_id}: {e}")
+            return False
+    
+    def get_status_meta(self) -> Optional[Dict]:
+        """Meta doc of the status bucket writer (sequence and load progress)"""
+        if self._client() is None:
+            return None
+        
+        try:
+            doc = self.db.collection('vehicle_status_meta').document('writer').get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logger.error(f"Error fetching status meta: {e}")
+            return None
+    
+    def get_status_buckets(self, car_id: Optional[int] = None) -> List[Dict]:
+        """Fetch status buckets, optionally only those mentioning car_id"""
+        if self._client() is None:
+            return []
+        
+        try:
+            query = self.db.collection('vehicle_status')
+            if car_id is not None:
+                query = query.where('car_ids', 'array_contains', car_id)
+            return [doc.to_dict() for doc in query.stream()]
+        except Exception as e:
+            logger.error(f"Error fetching status buckets: {e}")
+            return []
+    
+    def update_metrics(self, metrics: Dict, delete_fields: Sequence[str] = ()) -> bool:
+        """Update real-time metrics, removing delete_fields from the document"""
+        if self._client() is None:
+            return False
+        
+        try:
+            if delete_fields:
+                from firebase_admin import firestore
+                metrics = {**metrics, **{field: firestore.DELETE_FIELD for field in delete_fields}}
             doc_ref = self.db.collection('metrics').document('current')
             doc_ref.set(metrics, merge=True)
             return True
@@ -111,6 +324,9 @@ class FirestoreService:
     
     def update_buffer_state(self, buffer_id: str, state: Dict) -> bool:
         """Update buffer state in real-time"""
+        if self._client() is None:
+            return False
+        
         try:
             doc_ref = self.db.collection('buffers').document(buffer_id)
             doc_ref.set(state, merge=True)
@@ -121,6 +337,9 @@ class FirestoreService:
     
     def clear_collection(self, collection_name: str) -> bool:
         """Clear a collection (for reset)"""
+        if self._client() is None:
+            return False
+        
         try:
             docs = self.db.collection(collection_name).stream()
             batch = self.db.batch()
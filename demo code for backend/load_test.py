@@ -0,0 +1,220 @@
+# tools/load_test.py
+"""
+Dashboard load test against an in-process API while the simulation ticks.
+
+Clients poll the dashboard endpoints back to back (optionally with a think
+time) through httpx's ASGI transport, so requests and simulation ticks
+share one event loop, as they do in a single uvicorn worker. Storage is
+disabled and vehicles are queued in memory.
+
+    python -m tools.load_test --clients 50 --duration 30 --output load_50.json
+    python -m tools.load_test --clients 50 --baseline load_50.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+ENDPOINTS = ("/api/metrics", "/api/buffers", "/api/report", "/api/simulation/status")
+
+
+def _percentiles(samples: List[float]) -> Dict:
+    """p50/p95/p99/max of latencies in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    report = {
+        f"p{p}_ms": round(ordered[min(last, int(p / 100 * len(ordered)))] * 1000, 2)
+        for p in (50, 95, 99)
+    }
+    report["max_ms"] = round(ordered[-1] * 1000, 2)
+    return report
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def _client(client, endpoints: Sequence[str], offset: int, deadline: float,
+                  think_s: float, latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    """One dashboard client: cycle through the endpoints until the deadline"""
+    i = offset
+    while time.perf_counter() < deadline:
+        path = endpoints[i % len(endpoints)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        latencies[path].append(time.perf_counter() - started)
+        if not ok:
+            errors[path] += 1
+        # In-process requests never suspend on I/O; always yield so the
+        # simulation task gets the loop like it would with network clients
+        await asyncio.sleep(think_s)
+
+
+async def run_load_test(clients: int = 20, duration_s: float = 20.0, warmup_s: float = 2.0,
+                        think_s: float = 0.0, vehicles: Optional[int] = None,
+                        seed: Optional[int] = 42, endpoints: Sequence[str] = ENDPOINTS) -> Dict:
+    """Run the simulation, load the API for duration_s and collect results"""
+    import httpx
+    from main import app
+    from config import settings
+    from services.scheduler import get_scheduler
+    from services.simulation_engine import get_simulation
+    from services.vehicle_generator import make_generator
+
+    scheduler = get_scheduler()
+    simulation = get_simulation()
+
+    # Enough cars that the ovens never run dry during the run
+    if vehicles is None:
+        ticks = (warmup_s + duration_s) / settings.TICK_RATE_SECONDS
+        vehicles = int(ticks * settings.OVEN_PRODUCTION_RATE * len(scheduler.ovens) * 1.5) + 500
+    generator = make_generator(scheduler.assign_oven, seed=seed)
+    for batch in generator.iter_batches(vehicles):
+        simulation.queue_vehicles(batch)
+
+    latencies: Dict[str, List[float]] = {path: [] for path in endpoints}
+    errors: Dict[str, int] = {path: 0 for path in endpoints}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        await client.post("/api/simulation/start")
+        await asyncio.sleep(warmup_s)
+
+        simulation.tick_lag.clear()
+        start_tick = simulation.tick
+        started = time.perf_counter()
+        deadline = started + duration_s
+        await asyncio.gather(*(
+            _client(client, endpoints, i, deadline, think_s, latencies, errors)
+            for i in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+        ticks = simulation.tick - start_tick
+        tick_lag = simulation.tick_lag_report()
+        still_running = simulation.running
+
+        await client.post("/api/simulation/stop")
+
+    all_latencies = [latency for samples in latencies.values() for latency in samples]
+    total_requests = len(all_latencies)
+    expected_ticks = elapsed / settings.TICK_RATE_SECONDS
+    return {
+        "version": {
+            "app": app.version,
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "timestamp": datetime.now().isoformat(timespec="seconds")
+        },
+        "config": {
+            "clients": clients,
+            "duration_seconds": duration_s,
+            "warmup_seconds": warmup_s,
+            "think_seconds": think_s,
+            "vehicles": vehicles,
+            "tick_rate_seconds": settings.TICK_RATE_SECONDS,
+            "endpoints": list(endpoints)
+        },
+        "overall": {
+            "requests": total_requests,
+            "errors": sum(errors.values()),
+            "requests_per_second": round(total_requests / elapsed, 1),
+            **_percentiles(all_latencies)
+        },
+        "endpoints": {
+            path: {
+                "requests": len(samples),
+                "errors": errors[path],
+                "requests_per_second": round(len(samples) / elapsed, 1),
+                **_percentiles(samples)
+            }
+            for path, samples in latencies.items()
+        },
+        "ticks": {
+            "ticks": ticks,
+            "expected_ticks": round(expected_ticks, 1),
+            "ticks_behind": round(max(0.0, expected_ticks - ticks), 1),
+            "simulation_ran_throughout": still_running,
+            "lag": tick_lag
+        }
+    }
+
+
+def compare(results: Dict, baseline: Dict) -> Dict:
+    """Relative change of the headline numbers against an earlier result"""
+    def change(new, old):
+        if new is None or not old:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    return {
+        "baseline_git": baseline.get("version", {}).get("git"),
+        "requests_per_second_percent": change(
+            results["overall"]["requests_per_second"], baseline["overall"]["requests_per_second"]
+        ),
+        **{
+            f"{key}_percent": change(results["overall"].get(key), baseline["overall"].get(key))
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        },
+        "tick_lag_p95_percent": change(
+            results["ticks"]["lag"].get("p95_ms"), baseline["ticks"]["lag"].get("p95_ms")
+        )
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard API load test (in-process)")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent dashboard clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds before measuring")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause between a client's requests")
+    parser.add_argument("--vehicles", type=int, default=None, help="Cars queued (default: enough for the run)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tick-rate", type=float, default=None, help="Override TICK_RATE_SECONDS")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so configure before importing the app
+    os.environ["STORAGE_CONNECT_MODE"] = "disabled"
+    os.environ.setdefault("EXPORT_ENABLED", "false")
+    if args.tick_rate is not None:
+        os.environ["TICK_RATE_SECONDS"] = str(args.tick_rate)
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    results = asyncio.run(run_load_test(
+        clients=args.clients, duration_s=args.duration, warmup_s=args.warmup,
+        think_s=args.think, vehicles=args.vehicles, seed=args.seed
+    ))
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
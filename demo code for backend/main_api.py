@@ -1,13 +1,40 @@
 # main.py
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
+import os
 from config import settings
-from services.scheduler import scheduler
-from services.simulation_engine import simulation
+from services.scheduler import get_scheduler
+from services.simulation_engine import get_simulation
 from services.firestore_service import firestore_service
+from services.metrics_history import metrics_history
+from services.run_export import run_exporter
+from services.topology import get_plant
+from services.state_actor import get_state_actor
+from services.profiler import profiler
+from services.shadow import shadow_evaluator
+from services.optimality import gap_reports
+from services.realtime_publisher import realtime_publisher
+from services.status_buckets import status_buckets, reconstruct_vehicle_views
+from services.priority_queue import latency_tracker
+from services.event_simulation import run_event_simulation
+from services.maintenance_planner import capture_projection_base, project_impact
+from models.process_times import ProcessTimes
+
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
+startup_report = {
+    "import_seconds": IMPORT_SECONDS,
+    "startup_seconds": None,
+    "budget_seconds": settings.STARTUP_BUDGET_SECONDS,
+    "within_budget": None
+}
 
 # Configure logging
 logging.basicConfig(
@@ -35,11 +62,49 @@ app.add_middleware(
 # Request models
 class SeedRequest(BaseModel):
     num_vehicles: Optional[int] = 900
+    seed: Optional[int] = None        # Reproducible arrival sequence
+    mode: Optional[str] = None        # exact | iid
+    pattern: Optional[str] = None     # shuffled | bursty | sequenced
 
 class BufferMaintenanceRequest(BaseModel):
     buffer_id: str
     is_available: bool
 
+class ProfilingRequest(BaseModel):
+    enabled: bool
+
+class MaintenancePlanRequest(BaseModel):
+    buffer_id: str
+    start_in_ticks: int = 0
+    duration_ticks: Optional[int] = None   # None = until restored manually
+    drain: bool = True                     # False = just take the buffer offline at the start
+    apply: bool = True                     # False = projection only
+
+class RushRequest(BaseModel):
+    priority: Optional[int] = None   # Defaults to RUSH_PRIORITY
+
+class ShadowCandidate(BaseModel):
+    name: str
+    overrides: dict = {}      # Settings overrides, e.g. {"PICK_STRATEGY": "planner"}
+
+class ShadowStartRequest(BaseModel):
+    candidates: List[ShadowCandidate]
+
+class MaintenanceChange(BaseModel):
+    at_seconds: float
+    buffer_id: str
+    is_available: bool
+
+class EventSimulationRequest(BaseModel):
+    num_vehicles: int = 900
+    seed: Optional[int] = None
+    mode: Optional[str] = None
+    pattern: Optional[str] = None
+    overrides: dict = {}                           # Settings overrides for the scheduler
+    process_times: Optional[ProcessTimes] = None   # Defaults to PROCESS_TIMES_PATH
+    maintenance: List[MaintenanceChange] = []
+    horizon_seconds: Optional[float] = None        # Stop at this simulated time
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -51,14 +116,28 @@ async def root():
         "status": "online",
         "service": "Smart Paint Shop Sequencing",
         "version": "1.0.0",
-        "simulation_running": simulation.running
+        "simulation_running": get_simulation().running,
+        "storage": firestore_service.status()["state"]
+    }
+
+@app.get("/api/health/startup")
+async def get_startup_report():
+    """Get import/startup timing and storage connection status"""
+    return {
+        "success": True,
+        "data": {
+            **startup_report,
+            "storage": firestore_service.status()
+        }
     }
 
 @app.post("/api/seed")
 async def seed_data(request: SeedRequest):
     """Seed initial vehicle data to Firestore"""
     try:
-        success = await simulation.seed_data(request.num_vehicles)
+        success = await get_simulation().seed_data(
+            request.num_vehicles, request.seed, request.mode, request.pattern
+        )
         if success:
             return {
                 "success": True,
@@ -67,6 +146,8 @@ async def seed_data(request: SeedRequest):
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to seed data")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Seed error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -75,6 +156,7 @@ async def seed_data(request: SeedRequest):
 async def start_simulation(background_tasks: BackgroundTasks):
     """Start the simulation"""
     try:
+        simulation = get_simulation()
         if simulation.running:
             return {"status": "already_running", "tick": simulation.tick}
         
@@ -92,7 +174,7 @@ async def start_simulation(background_tasks: BackgroundTasks):
 async def stop_simulation():
     """Stop the simulation"""
     try:
-        result = await simulation.stop()
+        result = await get_simulation().stop()
         return {
             "success": True,
             "message": "Simulation stopped",
@@ -106,7 +188,7 @@ async def stop_simulation():
 async def reset_simulation():
     """Reset the simulation"""
     try:
-        result = await simulation.reset()
+        result = await get_simulation().reset()
         return {
             "success": True,
             "message": "Simulation reset complete",
@@ -118,9 +200,9 @@ async def reset_simulation():
 
 @app.get("/api/metrics")
 async def get_metrics():
-    """Get current system metrics"""
+    """Get current system metrics (last published snapshot)"""
     try:
-        metrics = scheduler.get_metrics_dict()
+        metrics = get_state_actor().snapshot.metrics
         return {
             "success": True,
             "data": metrics
@@ -129,17 +211,32 @@ async def get_metrics():
         logger.error(f"Metrics error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metrics/history")
+async def get_metrics_history(
+    from_ts: Optional[float] = Query(None, alias="from"),
+    to_ts: Optional[float] = Query(None, alias="to"),
+    step: Optional[str] = None
+):
+    """Get metrics history (epoch seconds; step: tick, 1m, 10m or seconds)"""
+    try:
+        history = metrics_history.query(from_ts, to_ts, step)
+        return {
+            "success": True,
+            "data": history
+        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid step: {step}")
+    except Exception as e:
+        logger.error(f"Metrics history error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/buffers")
 async def get_buffer_states():
-    """Get all buffer states"""
+    """Get all buffer states (last published snapshot)"""
     try:
-        buffer_states = {
-            buffer_id: buffer.dict()
-            for buffer_id, buffer in scheduler.buffers.items()
-        }
         return {
             "success": True,
-            "data": buffer_states
+            "data": get_state_actor().snapshot.buffers
         }
     except Exception as e:
         logger.error(f"Buffer states error: {e}")
@@ -147,15 +244,15 @@ async def get_buffer_states():
 
 @app.get("/api/buffers/{buffer_id}")
 async def get_buffer_state(buffer_id: str):
-    """Get specific buffer state"""
+    """Get specific buffer state (last published snapshot)"""
     try:
-        if buffer_id not in scheduler.buffers:
+        buffers = get_state_actor().snapshot.buffers
+        if buffer_id not in buffers:
             raise HTTPException(status_code=404, detail="Buffer not found")
         
-        buffer = scheduler.buffers[buffer_id]
         return {
             "success": True,
-            "data": buffer.dict()
+            "data": buffers[buffer_id]
         }
     except HTTPException:
         raise
@@ -163,18 +260,82 @@ async def get_buffer_state(buffer_id: str):
         logger.error(f"Buffer state error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/vehicles/{car_id}")
+async def get_vehicle(car_id: int):
+    """Get a vehicle's stored state (rebuilt from status buckets in the bucketed layout)"""
+    try:
+        vehicle = firestore_service.get_vehicle(car_id)
+        if settings.VEHICLE_STATUS_LAYOUT == "buckets":
+            views = reconstruct_vehicle_views(
+                [vehicle] if vehicle else [],
+                firestore_service.get_status_buckets(car_id)
+            )
+            vehicle = views.get(car_id)
+        
+        if vehicle is None:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        
+        return {
+            "success": True,
+            "data": vehicle
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Vehicle lookup error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/vehicles/{car_id}/rush")
+async def rush_vehicle(car_id: int, request: RushRequest):
+    """Raise a vehicle's priority (applied at the next tick boundary)"""
+    priority = request.priority if request.priority is not None else settings.RUSH_PRIORITY
+    try:
+        result = await get_state_actor().submit("rush_vehicle", {"car_id": car_id, "priority": priority})
+        return {
+            "success": True,
+            "data": result
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Rush order error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/latency")
+async def get_latency_percentiles():
+    """Arrival-to-paint latency percentiles per priority"""
+    return {
+        "success": True,
+        "data": {
+            "queue_mode": settings.OVEN_QUEUE_MODE,
+            "by_priority": latency_tracker.report()
+        }
+    }
+
+@app.get("/api/vehicles/status/buckets")
+async def get_status_bucket_stats():
+    """Get bucketed vehicle-status write counts"""
+    return {
+        "success": True,
+        "data": {
+            "layout": settings.VEHICLE_STATUS_LAYOUT,
+            **status_buckets.stats()
+        }
+    }
+
 @app.post("/api/buffers/maintenance")
 async def set_buffer_maintenance(request: BufferMaintenanceRequest):
-    """Set buffer maintenance mode"""
+    """Set buffer maintenance mode (applied at the next tick boundary)"""
     try:
-        if request.buffer_id not in scheduler.buffers:
+        if request.buffer_id not in get_state_actor().snapshot.buffers:
             raise HTTPException(status_code=404, detail="Buffer not found")
         
-        buffer = scheduler.buffers[request.buffer_id]
-        buffer.is_available = request.is_available
-        
-        # Update Firestore
-        firestore_service.update_buffer_state(request.buffer_id, buffer.dict())
+        await get_state_actor().submit("set_buffer_maintenance", {
+            "buffer_id": request.buffer_id,
+            "is_available": request.is_available
+        })
         
         status = "available" if request.is_available else "maintenance"
         return {
@@ -189,52 +350,297 @@ async def set_buffer_maintenance(request: BufferMaintenanceRequest):
         logger.error(f"Buffer maintenance error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/buffers/maintenance/plan")
+async def plan_buffer_maintenance(request: MaintenancePlanRequest):
+    """Schedule a maintenance window with a drain plan and projected throughput impact"""
+    try:
+        if request.buffer_id not in get_state_actor().snapshot.buffers:
+            raise HTTPException(status_code=404, detail="Buffer not found")
+        if request.start_in_ticks < 0:
+            raise HTTPException(status_code=400, detail="start_in_ticks must not be negative")
+        
+        # Projected off the event loop from a copy taken between ticks;
+        # only applying the plan goes through the actor
+        base = capture_projection_base(get_scheduler())
+        start_tick = base['current_tick'] + request.start_in_ticks
+        end_tick = start_tick + request.duration_ticks if request.duration_ticks is not None else None
+        if end_tick is not None and end_tick <= start_tick:
+            raise HTTPException(status_code=400, detail="duration_ticks must be positive")
+        projection = await asyncio.to_thread(
+            project_impact, base, request.buffer_id, start_tick, end_tick
+        )
+        
+        plan = None
+        if request.apply:
+            plan = await get_state_actor().submit("plan_maintenance", {
+                "buffer_id": request.buffer_id,
+                "start_tick": start_tick,
+                "end_tick": end_tick,
+                "drain": request.drain
+            })
+        return {
+            "success": True,
+            "data": {"plan": plan, "projection": projection}
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Maintenance plan error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/buffers/maintenance/plans")
+async def get_maintenance_plans():
+    """Get scheduled and active maintenance plans (last published snapshot)"""
+    return {
+        "success": True,
+        "data": get_state_actor().snapshot.maintenance_plans
+    }
+
+@app.delete("/api/buffers/maintenance/plan/{buffer_id}")
+async def cancel_buffer_maintenance(buffer_id: str):
+    """Cancel a maintenance plan (an offline buffer comes back)"""
+    try:
+        plan = await get_state_actor().submit("cancel_maintenance", {"buffer_id": buffer_id})
+        return {
+            "success": True,
+            "data": plan
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/commands")
+async def get_command_log(limit: int = 100):
+    """Get the audit log of applied scheduler commands"""
+    return {
+        "success": True,
+        "data": get_state_actor().recent_commands(limit)
+    }
+
 @app.get("/api/simulation/status")
 async def get_simulation_status():
     """Get simulation status"""
+    snapshot = get_state_actor().snapshot
+    metrics = snapshot.metrics
+    return {
+        "running": get_simulation().running,
+        "tick": snapshot.tick,
+        "vehicles_processed": metrics["vehicles_processed"],
+        "throughput": metrics["throughput"],
+        "changeovers": metrics["total_changeovers"],
+        "efficiency": metrics["efficiency_percent"],
+        "tick_lag": get_simulation().tick_lag_report()
+    }
+
+@app.get("/api/planner")
+async def get_planner_status():
+    """Get conveyor pick strategy and the last planned sequence (last published snapshot)"""
+    snapshot = get_state_actor().snapshot
+    return {
+        "success": True,
+        "data": {
+            "strategy": settings.PICK_STRATEGY,
+            "horizon": settings.PLANNER_HORIZON,
+            "run_depth": settings.PLANNER_RUN_DEPTH,
+            "time_budget_ms": settings.PLANNER_TIME_BUDGET_MS,
+            "paint_changeovers": snapshot.metrics["paint_changeovers"],
+            **snapshot.planner
+        }
+    }
+
+@app.get("/api/conveyors")
+async def get_conveyor_status():
+    """Get per-conveyor throughput, changeovers and utilization (last published snapshot)"""
+    return {
+        "success": True,
+        "data": get_state_actor().snapshot.metrics.get("conveyors", {})
+    }
+
+@app.get("/api/forecast")
+async def get_occupancy_forecast():
+    """Get per-buffer time-to-full forecast and overflow risk (last published snapshot)"""
+    return {
+        "success": True,
+        "data": {
+            "enabled": settings.OVERFLOW_AVOIDANCE_ENABLED,
+            "horizon_ticks": settings.FORECAST_HORIZON_TICKS,
+            "buffers": get_state_actor().snapshot.forecasts
+        }
+    }
+
+@app.get("/api/exports")
+async def list_exports():
+    """List finished run exports"""
+    return {
+        "success": True,
+        "data": {
+            "enabled": run_exporter.enabled,
+            "format": run_exporter.file_format,
+            "active_run": run_exporter.run_id,
+            "runs": run_exporter.list_runs()
+        }
+    }
+
+@app.get("/api/exports/{run_id}/{table}")
+async def download_export(run_id: str, table: str):
+    """Download a finished run export (table: vehicles or metrics)"""
+    path = run_exporter.get_file(run_id, table)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return FileResponse(path, filename=os.path.basename(path),
+                        media_type="application/octet-stream")
+
+@app.get("/api/publisher")
+async def get_publisher_status():
+    """Get realtime publish cadence, effective write rate and budget"""
+    return {
+        "success": True,
+        "data": realtime_publisher.report()
+    }
+
+@app.get("/api/optimality/{run_id}")
+async def get_optimality_gap(run_id: str, max_vehicles: Optional[int] = None):
+    """Optimality-gap report of the scheduling strategies on an exported run's arrivals"""
+    try:
+        # Worker process: the searches would hold the GIL and slow ticks
+        report = await gap_reports.run(run_id, max_vehicles)
+        return {
+            "success": True,
+            "data": report
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Optimality report error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/simulation/event-run")
+async def run_event_simulation_endpoint(request: EventSimulationRequest):
+    """Discrete-event run on a fresh scheduler, with per-oven/per-color process times"""
+    try:
+        report = await asyncio.to_thread(
+            run_event_simulation,
+            request.num_vehicles, request.seed, request.mode, request.pattern,
+            request.overrides, request.process_times,
+            [(m.at_seconds, m.buffer_id, m.is_available) for m in request.maintenance],
+            request.horizon_seconds
+        )
+        return {
+            "success": True,
+            "data": report
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Event simulation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/topology")
+async def get_topology():
+    """Get the plant topology (ovens, buffers, conveyors, routes)"""
+    return {
+        "success": True,
+        "data": get_plant().spec.dict()
+    }
+
+@app.get("/api/profiling")
+async def get_profiling_report():
+    """Get per-phase allocations, memory growth and top sites from the last dump"""
     return {
-        "running": simulation.running,
-        "tick": simulation.tick,
-        "vehicles_processed": scheduler.metrics.vehicles_processed,
-        "throughput": scheduler.metrics.throughput,
-        "changeovers": scheduler.metrics.total_changeovers,
-        "efficiency": scheduler.metrics.efficiency_percent
+        "success": True,
+        "data": profiler.report()
+    }
+
+@app.post("/api/profiling")
+async def set_profiling(request: ProfilingRequest):
+    """Switch allocation profiling on or off at runtime"""
+    if request.enabled:
+        profiler.enable(get_simulation().tick)
+    else:
+        profiler.disable()
+    return {
+        "success": True,
+        "enabled": profiler.enabled
+    }
+
+@app.post("/api/profiling/dump")
+async def dump_profile():
+    """Snapshot allocations (top sites since the last dump) and write them to disk"""
+    try:
+        paths = profiler.dump()
+        return {
+            "success": True,
+            "data": paths
+        }
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Profile dump error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/shadow/start")
+async def start_shadow(request: ShadowStartRequest):
+    """Start shadow evaluation of candidate configurations (at the next tick boundary)"""
+    try:
+        result = await get_state_actor().submit("start_shadow", {
+            "candidates": [candidate.dict() for candidate in request.candidates]
+        })
+        return {
+            "success": True,
+            **result
+        }
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Shadow start error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/shadow/stop")
+async def stop_shadow():
+    """Stop shadow evaluation"""
+    result = await get_state_actor().submit("stop_shadow", {})
+    return {
+        "success": True,
+        **result
+    }
+
+@app.get("/api/shadow")
+async def get_shadow_report():
+    """Get shadow metrics side by side with live metrics"""
+    return {
+        "success": True,
+        "data": shadow_evaluator.report()
     }
 
 @app.get("/api/report")
 async def get_detailed_report():
     """Get comprehensive system report"""
     try:
-        metrics = scheduler.get_metrics_dict()
-        
-        # Color distribution analysis
-        color_distribution = {}
-        for car_id, vehicle in scheduler.vehicles_by_id.items():
-            color = vehicle['color']
-            buffer = vehicle.get('buffer')
-            if color not in color_distribution:
-                color_distribution[color] = {}
-            if buffer:
-                color_distribution[color][buffer] = color_distribution[color].get(buffer, 0) + 1
+        snapshot = get_state_actor().snapshot
+        metrics = snapshot.metrics
+        plant = get_plant()
         
         # Changeover analysis by buffer
         changeover_by_buffer = {}
-        for buffer_id, buffer in scheduler.buffers.items():
-            if buffer.last_color and buffer.current_color:
-                if buffer.last_color != buffer.current_color:
+        for buffer_id, buffer in snapshot.buffers.items():
+            if buffer["last_color"] and buffer["current_color"]:
+                if buffer["last_color"] != buffer["current_color"]:
                     changeover_by_buffer[buffer_id] = changeover_by_buffer.get(buffer_id, 0) + 1
         
         return {
             "success": True,
             "data": {
                 "summary": metrics,
-                "color_distribution": color_distribution,
+                "color_distribution": snapshot.color_distribution,
                 "changeover_by_buffer": changeover_by_buffer,
                 "strategy": {
                     "name": "Dynamic Color-Volume Based Allocation",
-                    "oven1_colors": ["C1", "C2", "C3"],
-                    "oven2_colors": ["C4", "C5", "C6", "C7", "C8", "C9", "C10", "C11", "C12"],
-                    "separation_maintained": scheduler.metrics.o2_stoppage_events == 0
+                    "topology": plant.spec.name,
+                    "oven_colors": {
+                        oven_id: plant.colors_of(oven_id) for oven_id in plant.oven_ids
+                    },
+                    "separation_maintained": metrics["o2_stoppage_events"] == 0
                 }
             }
         }
@@ -245,14 +651,39 @@ async def get_detailed_report():
 # Startup event
 @app.on_event("startup")
 async def startup_event():
+    startup_started = time.perf_counter()
     logger.info("Starting Smart Paint Shop Sequencing API")
     logger.info(f"Firebase Project: {settings.FIREBASE_PROJECT_ID}")
+    
+    mode = settings.STORAGE_CONNECT_MODE
+    if mode == "eager":
+        if not await asyncio.to_thread(firestore_service.connect):
+            firestore_service.connect_in_background()
+    elif mode == "background":
+        # Connector thread owned by the service, stopped on shutdown
+        firestore_service.connect_in_background()
+    
+    startup_seconds = round(IMPORT_SECONDS + time.perf_counter() - startup_started, 3)
+    startup_report["startup_seconds"] = startup_seconds
+    startup_report["within_budget"] = startup_seconds <= settings.STARTUP_BUDGET_SECONDS
+    
+    if startup_report["within_budget"]:
+        logger.info(f"⏱️ Startup {startup_seconds}s (import {IMPORT_SECONDS}s, storage: {mode})")
+    else:
+        logger.warning(
+            f"⏱️ Startup {startup_seconds}s exceeds budget "
+            f"{settings.STARTUP_BUDGET_SECONDS}s (import {IMPORT_SECONDS}s)"
+        )
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
+    simulation = get_simulation()
     if simulation.running:
         await simulation.stop()
+    shadow_evaluator.stop()
+    firestore_service.stop()
+    gap_reports.shutdown()
     logger.info("API shutdown complete")
 
 if __name__ == "__main__":
@@ -0,0 +1,245 @@
+# services/maintenance_planner.py
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Plan phases, in order
+SCHEDULED = "scheduled"        # Buffer runs normally
+DRAINING = "draining"          # Arrivals diverted, runs picked ahead of the window
+MAINTENANCE = "maintenance"    # Buffer unavailable
+PHASES = (SCHEDULED, DRAINING, MAINTENANCE)
+
+# Ticks projected past the end of the window (recovery)
+PROJECTION_TAIL_TICKS = 20
+
+
+class MaintenancePlan:
+    """Maintenance window for one buffer, in scheduler ticks"""
+
+    def __init__(self, buffer_id: str, start_tick: int, end_tick: Optional[int] = None,
+                 drain: bool = True, phase: str = SCHEDULED):
+        self.buffer_id = buffer_id
+        self.start_tick = start_tick
+        self.end_tick = end_tick        # None = until restored manually
+        self.drain = drain              # False = just take the buffer offline at start_tick
+        self.phase = phase
+        self.drain_started_tick: Optional[int] = None
+        self.cars_at_start: Optional[int] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'buffer_id': self.buffer_id,
+            'start_tick': self.start_tick,
+            'end_tick': self.end_tick,
+            'drain': self.drain,
+            'phase': self.phase,
+            'drain_started_tick': self.drain_started_tick,
+            'cars_at_start': self.cars_at_start
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MaintenancePlan":
+        plan = cls(data['buffer_id'], data['start_tick'], data.get('end_tick'),
+                   data.get('drain', True), data.get('phase', SCHEDULED))
+        plan.drain_started_tick = data.get('drain_started_tick')
+        plan.cars_at_start = data.get('cars_at_start')
+        return plan
+
+
+class MaintenancePlanner:
+    """
+    Drain-and-rebalance schedule for buffer maintenance windows.
+
+    A planned buffer starts draining as late as possible: once the picks it
+    still needs (one per front run, MAX_CONVEYOR_PICK cars each) plus
+    MAINTENANCE_DRAIN_MARGIN_TICKS reach the start of the window. While
+    draining, find_best_buffer diverts arrivals elsewhere (the buffer is only
+    a last resort) and the conveyor takes its runs whenever they continue
+    the last painted color, or unconditionally once there is no slack left.
+    At start_tick the buffer goes offline; at end_tick it comes back.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.plans: Dict[str, MaintenancePlan] = {}
+        self._changes: List[Tuple[str, bool]] = []   # Availability changes not yet reported
+
+    def drain_ticks(self, buffer_id: str) -> int:
+        """Conveyor picks needed to empty a buffer"""
+        max_pick = self.scheduler.settings.MAX_CONVEYOR_PICK
+        buffer = self.scheduler.buffers[buffer_id]
+        runs = self.scheduler.front_runs(buffer_id, max_runs=len(buffer.vehicles))
+        return sum(-(-length // max_pick) for _, length in runs)
+
+    def schedule(self, buffer_id: str, start_tick: int, end_tick: Optional[int] = None,
+                 drain: bool = True) -> MaintenancePlan:
+        if buffer_id not in self.scheduler.buffers:
+            raise KeyError(f"Buffer {buffer_id} not found")
+        if start_tick < self.scheduler.current_tick:
+            raise ValueError("Maintenance cannot start in the past")
+        if end_tick is not None and end_tick <= start_tick:
+            raise ValueError("Maintenance must end after it starts")
+
+        plan = MaintenancePlan(buffer_id, start_tick, end_tick, drain)
+        self.plans[buffer_id] = plan
+        self._advance(plan, self.scheduler.current_tick)
+        return plan
+
+    def cancel(self, buffer_id: str) -> Optional[MaintenancePlan]:
+        """Drop a plan; a buffer already offline comes back"""
+        plan = self.plans.pop(buffer_id, None)
+        if plan is not None and plan.phase == MAINTENANCE:
+            self._set_available(buffer_id, True)
+        return plan
+
+    def _set_available(self, buffer_id: str, is_available: bool):
+        self.scheduler.buffers[buffer_id].is_available = is_available
+        self._changes.append((buffer_id, is_available))
+
+    def _advance(self, plan: MaintenancePlan, tick: int):
+        if plan.phase == SCHEDULED and plan.drain:
+            lead = self.drain_ticks(plan.buffer_id) + self.scheduler.settings.MAINTENANCE_DRAIN_MARGIN_TICKS
+            if tick + lead >= plan.start_tick:
+                plan.phase = DRAINING
+                plan.drain_started_tick = tick
+                logger.info(f"🔧 Draining {plan.buffer_id} for maintenance at tick {plan.start_tick}")
+
+        if plan.phase in (SCHEDULED, DRAINING) and tick >= plan.start_tick:
+            plan.phase = MAINTENANCE
+            plan.cars_at_start = self.scheduler.buffers[plan.buffer_id].current_occupancy
+            self._set_available(plan.buffer_id, False)
+            if plan.cars_at_start:
+                logger.warning(f"🔧 {plan.buffer_id} offline with {plan.cars_at_start} cars still inside")
+
+        if plan.phase == MAINTENANCE and plan.end_tick is not None and tick >= plan.end_tick:
+            del self.plans[plan.buffer_id]
+            self._set_available(plan.buffer_id, True)
+            logger.info(f"🔧 Maintenance of {plan.buffer_id} finished")
+
+    def begin_tick(self, tick: int):
+        for plan in list(self.plans.values()):
+            self._advance(plan, tick)
+
+    def take_changes(self) -> List[Tuple[str, bool]]:
+        """Availability changes since the last call, as (buffer_id, is_available)"""
+        changes, self._changes = self._changes, []
+        return changes
+
+    def is_diverting(self, buffer_id: str) -> bool:
+        plan = self.plans.get(buffer_id)
+        return plan is not None and plan.phase == DRAINING
+
+    def drain_picks(self, candidates: List[str]) -> List[str]:
+        """Buffers the conveyor should pick from now, among candidates"""
+        if not self.plans:
+            return []
+        scheduler = self.scheduler
+        last_colors = {c.last_color for c in scheduler.metrics.conveyors.values()}
+        picks = []
+        for buffer_id in candidates:
+            plan = self.plans.get(buffer_id)
+            if plan is None or plan.phase == SCHEDULED:
+                continue
+            # Cars left in an offline buffer are always picked first
+            slack = plan.start_tick - scheduler.current_tick - self.drain_ticks(buffer_id)
+            color, _ = scheduler.best_continuous_run(buffer_id)
+            if plan.phase == MAINTENANCE or slack <= 0 or color in last_colors:
+                picks.append(buffer_id)
+        return picks
+
+    def export(self) -> List[Dict]:
+        return [plan.to_dict() for plan in self.plans.values()]
+
+    def restore(self, plans: List[Dict]):
+        self.plans = {data['buffer_id']: MaintenancePlan.from_dict(data) for data in plans}
+
+
+def capture_projection_base(live) -> Dict:
+    """
+    Copy of what a projection starts from. Take it between ticks; the
+    projection itself can then run off the event loop.
+    """
+    return {
+        'state': live.export_state(),
+        'topology': live.topology,
+        'overrides': live.settings.model_dump(),
+        'current_tick': live.current_tick
+    }
+
+
+def _replay(base: Dict, plan: Optional[Dict], ticks: int) -> Dict:
+    from services.scheduler import PaintShopScheduler
+
+    projection = PaintShopScheduler(topology=base['topology'], overrides=base['overrides'])
+    projection.restore_state(base['state'])
+    current_tick = projection.current_tick = base['current_tick']
+    scheduled = projection.maintenance.schedule(**plan) if plan is not None else None
+
+    queued = sum(len(queue) for queue in projection.ovens.values())
+    buffered = sum(buffer.current_occupancy for buffer in projection.buffers.values())
+    for tick in range(current_tick + 1, current_tick + ticks + 1):
+        projection.begin_tick(tick)
+        for oven_name in projection.ovens:
+            projection.step_oven(oven_name)
+        projection.pick_from_conveyor()
+
+    projection.refresh_metrics()
+    metrics = projection.metrics
+    return {
+        'throughput': metrics.throughput,
+        'paint_changeovers': metrics.paint_changeovers,
+        'total_changeovers': metrics.total_changeovers,
+        'buffer_overflow_events': metrics.buffer_overflow_events,
+        'lost_time_seconds': metrics.total_lost_time_seconds,
+        # Recorded when the buffer went offline (right away for a window starting now)
+        'cars_in_buffer_at_start': scheduled.cars_at_start if scheduled is not None else None,
+        'cars_left': queued + buffered - metrics.throughput
+    }
+
+
+def project_impact(base: Dict, buffer_id: str, start_tick: int, end_tick: Optional[int] = None,
+                   horizon_ticks: Optional[int] = None) -> Dict:
+    """
+    Replay the queued and buffered cars of a captured base (see
+    capture_projection_base): with the drain plan, with the buffer simply
+    taken offline at start_tick, and without maintenance. Future arrivals
+    are not known, so only the current queues are projected.
+    """
+    started = time.perf_counter()
+    if buffer_id not in base['state']['buffers']:
+        raise KeyError(f"Buffer {buffer_id} not found")
+
+    overrides = base['overrides']
+    max_ticks = overrides['MAINTENANCE_PROJECTION_MAX_TICKS']
+    window_end = end_tick if end_tick is not None else start_tick + overrides['MAINTENANCE_DRAIN_MARGIN_TICKS']
+    ticks = min(horizon_ticks or (window_end - base['current_tick'] + PROJECTION_TAIL_TICKS), max_ticks)
+    ticks = max(ticks, 1)
+
+    # Without an existing plan for this buffer, so scenarios only differ by theirs
+    state = dict(base['state'])
+    state['maintenance_plans'] = [p for p in state['maintenance_plans'] if p['buffer_id'] != buffer_id]
+    base = {**base, 'state': state}
+    window = {'buffer_id': buffer_id, 'start_tick': start_tick, 'end_tick': end_tick}
+    scenarios = {
+        'planned': _replay(base, {**window, 'drain': True}, ticks),
+        'unplanned': _replay(base, {**window, 'drain': False}, ticks),
+        'no_maintenance': _replay(base, None, ticks)
+    }
+    planned, unplanned, baseline = (scenarios[k] for k in ('planned', 'unplanned', 'no_maintenance'))
+
+    return {
+        'horizon_ticks': ticks,
+        'base_tick': base['current_tick'],
+        'scenarios': scenarios,
+        'planned_vs_unplanned': {
+            key: planned[key] - unplanned[key]
+            for key in ('throughput', 'paint_changeovers', 'buffer_overflow_events', 'lost_time_seconds')
+        },
+        'planned_cost': {
+            key: planned[key] - baseline[key]
+            for key in ('throughput', 'paint_changeovers', 'buffer_overflow_events', 'lost_time_seconds')
+        },
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -0,0 +1,267 @@
+# services/metrics_history.py
+import time
+from typing import Dict, List, Optional, Tuple
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cumulative counters keep their last value when downsampled
+COUNTER_FIELDS = (
+    'vehicles_processed', 'throughput', 'total_changeovers',
+    'paint_changeovers', 'buffer_overflow_events', 'o2_stoppage_events'
+)
+
+# Gauges are averaged when downsampled
+GAUGE_FIELDS = ('efficiency_percent',)
+
+
+class RingSeries:
+    """Fixed-capacity ring of (timestamp, point) pairs, oldest first"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._timestamps: List[float] = [0.0] * capacity
+        self._points: List[Optional[Tuple]] = [None] * capacity
+        self._start = 0
+        self.size = 0
+
+    def append(self, timestamp: float, point: Tuple):
+        if self.size < self.capacity:
+            index = (self._start + self.size) % self.capacity
+            self.size += 1
+        else:
+            # Overwrite the oldest point
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._timestamps[index] = timestamp
+        self._points[index] = point
+
+    def _timestamp_at(self, i: int) -> float:
+        return self._timestamps[(self._start + i) % self.capacity]
+
+    def _lower_bound(self, timestamp: float, inclusive: bool = False) -> int:
+        """Logical index of the first point at or after timestamp (after it if inclusive)"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ts = self._timestamp_at(mid)
+            if ts < timestamp or (inclusive and ts == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def oldest(self) -> Optional[float]:
+        return self._timestamp_at(0) if self.size else None
+
+    def count(self, from_ts: float, to_ts: float) -> int:
+        """Number of points with from_ts <= timestamp <= to_ts, O(log n)"""
+        return max(0, self._lower_bound(to_ts, inclusive=True) - self._lower_bound(from_ts))
+
+    def query(self, from_ts: float, to_ts: float, limit: int) -> List[Tuple[float, Tuple]]:
+        """Newest (at most limit) points with from_ts <= timestamp <= to_ts, oldest first"""
+        end = self._lower_bound(to_ts, inclusive=True)
+        start = max(self._lower_bound(from_ts), end - limit)
+        return [
+            (self._timestamps[(self._start + i) % self.capacity],
+             self._points[(self._start + i) % self.capacity])
+            for i in range(start, end)
+        ]
+
+    def clear(self):
+        self._points = [None] * self.capacity
+        self._start = 0
+        self.size = 0
+
+
+class _Downsampler:
+    """Aggregates incoming points into fixed time buckets"""
+
+    def __init__(self, bucket_seconds: float, series: RingSeries):
+        self.bucket_seconds = bucket_seconds
+        self.series = series
+        self._bucket_start: Optional[float] = None
+        self._count = 0
+        self._sums: List[float] = []
+        self._last: Optional[Tuple] = None
+
+    def add(self, timestamp: float, point: Tuple, num_counters: int):
+        bucket_start = timestamp - (timestamp % self.bucket_seconds)
+        if self._bucket_start is not None and bucket_start != self._bucket_start:
+            self.flush(num_counters)
+
+        if self._count == 0:
+            self._bucket_start = bucket_start
+            self._sums = [0.0] * len(point)
+        self._count += 1
+        for i, value in enumerate(point):
+            self._sums[i] += value
+        self._last = point
+
+    def reset(self):
+        self._count = 0
+        self._bucket_start = None
+        self._last = None
+
+    def pending(self, num_counters: int) -> Optional[Tuple[float, Tuple]]:
+        """The bucket still filling, aggregated so far"""
+        if self._count == 0:
+            return None
+        # tick and counters: last value; gauges and occupancy: mean
+        point = self._last[:num_counters] + tuple(
+            round(total / self._count, 3) for total in self._sums[num_counters:]
+        )
+        return self._bucket_start, point
+
+    def flush(self, num_counters: int):
+        pending = self.pending(num_counters)
+        if pending is None:
+            return
+        self.series.append(*pending)
+        self._count = 0
+        self._bucket_start = None
+
+
+class MetricsHistory:
+    """
+    Bounded in-memory time series of per-tick metrics and buffer occupancy.
+    Keeps raw ticks plus 1 min and 10 min downsampled levels, each in a
+    fixed-size ring, so memory stays flat over multi-day runs.
+    """
+
+    STEPS = {"tick": 0, "1m": 60, "10m": 600}
+
+    def __init__(self, tick_points: int = 7200, minute_points: int = 1440,
+                 ten_minute_points: int = 1008, max_query_points: int = 5000):
+        self.max_query_points = max_query_points
+        self.levels = {
+            "tick": RingSeries(tick_points),
+            "1m": RingSeries(minute_points),
+            "10m": RingSeries(ten_minute_points)
+        }
+        self._downsamplers = {
+            "1m": _Downsampler(60, self.levels["1m"]),
+            "10m": _Downsampler(600, self.levels["10m"])
+        }
+        self.buffer_ids: List[str] = []
+        self.first_timestamp: Optional[float] = None
+
+        # Point layout: tick, counters..., gauges..., buffer occupancy...
+        self._num_counters = 1 + len(COUNTER_FIELDS)
+
+    def record(self, tick: int, metrics, buffers: Dict, timestamp: Optional[float] = None):
+        """Append one tick (metrics: SystemMetrics, buffers: buffer_id -> BufferState)"""
+        if timestamp is None:
+            timestamp = time.time()
+        if not self.buffer_ids:
+            self.buffer_ids = list(buffers.keys())
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+
+        point = (
+            (tick,)
+            + tuple(getattr(metrics, field) for field in COUNTER_FIELDS)
+            + tuple(getattr(metrics, field) for field in GAUGE_FIELDS)
+            + tuple(buffers[bid].current_occupancy for bid in self.buffer_ids)
+        )
+
+        self.levels["tick"].append(timestamp, point)
+        for downsampler in self._downsamplers.values():
+            downsampler.add(timestamp, point, self._num_counters)
+
+    def _count(self, level: str, from_ts: float, to_ts: float) -> int:
+        count = self.levels[level].count(from_ts, to_ts)
+        pending = self._pending(level)
+        if pending is not None and from_ts <= pending[0] <= to_ts:
+            count += 1
+        return count
+
+    def _pending(self, level: str) -> Optional[Tuple[float, Tuple]]:
+        downsampler = self._downsamplers.get(level)
+        return downsampler.pending(self._num_counters) if downsampler else None
+
+    def resolve_step(self, step: Optional[str], from_ts: float, to_ts: Optional[float] = None) -> str:
+        """
+        Explicit step name or seconds, else the finest level that still holds
+        everything recorded since from_ts and fits max_query_points
+        """
+        if step in self.STEPS:
+            return step
+        if step:
+            seconds = float(step)
+            return max(
+                (name for name, size in self.STEPS.items() if size <= seconds),
+                key=lambda name: self.STEPS[name]
+            )
+        if self.first_timestamp is None:
+            return "tick"
+        if to_ts is None:
+            to_ts = time.time()
+        # Nothing was recorded before first_timestamp, so a level starting there is complete
+        needed = max(from_ts, self.first_timestamp)
+        for name in ("tick", "1m", "10m"):
+            oldest = self.levels[name].oldest()
+            if oldest is None and self._pending(name) is not None:
+                oldest = self._pending(name)[0]
+            if (oldest is not None and oldest <= needed
+                    and self._count(name, from_ts, to_ts) <= self.max_query_points):
+                return name
+        return "10m"
+
+    def query(self, from_ts: Optional[float] = None, to_ts: Optional[float] = None,
+              step: Optional[str] = None) -> Dict:
+        """
+        History between from_ts and to_ts (epoch seconds), newest hour by
+        default. Beyond max_query_points the newest points are kept and
+        truncated is set.
+        """
+        if to_ts is None:
+            to_ts = time.time()
+        if from_ts is None:
+            from_ts = to_ts - 3600
+
+        level = self.resolve_step(step, from_ts, to_ts)
+        limit = self.max_query_points
+        # Include the downsampled bucket still filling, so coarse levels don't lag
+        pending = self._pending(level)
+        if pending is not None and not from_ts <= pending[0] <= to_ts:
+            pending = None
+        points = self.levels[level].query(from_ts, to_ts, limit - 1 if pending else limit)
+        if pending is not None:
+            points.append(pending)
+        truncated = self._count(level, from_ts, to_ts) > len(points)
+
+        metric_fields = COUNTER_FIELDS + GAUGE_FIELDS
+        num_metrics = len(metric_fields)
+        return {
+            "step": level,
+            "from": from_ts,
+            "to": to_ts,
+            "count": len(points),
+            "truncated": truncated,
+            "points": [
+                {
+                    "t": timestamp,
+                    "tick": point[0],
+                    "metrics": dict(zip(metric_fields, point[1:1 + num_metrics])),
+                    "buffers": dict(zip(self.buffer_ids, point[1 + num_metrics:]))
+                }
+                for timestamp, point in points
+            ]
+        }
+
+    def clear(self):
+        for series in self.levels.values():
+            series.clear()
+        for downsampler in self._downsamplers.values():
+            downsampler.reset()
+        self.buffer_ids = []
+        self.first_timestamp = None
+
+# Singleton instance
+metrics_history = MetricsHistory(
+    tick_points=settings.METRICS_HISTORY_TICK_POINTS,
+    minute_points=settings.METRICS_HISTORY_MINUTE_POINTS,
+    ten_minute_points=settings.METRICS_HISTORY_TEN_MINUTE_POINTS
+)
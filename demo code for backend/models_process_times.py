@@ -0,0 +1,25 @@
+# models/process_times.py
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class DurationSpec(BaseModel):
+    """A process-time distribution, in seconds"""
+    dist: str = "fixed"            # fixed | uniform | normal | lognormal | exponential
+    mean: float = 60.0
+    cv: float = 0.0                # Coefficient of variation (normal, lognormal)
+    low: Optional[float] = None    # Bounds for uniform; floor for normal
+    high: Optional[float] = None
+
+
+class ProcessTimes(BaseModel):
+    """Cycle times for the discrete-event simulation"""
+    # Oven cycle per car: per color, else per oven, else oven_default
+    oven_default: DurationSpec = Field(default_factory=lambda: DurationSpec(mean=60.0))
+    ovens: dict[str, DurationSpec] = Field(default_factory=dict)
+    colors: dict[str, DurationSpec] = Field(default_factory=dict)
+    # Conveyor transfer per picked car, plus a setup when the paint color changes
+    conveyor_per_car: DurationSpec = Field(default_factory=lambda: DurationSpec(mean=15.0))
+    changeover_seconds: float = 60.0
+    # Time between arrivals; None = ovens never starve (queues kept topped up)
+    interarrival: Optional[DurationSpec] = None
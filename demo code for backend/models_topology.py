@@ -0,0 +1,43 @@
+# models/topology.py
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class OvenSpec(BaseModel):
+    oven_id: str
+    colors: list[str] = Field(default_factory=list)
+    # Only spill into other ovens' buffers once all own buffers are full
+    cross_oven_overflow_only: bool = False
+
+
+class BufferSpec(BaseModel):
+    buffer_id: str
+    capacity: int
+    oven: str
+    primary_colors: list[str] = Field(default_factory=list)
+    is_flex: bool = False
+
+
+class RouteSpec(BaseModel):
+    buffer_id: str
+    penalty: int = 0  # Extra seconds charged when this route causes a changeover
+
+
+class ConveyorSpec(BaseModel):
+    conveyor_id: str
+    # Buffers this conveyor can pick from; empty = all
+    buffers: list[str] = Field(default_factory=list)
+
+
+class PlantTopology(BaseModel):
+    """Plant layout as data: ovens, buffers, conveyors and color routes"""
+    name: str = "default"
+    ovens: list[OvenSpec]
+    buffers: list[BufferSpec]
+    # Color -> allowed buffers in preference order
+    routes: dict[str, list[RouteSpec]]
+    conveyors: list[ConveyorSpec] = Field(
+        default_factory=lambda: [ConveyorSpec(conveyor_id="M1")]
+    )
+    # Oven for colors not listed on any oven
+    default_oven: Optional[str] = None
@@ -14,7 +14,7 @@ class VehicleStatus(str, Enum):
 class Vehicle(BaseModel):
     car_id: int
     color: str
-    oven: str  # O1 or O2
+    oven: str  # Oven id from the plant topology (O1, O2, ...)
     buffer: Optional[str] = None
     status: VehicleStatus = VehicleStatus.WAITING
     batch_id: Optional[str] = None
@@ -50,9 +50,21 @@ class BufferState(BaseModel):
     def occupancy_percentage(self) -> float:
         return (self.current_occupancy / self.capacity) * 100 if self.capacity > 0 else 0
 
+class ConveyorState(BaseModel):
+    conveyor_id: str
+    last_color: Optional[str] = None
+    ticks: int = 0              # Ticks this conveyor was offered a pick
+    busy_ticks: int = 0         # Ticks it picked something
+    picks: int = 0
+    vehicles_painted: int = 0
+    paint_changeovers: int = 0
+    utilization_percent: float = 0.0   # busy_ticks / ticks
+    capacity_percent: float = 0.0      # vehicles_painted / (ticks * MAX_CONVEYOR_PICK)
+
 class SystemMetrics(BaseModel):
     vehicles_processed: int = 0
     total_changeovers: int = 0
+    paint_changeovers: int = 0
     o2_stoppage_events: int = 0
     overflow_events: int = 0
     buffer_overflow_events: int = 0
@@ -69,7 +81,12 @@ class SystemMetrics(BaseModel):
     # Buffer states
     buffer_states: dict[str, BufferState] = Field(default_factory=dict)
     
-    # Zone utilization
+    # Main conveyors (one entry per topology conveyor)
+    conveyors: dict[str, ConveyorState] = Field(default_factory=dict)
+    
+    # Zone utilization (per oven zone; oven1_*/oven2_* mirror the first two)
+    oven_occupancy: dict[str, int] = Field(default_factory=dict)
+    oven_capacity: dict[str, int] = Field(default_factory=dict)
     oven1_occupancy: int = 0
     oven1_capacity: int = 56
     oven2_occupancy: int = 0
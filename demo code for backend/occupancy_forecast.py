@@ -0,0 +1,114 @@
+# services/occupancy_forecast.py
+from typing import Dict, List
+from models.vehicle import BufferState
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Buffer risk levels
+RISK_NORMAL = "normal"
+RISK_STRICT = "strict"    # Occupancy above threshold: same color only
+RISK_DIVERT = "divert"    # Forecast to fill within horizon: send arrivals elsewhere
+
+
+class OccupancyForecaster:
+    """
+    Predicts time-to-full for each buffer from smoothed fill/drain rates
+    and the colors already queued in the ovens.
+    """
+
+    def __init__(self, horizon_ticks: int = 20, smoothing: float = 0.2,
+                 threshold: float = 0.85, oven_rate: int = 1,
+                 routes: Dict[str, List[str]] = None):
+        # Also reached with unvalidated per-instance overrides (shadow/offline runs)
+        if horizon_ticks < 1:
+            raise ValueError("Forecast horizon must be at least one tick")
+        self.horizon_ticks = horizon_ticks
+        self.smoothing = smoothing
+        self.threshold = threshold
+        self.oven_rate = oven_rate
+        self.routes = routes or {}  # color -> buffer ids in preference order
+
+        # Cars/tick, exponentially smoothed
+        self.fill_rate: Dict[str, float] = {}
+        self.drain_rate: Dict[str, float] = {}
+
+        # Counters for the tick in progress
+        self._fills: Dict[str, int] = {}
+        self._drains: Dict[str, int] = {}
+
+        self.forecasts: Dict[str, Dict] = {}
+        self.risk: Dict[str, str] = {}
+
+    def record_fill(self, buffer_id: str, count: int = 1):
+        self._fills[buffer_id] = self._fills.get(buffer_id, 0) + count
+
+    def record_drain(self, buffer_id: str, count: int):
+        self._drains[buffer_id] = self._drains.get(buffer_id, 0) + count
+
+    def risk_of(self, buffer_id: str) -> str:
+        return self.risk.get(buffer_id, RISK_NORMAL)
+
+    def update(self, buffers: Dict[str, BufferState], queued: Dict[str, List[str]]):
+        """
+        Fold last tick's counters into the rates and refresh forecasts.
+        queued: oven -> colors at the head of that oven queue (next cars first)
+        """
+        alpha = self.smoothing
+        for buffer_id in buffers:
+            fills = self._fills.get(buffer_id, 0)
+            drains = self._drains.get(buffer_id, 0)
+            self.fill_rate[buffer_id] = (1 - alpha) * self.fill_rate.get(buffer_id, 0.0) + alpha * fills
+            self.drain_rate[buffer_id] = (1 - alpha) * self.drain_rate.get(buffer_id, 0.0) + alpha * drains
+        self._fills.clear()
+        self._drains.clear()
+
+        incoming = self._route_queued(buffers, queued)
+        horizon = self.horizon_ticks
+
+        for buffer_id, buffer in buffers.items():
+            space = buffer.available_space()
+
+            # Known arrivals beat history; fall back to the smoothed fill rate
+            inflow = max(incoming.get(buffer_id, 0) / horizon, self.fill_rate[buffer_id])
+            net_rate = inflow - self.drain_rate[buffer_id]
+            ticks_to_full = space / net_rate if net_rate > 0 else None
+
+            occupancy = buffer.current_occupancy / buffer.capacity if buffer.capacity else 1.0
+            if ticks_to_full is not None and ticks_to_full <= horizon:
+                risk = RISK_DIVERT
+            elif occupancy >= self.threshold:
+                risk = RISK_STRICT
+            else:
+                risk = RISK_NORMAL
+
+            if risk != self.risk.get(buffer_id, RISK_NORMAL):
+                logger.debug(f"Buffer {buffer_id} risk {self.risk.get(buffer_id, RISK_NORMAL)} -> {risk}")
+
+            self.risk[buffer_id] = risk
+            self.forecasts[buffer_id] = {
+                'occupancy_percent': round(occupancy * 100, 1),
+                'fill_rate': round(inflow, 3),
+                'drain_rate': round(self.drain_rate[buffer_id], 3),
+                'queued_arrivals': incoming.get(buffer_id, 0),
+                'ticks_to_full': round(ticks_to_full, 1) if ticks_to_full is not None else None,
+                'risk': risk
+            }
+
+    def _route_queued(self, buffers: Dict[str, BufferState],
+                      queued: Dict[str, List[str]]) -> Dict[str, int]:
+        """Expected buffer of each queued car over the horizon (first preferred lane with room)"""
+        projected = {bid: b.current_occupancy for bid, b in buffers.items()}
+        incoming: Dict[str, int] = {}
+        lookahead = self.horizon_ticks * self.oven_rate
+
+        for colors in queued.values():
+            for color in colors[:lookahead]:
+                for buffer_id in self.routes.get(color, []):
+                    buffer = buffers[buffer_id]
+                    if buffer.is_available and projected[buffer_id] < buffer.capacity:
+                        projected[buffer_id] += 1
+                        incoming[buffer_id] = incoming.get(buffer_id, 0) + 1
+                        break
+
+        return incoming
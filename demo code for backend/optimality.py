@@ -0,0 +1,374 @@
+# services/optimality.py
+import asyncio
+import heapq
+import itertools
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from services.scheduler import PaintShopScheduler
+from services.topology import CompiledTopology, get_plant
+from services.run_export import run_exporter
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# An arrival sequence: (color, oven) per car, in oven arrival order
+ArrivalSequence = List[Tuple[str, str]]
+
+
+class ChangeoverBoundSolver:
+    """
+    Minimum paint changeovers for an arrival sequence under the scheduler's
+    tick model, or a lower bound when the search budget runs out.
+
+    Each tick every oven releases up to oven_rate cars, in order, into any
+    routed buffer with room (an oven only waits when all its routes are
+    full), then the conveyor takes the front run of one buffer, up to
+    max_pick cars. Lane and pick choices are free, so every schedule the
+    live heuristics can produce is a candidate here.
+
+    Search is A* over (oven positions, buffer contents, last color) with
+    0/1 costs and an admissible block-count heuristic. When the budget runs
+    out, the smallest f on the frontier is still a valid lower bound.
+    """
+
+    def __init__(self, topology: Optional[CompiledTopology] = None,
+                 oven_rate: int = 1, max_pick: int = 8,
+                 max_states: int = 500000, time_budget_s: float = 10.0):
+        self.topology = topology or get_plant()
+        self.oven_rate = oven_rate
+        self.max_pick = max_pick
+        self.max_states = max_states
+        self.time_budget_s = time_budget_s
+
+    def solve(self, sequence: ArrivalSequence) -> Dict:
+        started = time.perf_counter()
+        topology = self.topology
+        max_pick = self.max_pick
+
+        colors = sorted({color for color, _ in sequence})
+        color_index = {color: i for i, color in enumerate(colors)}
+        buffer_ids = topology.buffer_ids
+        buffer_index = {bid: i for i, bid in enumerate(buffer_ids)}
+        capacity = [topology.buffers[bid].capacity for bid in buffer_ids]
+
+        queues = tuple(
+            tuple(color_index[color] for color, oven in sequence if oven == oven_id)
+            for oven_id in topology.oven_ids
+        )
+        eligible = [
+            tuple(buffer_index[c.buffer_id] for c in topology.candidates.get(color, ()))
+            for color in colors
+        ]
+        unroutable = [color for color, routes in zip(colors, eligible) if not routes]
+        if unroutable:
+            raise ValueError(f"No buffer route for colors: {unroutable}")
+
+        # Interchangeable buffers: same capacity and same routed colors
+        signature = {}
+        buffer_class = [
+            signature.setdefault(
+                (capacity[b], frozenset(c for c, routes in enumerate(eligible) if b in routes)),
+                len(signature)
+            )
+            for b in range(len(buffer_ids))
+        ]
+
+        # Color bitmask of each queue suffix
+        suffix_masks = []
+        for queue in queues:
+            masks = [0] * (len(queue) + 1)
+            for i in range(len(queue) - 1, -1, -1):
+                masks[i] = masks[i + 1] | (1 << queue[i])
+            suffix_masks.append(masks)
+
+        def heuristic(positions, buffers, last) -> int:
+            # Each color needs as many paint blocks as it has separate runs in
+            # any one buffer (at least one); the first block may be free
+            mask = 0
+            for o, pos in enumerate(positions):
+                mask |= suffix_masks[o][pos]
+            runs_needed = {}
+            for buf in buffers:
+                runs = {}
+                previous = -1
+                for color in buf:
+                    if color != previous:
+                        runs[color] = runs.get(color, 0) + 1
+                        previous = color
+                for color, count in runs.items():
+                    if count > runs_needed.get(color, 0):
+                        runs_needed[color] = count
+                    mask |= 1 << color
+            if not mask:
+                return 0
+            blocks = bin(mask).count("1") + sum(runs_needed.values()) - len(runs_needed)
+            free_first = last < 0 or (mask >> last & 1)
+            return blocks - 1 if free_first else blocks
+
+        def releases(positions, buffers):
+            """Every way this tick's oven releases can be routed"""
+            layouts = [(positions, buffers)]
+            for o, queue in enumerate(queues):
+                for _ in range(self.oven_rate):
+                    expanded_layouts = []
+                    for layout_positions, layout_buffers in layouts:
+                        pos = layout_positions[o]
+                        if pos == len(queue):
+                            expanded_layouts.append((layout_positions, layout_buffers))
+                            continue
+                        color = queue[pos]
+                        next_positions = layout_positions[:o] + (pos + 1,) + layout_positions[o + 1:]
+                        routed = False
+                        tried_empty = set()
+                        for b in eligible[color]:
+                            buf = layout_buffers[b]
+                            if len(buf) >= capacity[b]:
+                                continue
+                            routed = True
+                            if not buf:
+                                if buffer_class[b] in tried_empty:
+                                    continue
+                                tried_empty.add(buffer_class[b])
+                            expanded_layouts.append((
+                                next_positions,
+                                layout_buffers[:b] + (buf + (color,),) + layout_buffers[b + 1:]
+                            ))
+                        if not routed:
+                            # All routes full: the oven waits
+                            expanded_layouts.append((layout_positions, layout_buffers))
+                    layouts = expanded_layouts
+            return set(layouts)
+
+        start = (tuple(0 for _ in queues), tuple(() for _ in buffer_ids), -1)
+        best_g = {start: 0}
+        counter = itertools.count()
+        remaining_cars = len(sequence)
+        # Ties go to states with fewer cars left, which reach a goal sooner
+        open_heap = [(heuristic(*start), remaining_cars, next(counter), 0, start)]
+        expanded = 0
+        bound = open_heap[0][0]
+        result = None
+
+        while open_heap:
+            f, remaining_cars, _, g, state = heapq.heappop(open_heap)
+            if g > best_g.get(state, g):
+                continue
+            bound = max(bound, f)
+            if remaining_cars == 0:
+                result = g
+                break
+
+            expanded += 1
+            if expanded >= self.max_states or time.perf_counter() - started > self.time_budget_s:
+                break
+
+            positions, buffers, last = state
+            for next_positions, next_buffers in releases(positions, buffers):
+                # Conveyor takes the front run of one buffer (identical buffers once)
+                picks = {}
+                for b, buf in enumerate(next_buffers):
+                    if buf:
+                        picks.setdefault((buffer_class[b], buf), b)
+                successors = []
+                for b in picks.values():
+                    buf = next_buffers[b]
+                    color = buf[0]
+                    run = 1
+                    while run < len(buf) and run < max_pick and buf[run] == color:
+                        run += 1
+                    cost = 1 if last >= 0 and color != last else 0
+                    successors.append((
+                        cost, next_buffers[:b] + (buf[run:],) + next_buffers[b + 1:], color, run
+                    ))
+                if not successors:
+                    successors.append((0, next_buffers, last, 0))
+
+                for cost, picked_buffers, next_last, picked in successors:
+                    next_state = (next_positions, picked_buffers, next_last)
+                    next_g = g + cost
+                    if next_g < best_g.get(next_state, next_g + 1):
+                        best_g[next_state] = next_g
+                        h = heuristic(next_positions, picked_buffers, next_last)
+                        heapq.heappush(open_heap, (
+                            next_g + h, remaining_cars - picked, next(counter), next_g, next_state
+                        ))
+
+        if result is None and open_heap:
+            bound = max(bound, open_heap[0][0])
+
+        return {
+            'lower_bound': result if result is not None else bound,
+            'optimal': result is not None,
+            'states_expanded': expanded,
+            'states_seen': len(best_g),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+
+
+def replay_changeovers(sequence: ArrivalSequence, strategy: str,
+                       topology: Optional[CompiledTopology] = None,
+                       max_ticks: int = 100000) -> Dict:
+    """Run the live scheduler on a sequence (all cars queued up front)"""
+    shadow = PaintShopScheduler(topology=topology, overrides={'PICK_STRATEGY': strategy})
+    for car_id, (color, oven) in enumerate(sequence):
+        shadow.vehicles_by_id[car_id] = {
+            'car_id': car_id, 'color': color, 'oven': oven, 'priority': int(color[1:])
+        }
+        shadow.ovens[oven].append(car_id)
+
+    tick = 0
+    while tick < max_ticks and (
+        any(shadow.ovens.values()) or any(b.vehicles for b in shadow.buffers.values())
+    ):
+        tick += 1
+        shadow.begin_tick(tick)
+        for oven_name in shadow.ovens:
+            shadow.step_oven(oven_name)
+        shadow.pick_from_conveyor()
+
+    return {
+        'paint_changeovers': shadow.metrics.paint_changeovers,
+        'buffer_overflow_events': shadow.metrics.buffer_overflow_events,
+        'ticks': tick,
+        'completed': shadow.metrics.throughput == len(sequence)
+    }
+
+
+def load_logged_run(run_id: str) -> "pd.DataFrame":
+    """Painted vehicles of an exported run, in arrival order"""
+    # Imported here (it is slow to import) so only the report worker pays for it
+    import pandas as pd
+
+    path = run_exporter.get_file(run_id, "vehicles")
+    if path is None:
+        raise FileNotFoundError(f"No vehicle export for run {run_id}")
+
+    columns = ["car_id", "color", "oven", "arrival_tick", "arrival_time"]
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path, columns=columns)
+    else:
+        frame = pd.read_feather(path, columns=columns)
+    return frame.sort_values(["arrival_tick", "arrival_time", "car_id"]).reset_index(drop=True)
+
+
+def gap_report(frame: "pd.DataFrame", strategies: Sequence[str] = ("greedy", "planner"),
+               max_vehicles: Optional[int] = None, window: Optional[int] = None,
+               solver: Optional[ChangeoverBoundSolver] = None,
+               time_budget_s: Optional[float] = None) -> Dict:
+    """
+    Optimality gap of the scheduler strategies on a logged arrival sequence.
+
+    Exact search only scales to a few dozen cars, so the first max_vehicles
+    arrivals are cut into windows of `window` cars. Each window is solved
+    and replayed as its own instance (empty buffers, all cars queued), and
+    the gaps are summed over windows. No window is started once
+    time_budget_s has passed; the report then covers fewer cars and is
+    marked truncated.
+    """
+    started = time.perf_counter()
+    solver = solver or ChangeoverBoundSolver(
+        oven_rate=settings.OVEN_PRODUCTION_RATE,
+        max_pick=settings.MAX_CONVEYOR_PICK,
+        max_states=settings.OPTIMALITY_MAX_STATES,
+        time_budget_s=settings.OPTIMALITY_TIME_BUDGET_SECONDS
+    )
+    window = window or settings.OPTIMALITY_WINDOW_VEHICLES
+    if max_vehicles:
+        frame = frame.head(max_vehicles)
+    sequence = list(zip(frame["color"], frame["oven"]))
+
+    windows = []
+    truncated = False
+    for start in range(0, len(sequence), window):
+        if time_budget_s is not None and time.perf_counter() - started > time_budget_s:
+            truncated = True
+            break
+        cars = sequence[start:start + window]
+        bound = solver.solve(cars)
+        row = {
+            'start': start,
+            'vehicles': len(cars),
+            'lower_bound': bound['lower_bound'],
+            'optimal': bound['optimal'],
+            'elapsed_ms': bound['elapsed_ms']
+        }
+        for strategy in strategies:
+            row[strategy] = replay_changeovers(cars, strategy, topology=solver.topology)['paint_changeovers']
+        windows.append(row)
+
+    lower_bound = sum(row['lower_bound'] for row in windows)
+    report = {
+        'vehicles': sum(row['vehicles'] for row in windows),
+        'vehicles_requested': len(sequence),
+        'truncated': truncated,
+        'window': window,
+        'windows_solved': sum(1 for row in windows if row['optimal']),
+        'windows_total': len(windows),
+        'lower_bound': lower_bound,
+        'strategies': {},
+        'windows': windows
+    }
+    for strategy in strategies:
+        changeovers = sum(row[strategy] for row in windows)
+        report['strategies'][strategy] = {
+            'paint_changeovers': changeovers,
+            'gap': changeovers - lower_bound,
+            'gap_percent': round((changeovers - lower_bound) / lower_bound * 100, 1) if lower_bound else None
+        }
+
+    logger.info(
+        f"📐 Optimality gap on {report['vehicles']} cars: bound {lower_bound} "
+        f"({report['windows_solved']}/{len(windows)} windows exact), "
+        + ", ".join(f"{s} {r['paint_changeovers']}" for s, r in report['strategies'].items())
+    )
+    return report
+
+
+def run_gap_report(run_id: str, max_vehicles: Optional[int] = None) -> Dict:
+    """Gap report for an exported run (at most OPTIMALITY_MAX_VEHICLES cars)"""
+    frame = load_logged_run(run_id)
+    limit = settings.OPTIMALITY_MAX_VEHICLES
+    report = gap_report(
+        frame, max_vehicles=min(max_vehicles or limit, limit),
+        time_budget_s=settings.OPTIMALITY_REPORT_BUDGET_SECONDS
+    )
+    report['run_id'] = run_id
+    return report
+
+
+class GapReportRunner:
+    """
+    Runs gap reports in a separate worker process. The searches are CPU
+    bound and hold the GIL, so in a thread they would slow simulation
+    ticks; one worker also queues concurrent requests instead of stacking
+    them.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, run_id: str, max_vehicles: Optional[int] = None) -> Dict:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, run_gap_report, run_id, max_vehicles)
+        except BrokenProcessPool:
+            # Worker died (e.g. out of memory); start a fresh one next time
+            self._pool = None
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# Singleton instance
+gap_reports = GapReportRunner()
@@ -0,0 +1,209 @@
+# services/priority_queue.py
+import heapq
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 10   # Lower value = more urgent
+
+
+class PriorityOvenQueue:
+    """
+    Indexed binary heap of car ids, usable wherever an oven deque is.
+
+    A car's key is enqueue_tick + priority * aging_ticks (ties in enqueue
+    order), fixed when it is queued. A car can therefore be overtaken by at
+    most aging_ticks ticks' worth of arrivals per priority level it trails
+    by, so nobody starves, and no key ever has to be re-aged. The position
+    index makes reprioritizing a queued car (rush orders) O(log n).
+    """
+
+    def __init__(self, priority_of: Callable[[int], int], clock: Callable[[], int],
+                 aging_ticks: int = 20):
+        self.priority_of = priority_of
+        self.clock = clock
+        self.aging_ticks = aging_ticks
+        self._heap: List[Tuple[Tuple[int, int], int]] = []   # ((score, seq), car_id)
+        self._index: Dict[int, int] = {}                     # car_id -> heap position
+        self._enqueued: Dict[int, int] = {}                  # car_id -> enqueue tick
+        self._seq = 0
+
+    # deque-compatible interface
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def __iter__(self) -> Iterator[int]:
+        """Car ids in service order"""
+        return (car_id for _, car_id in sorted(self._heap))
+
+    def __contains__(self, car_id: int) -> bool:
+        return car_id in self._index
+
+    def peek(self, n: int) -> List[int]:
+        """First n car ids in service order, O(size + n log n) instead of a full sort"""
+        return [car_id for _, car_id in heapq.nsmallest(n, self._heap)]
+
+    def append(self, car_id: int):
+        self._enqueued[car_id] = self.clock()
+        self._push(self._key(car_id, self.priority_of(car_id)), car_id)
+
+    def extend(self, car_ids):
+        for car_id in car_ids:
+            self.append(car_id)
+
+    def appendleft(self, car_id: int):
+        """Put a car back at the front (e.g. requeued after a buffer overflow)"""
+        front = self._heap[0][0][0] if self._heap else self.clock()
+        self._enqueued.setdefault(car_id, self.clock())
+        self._seq += 1
+        self._push((front - 1, self._seq), car_id)
+
+    def popleft(self) -> int:
+        if not self._heap:
+            raise IndexError("pop from an empty queue")
+        return self._remove_at(0)
+
+    def remove(self, car_id: int):
+        position = self._index.get(car_id)
+        if position is None:
+            raise ValueError(f"Car {car_id} not in queue")
+        self._remove_at(position)
+
+    # Priority operations
+
+    def reprioritize(self, car_id: int, priority: int):
+        """Re-key a queued car as if it had been queued with the given priority"""
+        position = self._index.get(car_id)
+        if position is None:
+            raise ValueError(f"Car {car_id} not in queue")
+        key = self._key(car_id, priority)
+        old_key = self._heap[position][0]
+        self._heap[position] = (key, car_id)
+        if key < old_key:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    # Heap internals
+
+    def _key(self, car_id: int, priority: int) -> Tuple[int, int]:
+        self._seq += 1
+        return (self._enqueued[car_id] + priority * self.aging_ticks, self._seq)
+
+    def _push(self, key: Tuple[int, int], car_id: int):
+        self._heap.append((key, car_id))
+        self._index[car_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def _remove_at(self, position: int) -> int:
+        heap = self._heap
+        car_id = heap[position][1]
+        del self._index[car_id]
+        del self._enqueued[car_id]
+        last = heap.pop()
+        if position < len(heap):
+            heap[position] = last
+            self._index[last[1]] = position
+            self._sift_up(position)
+            self._sift_down(self._index[last[1]])
+        return car_id
+
+    def _sift_up(self, position: int):
+        heap, index = self._heap, self._index
+        item = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if heap[parent][0] <= item[0]:
+                break
+            heap[position] = heap[parent]
+            index[heap[position][1]] = position
+            position = parent
+        heap[position] = item
+        index[item[1]] = position
+
+    def _sift_down(self, position: int):
+        heap, index = self._heap, self._index
+        size = len(heap)
+        item = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if item[0] <= heap[child][0]:
+                break
+            heap[position] = heap[child]
+            index[heap[position][1]] = position
+            position = child
+        heap[position] = item
+        index[item[1]] = position
+
+
+def make_oven_queue(mode: str, priority_of: Callable[[int], int], clock: Callable[[], int],
+                    aging_ticks: int = 20):
+    """FIFO deque (mode "fifo") or PriorityOvenQueue (mode "priority")"""
+    if mode == "priority":
+        return PriorityOvenQueue(priority_of, clock, aging_ticks)
+    if mode != "fifo":
+        raise ValueError(f"Unknown oven queue mode: {mode}")
+    return deque()
+
+
+def peek_queue(queue, n: int) -> List[int]:
+    """First n car ids of an oven queue (deque or PriorityOvenQueue)"""
+    if isinstance(queue, PriorityOvenQueue):
+        return queue.peek(n)
+    return list(islice(queue, n))
+
+
+class LatencyTracker:
+    """Arrival-to-paint latency samples per priority, with percentiles"""
+
+    def __init__(self, max_samples: int = 5000):
+        self.max_samples = max_samples
+        self._ticks: Dict[int, deque] = {}
+        self._seconds: Dict[int, deque] = {}
+
+    def record(self, priority: int, latency_ticks: int, latency_seconds: Optional[float] = None):
+        if priority not in self._ticks:
+            self._ticks[priority] = deque(maxlen=self.max_samples)
+            self._seconds[priority] = deque(maxlen=self.max_samples)
+        self._ticks[priority].append(latency_ticks)
+        if latency_seconds is not None:
+            self._seconds[priority].append(latency_seconds)
+
+    def clear(self):
+        self._ticks.clear()
+        self._seconds.clear()
+
+    @staticmethod
+    def _percentiles(samples) -> Optional[Dict]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            f"p{p}": round(ordered[min(last, int(p / 100 * len(ordered)))], 3)
+            for p in (50, 90, 95, 99)
+        }
+
+    def report(self) -> Dict:
+        return {
+            priority: {
+                'samples': len(self._ticks[priority]),
+                'ticks': self._percentiles(self._ticks[priority]),
+                'seconds': self._percentiles(self._seconds[priority])
+            }
+            for priority in sorted(self._ticks)
+        }
+
+# Singleton instance
+latency_tracker = LatencyTracker()
@@ -0,0 +1,197 @@
+# services/profiler.py
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Frames from these files are profiler noise
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+
+class _PhaseStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated_bytes = 0   # Sum of positive traced-memory deltas
+        self.net_bytes = 0         # Sum of all deltas (growth attributable to the phase)
+
+
+class _PhaseTimer:
+    def __init__(self, stats: _PhaseStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self._mem = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        delta = tracemalloc.get_traced_memory()[0] - self._mem
+        self.stats.calls += 1
+        self.stats.seconds += time.perf_counter() - self._started
+        self.stats.net_bytes += delta
+        if delta > 0:
+            self.stats.allocated_bytes += delta
+        return False
+
+
+class TickProfiler:
+    """
+    Opt-in allocation profiler for the simulation tick.
+
+    When enabled, tracemalloc tracks allocations and each tick phase records
+    its traced-memory delta; every `sample_every_ticks` ticks the traced
+    total is added to the growth history. Both are cheap. Snapshots are not:
+    one takes 100-200 ms with the GIL held, which would show up as tick lag,
+    so they are only taken on enable (baseline) and on dump(), which
+    computes the top growing allocation sites.
+    """
+
+    def __init__(self, sample_every_ticks: int = 50, top_n: int = 15, nframes: int = 1,
+                 history_size: int = 720, dump_dir: str = "profiles"):
+        self.sample_every = sample_every_ticks
+        self.top_n = top_n
+        self.nframes = nframes
+        self.dump_dir = dump_dir
+
+        self.enabled = False
+        self._started_tracemalloc = False
+        self._phases: Dict[str, _PhaseStats] = {}
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.top_sites: List[Dict] = []
+        self.growth: deque = deque(maxlen=history_size)
+        self.snapshot_ms = 0.0
+        self.enabled_at_tick: Optional[int] = None
+
+    def enable(self, tick: int = 0):
+        if self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            self._started_tracemalloc = True
+        self._phases = {}
+        self.top_sites = []
+        self.growth.clear()
+        self._baseline = self._last_snapshot = self._take_snapshot()
+        self.enabled_at_tick = tick
+        self.enabled = True
+        logger.info(f"🔬 Allocation profiling enabled at tick {tick}")
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._last_snapshot = None
+        self._baseline = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        logger.info("🔬 Allocation profiling disabled")
+
+    def phase(self, name: str):
+        """Context manager around one tick phase (no-op while disabled)"""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        stats = self._phases.get(name)
+        if stats is None:
+            stats = self._phases[name] = _PhaseStats()
+        return _PhaseTimer(stats)
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        started = time.perf_counter()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, pattern) for pattern in _IGNORED_FILES
+        ])
+        self.snapshot_ms = (time.perf_counter() - started) * 1000
+        return snapshot
+
+    def _sites(self, snapshot: tracemalloc.Snapshot, since: tracemalloc.Snapshot) -> List[Dict]:
+        return [
+            {
+                'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff
+            }
+            for stat in snapshot.compare_to(since, "lineno")[:self.top_n]
+        ]
+
+    def end_tick(self, tick: int, gauges: Optional[Dict] = None):
+        """Record traced memory every sample_every ticks (no snapshot)"""
+        if not self.enabled or tick % self.sample_every != 0:
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        point = {'tick': tick, 'traced_bytes': current, 'peak_bytes': peak}
+        if gauges:
+            point.update(gauges)
+        self.growth.append(point)
+
+    def report(self) -> Dict:
+        current, peak = tracemalloc.get_traced_memory() if self.enabled else (0, 0)
+        return {
+            'enabled': self.enabled,
+            'enabled_at_tick': self.enabled_at_tick,
+            'sample_every_ticks': self.sample_every,
+            'last_snapshot_ms': round(self.snapshot_ms, 2),
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'phases': {
+                name: {
+                    'calls': stats.calls,
+                    'avg_ms': round(stats.seconds * 1000 / stats.calls, 3) if stats.calls else 0,
+                    'allocated_bytes': stats.allocated_bytes,
+                    'net_bytes': stats.net_bytes,
+                    'net_bytes_per_call': round(stats.net_bytes / stats.calls, 1) if stats.calls else 0
+                }
+                for name, stats in self._phases.items()
+            },
+            'top_sites': self.top_sites,
+            'growth': list(self.growth)
+        }
+
+    def dump(self) -> Dict[str, str]:
+        """Write the latest snapshot (tracemalloc format) and a JSON report"""
+        if not self.enabled:
+            raise RuntimeError("Profiling is not enabled")
+
+        os.makedirs(self.dump_dir, exist_ok=True)
+        stem = os.path.join(self.dump_dir, datetime.now().strftime("profile-%Y%m%d-%H%M%S"))
+        snapshot_path = f"{stem}.tracemalloc"
+        report_path = f"{stem}.json"
+
+        snapshot = self._take_snapshot()
+        snapshot.dump(snapshot_path)
+        # Top sites since the previous dump (or since enabled)
+        self.top_sites = self._sites(snapshot, self._last_snapshot)
+        self._last_snapshot = snapshot
+
+        report = self.report()
+        report['growth_since_enabled'] = [
+            {key: site[key] for key in ('site', 'size_diff_bytes', 'count_diff')}
+            for site in self._sites(snapshot, self._baseline)
+        ]
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        logger.info(f"🔬 Profile dumped to {stem}.*")
+        return {'snapshot': snapshot_path, 'report': report_path}
+
+# Singleton instance
+profiler = TickProfiler(
+    sample_every_ticks=settings.PROFILING_SAMPLE_EVERY_TICKS,
+    top_n=settings.PROFILING_TOP_N,
+    dump_dir=settings.PROFILING_DUMP_DIR
+)
+if settings.PROFILING_ENABLED:
+    profiler.enable()
@@ -0,0 +1,173 @@
+# services/realtime_publisher.py
+import json
+import time
+from collections import deque
+from typing import Dict, Optional
+from services.firestore_service import firestore_service
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Metrics fields that change every tick without the dashboard changing
+_VOLATILE_METRICS = ('current_tick', 'simulation_running', 'conveyors')
+
+# Firestore layout: metrics/current holds the metrics without buffer states;
+# each buffer has its own document, buffers/{buffer_id}. Fields listed here
+# were dropped from metrics/current and are deleted from it once, so readers
+# of the old layout don't see a frozen copy.
+_REMOVED_METRICS = ('buffer_states',)
+
+
+def _payload_bytes(payload: Dict) -> int:
+    return len(json.dumps(payload, default=str))
+
+
+class RealtimePublisher:
+    """
+    Pushes dashboard state to Firestore at an adaptive cadence.
+
+    Only buffers whose state changed since the last publish are written.
+    The interval between publishes is the shortest that keeps the expected
+    writes and bytes (smoothed over recent publishes) within the per-second
+    budgets, and the time spent blocked on writes under max_duty of the
+    loop. When nothing changed, a heartbeat is still written every
+    freshness_target seconds.
+    """
+
+    def __init__(self, freshness_target_s: float = 2.0, max_writes_per_s: float = 10.0,
+                 max_bytes_per_s: float = 50000, max_interval_s: float = 30.0,
+                 max_duty: float = 0.5, smoothing: float = 0.3, window_s: float = 60.0):
+        self.freshness_target_s = freshness_target_s
+        self.max_writes_per_s = max_writes_per_s
+        self.max_bytes_per_s = max_bytes_per_s
+        self.max_interval_s = max_interval_s
+        self.max_duty = max_duty
+        self.smoothing = smoothing
+        self.window_s = window_s
+        self.reset()
+
+    def reset(self):
+        """Forget published state; the next publish writes everything"""
+        self._published_buffers: Dict[str, Dict] = {}
+        self._published_metrics: Optional[Dict] = None
+        self._removed_fields_deleted = False
+        self.last_publish_at: Optional[float] = None
+        self.interval_s = 0.0
+
+        # Smoothed per-publish cost
+        self.write_latency_s = 0.0
+        self.writes_per_publish = 0.0
+        self.bytes_per_publish = 0.0
+
+        self.publishes = 0
+        self.skipped_unchanged = 0
+        self.failed_writes = 0
+        self._recent: deque = deque()   # (time, writes, bytes)
+
+    def _smooth(self, current: float, sample: float) -> float:
+        if current == 0.0:
+            return sample
+        return (1 - self.smoothing) * current + self.smoothing * sample
+
+    def _adapt_interval(self):
+        """Shortest interval that keeps expected cost within budget"""
+        interval = max(
+            self.writes_per_publish / self.max_writes_per_s,
+            self.bytes_per_publish / self.max_bytes_per_s,
+            self.writes_per_publish * self.write_latency_s / self.max_duty
+        )
+        self.interval_s = min(interval, self.max_interval_s)
+
+    def due(self, now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        return self.last_publish_at is None or now - self.last_publish_at >= self.interval_s
+
+    def _write(self, write, *args) -> bool:
+        started = time.perf_counter()
+        ok = write(*args)
+        if ok:
+            self.write_latency_s = self._smooth(self.write_latency_s, time.perf_counter() - started)
+        return ok
+
+    def publish(self, snapshot, force: bool = False) -> bool:
+        """Write changed state from a StateSnapshot if due; returns True if written"""
+        now = time.time()
+        if not force and not self.due(now):
+            return False
+
+        changed_buffers = {
+            buffer_id: state for buffer_id, state in snapshot.buffers.items()
+            if self._published_buffers.get(buffer_id) != state
+        }
+        # Buffer states have their own documents
+        metrics = {k: v for k, v in snapshot.metrics.items() if k not in _REMOVED_METRICS}
+        stable_metrics = {k: v for k, v in metrics.items() if k not in _VOLATILE_METRICS}
+        heartbeat_due = (
+            self.last_publish_at is None
+            or now - self.last_publish_at >= self.freshness_target_s
+        )
+        if not force and not changed_buffers and stable_metrics == self._published_metrics and not heartbeat_due:
+            self.skipped_unchanged += 1
+            return False
+
+        delete_fields = () if self._removed_fields_deleted else _REMOVED_METRICS
+        if not self._write(firestore_service.update_metrics, metrics, delete_fields):
+            if firestore_service.connected:
+                self.failed_writes += 1
+            return False
+        self._removed_fields_deleted = True
+        writes = 1
+        sent_bytes = _payload_bytes(metrics)
+        self._published_metrics = stable_metrics
+
+        for buffer_id, state in changed_buffers.items():
+            if self._write(firestore_service.update_buffer_state, buffer_id, state):
+                self._published_buffers[buffer_id] = state
+                writes += 1
+                sent_bytes += _payload_bytes(state)
+            else:
+                self.failed_writes += 1   # Still differs, retried next publish
+
+        self.publishes += 1
+        self.last_publish_at = now
+        self.writes_per_publish = self._smooth(self.writes_per_publish, writes)
+        self.bytes_per_publish = self._smooth(self.bytes_per_publish, sent_bytes)
+        self._adapt_interval()
+
+        self._recent.append((now, writes, sent_bytes))
+        while self._recent and now - self._recent[0][0] > self.window_s:
+            self._recent.popleft()
+        return True
+
+    def report(self) -> Dict:
+        now = time.time()
+        span = max(now - self._recent[0][0], 1.0) if self._recent else self.window_s
+        age = now - self.last_publish_at if self.last_publish_at else None
+        return {
+            'storage_connected': firestore_service.connected,
+            'interval_seconds': round(self.interval_s, 3),
+            'freshness_target_seconds': self.freshness_target_s,
+            'freshness_ok': self.interval_s <= self.freshness_target_s,
+            'last_publish_age_seconds': round(age, 3) if age is not None else None,
+            'effective_writes_per_second': round(sum(w for _, w, _ in self._recent) / span, 3),
+            'effective_bytes_per_second': round(sum(b for _, _, b in self._recent) / span, 1),
+            'budget': {
+                'writes_per_second': self.max_writes_per_s,
+                'bytes_per_second': self.max_bytes_per_s
+            },
+            'write_latency_ms': round(self.write_latency_s * 1000, 2),
+            'writes_per_publish': round(self.writes_per_publish, 2),
+            'bytes_per_publish': round(self.bytes_per_publish, 1),
+            'publishes': self.publishes,
+            'skipped_unchanged': self.skipped_unchanged,
+            'failed_writes': self.failed_writes
+        }
+
+# Singleton instance
+realtime_publisher = RealtimePublisher(
+    freshness_target_s=settings.REALTIME_FRESHNESS_TARGET_SECONDS,
+    max_writes_per_s=settings.REALTIME_MAX_WRITES_PER_SECOND,
+    max_bytes_per_s=settings.REALTIME_MAX_BYTES_PER_SECOND,
+    max_interval_s=settings.REALTIME_MAX_INTERVAL_SECONDS
+)
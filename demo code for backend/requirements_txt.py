@@ -9,4 +9,5 @@ python-multipart==0.0.6
 httpx==0.25.2
 apscheduler==3.10.4
 pandas==2.1.3
-numpy==1.26.2
\ No newline at end of file
+numpy==1.26.2
+pyarrow==14.0.1pytest==7.4.3
@@ -0,0 +1,206 @@
+# services/run_export.py
+import importlib.util
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import settings
+from services.metrics_history import COUNTER_FIELDS, GAUGE_FIELDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Export is optional; pyarrow itself is imported when a run starts, not at startup
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_TABLES = ("vehicles", "metrics")
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+# Vehicle lifecycle columns (times are epoch seconds)
+VEHICLE_COLUMNS = (
+    ("car_id", "int64"), ("color", "string"), ("oven", "string"),
+    ("buffer", "string"), ("batch_id", "string"), ("conveyor", "string"), ("priority", "int32"),
+    ("arrival_tick", "int64"), ("buffer_tick", "int64"), ("painted_tick", "int64"),
+    ("arrival_time", "float64"), ("buffer_time", "float64"), ("painted_time", "float64"),
+)
+
+
+class _TableWriter:
+    """Buffers rows column-wise and writes them out one row group at a time"""
+
+    def __init__(self, path: str, schema, file_format: str, row_group_size: int):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.columns: Dict[str, List] = {name: [] for name in schema.names}
+        self.rows_written = 0
+        self._parquet = file_format != "arrow"
+
+        if self._parquet:
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression="zstd")
+        else:
+            import pyarrow.ipc as pa_ipc
+            self._writer = pa_ipc.new_file(path, schema)
+
+    def append(self, row: Dict):
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+        if len(self.columns[self.schema.names[0]]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        num_rows = len(self.columns[self.schema.names[0]])
+        if num_rows == 0:
+            return
+        import pyarrow as pa
+        batch = pa.RecordBatch.from_pydict(self.columns, schema=self.schema)
+        if self._parquet:
+            self._writer.write_batch(batch, row_group_size=num_rows)
+        else:
+            self._writer.write_batch(batch)
+        self.rows_written += num_rows
+        for values in self.columns.values():
+            values.clear()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+class RunExporter:
+    """
+    Streams vehicle lifecycles and per-tick metrics of a simulation run to
+    columnar files (Parquet or Arrow IPC) while the run is in progress.
+    Files are written as `<run_id>_<table>.<ext>.partial` and renamed when
+    the run finishes, so only complete files are ever downloaded.
+    """
+
+    def __init__(self, export_dir: str = "exports", file_format: str = "parquet",
+                 row_group_size: int = 5000, enabled: bool = True):
+        self.export_dir = export_dir
+        self.file_format = file_format if file_format in FILE_EXTENSIONS else "parquet"
+        self.row_group_size = row_group_size
+        self.enabled = enabled and PYARROW_AVAILABLE
+        self.run_id: Optional[str] = None
+        self._writers: Dict[str, _TableWriter] = {}
+        self._buffer_ids: List[str] = []
+
+        if enabled and not PYARROW_AVAILABLE:
+            logger.warning("pyarrow not installed - run export disabled")
+
+    @property
+    def active(self) -> bool:
+        return self.run_id is not None
+
+    def _path(self, run_id: str, table: str) -> str:
+        return os.path.join(
+            self.export_dir, f"{run_id}_{table}.{FILE_EXTENSIONS[self.file_format]}"
+        )
+
+    def start_run(self, buffer_ids: List[str]) -> Optional[str]:
+        """Open writers for a new run"""
+        if not self.enabled:
+            return None
+        if self.active:
+            self.finish_run()
+        import pyarrow as pa
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        # Microseconds so a stop/reset/start within one second gets a new id
+        run_id = datetime.now().strftime("run-%Y%m%d-%H%M%S-%f")
+        self._buffer_ids = list(buffer_ids)
+
+        vehicle_schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in VEHICLE_COLUMNS])
+        metrics_schema = pa.schema(
+            [("tick", pa.int64()), ("time", pa.float64())]
+            + [(field, pa.int64()) for field in COUNTER_FIELDS]
+            + [(field, pa.float64()) for field in GAUGE_FIELDS]
+            + [(f"occupancy_{bid}", pa.int32()) for bid in self._buffer_ids]
+        )
+
+        try:
+            self._writers = {
+                "vehicles": _TableWriter(self._path(run_id, "vehicles") + ".partial",
+                                         vehicle_schema, self.file_format, self.row_group_size),
+                "metrics": _TableWriter(self._path(run_id, "metrics") + ".partial",
+                                        metrics_schema, self.file_format, self.row_group_size)
+            }
+        except Exception as e:
+            logger.error(f"❌ Could not open export files: {e}")
+            self._writers = {}
+            return None
+
+        self.run_id = run_id
+        logger.info(f"📦 Exporting run {run_id} to {self.export_dir}")
+        return run_id
+
+    def record_painted(self, vehicles: List[Dict]):
+        """Write lifecycle rows for vehicles that just left the paint line"""
+        if not self.active:
+            return
+        writer = self._writers["vehicles"]
+        for vehicle in vehicles:
+            writer.append(vehicle)
+
+    def record_tick(self, tick: int, metrics, buffers: Dict):
+        """Write one per-tick metrics row (metrics: SystemMetrics)"""
+        if not self.active:
+            return
+        row = {"tick": tick, "time": time.time()}
+        for field in COUNTER_FIELDS + GAUGE_FIELDS:
+            row[field] = getattr(metrics, field)
+        for bid in self._buffer_ids:
+            row[f"occupancy_{bid}"] = buffers[bid].current_occupancy
+        self._writers["metrics"].append(row)
+
+    def finish_run(self) -> Optional[str]:
+        """Flush remaining rows, close files and publish them under their final names"""
+        if not self.active:
+            return None
+        run_id = self.run_id
+        for table, writer in self._writers.items():
+            try:
+                writer.close()
+                os.replace(writer.path, self._path(run_id, table))
+            except Exception as e:
+                logger.error(f"❌ Export finish failed for {run_id}/{table}: {e}")
+        self._writers = {}
+        self.run_id = None
+        logger.info(f"📦 Export of run {run_id} complete")
+        return run_id
+
+    def list_runs(self) -> List[Dict]:
+        """Finished runs available for download"""
+        if not os.path.isdir(self.export_dir):
+            return []
+        runs: Dict[str, Dict] = {}
+        for name in sorted(os.listdir(self.export_dir)):
+            if name.endswith(".partial"):
+                continue
+            stem, _, ext = name.rpartition(".")
+            run_id, _, table = stem.rpartition("_")
+            if table not in EXPORT_TABLES or ext not in FILE_EXTENSIONS.values():
+                continue
+            path = os.path.join(self.export_dir, name)
+            runs.setdefault(run_id, {"run_id": run_id, "files": {}})
+            runs[run_id]["files"][table] = {"format": ext, "bytes": os.path.getsize(path)}
+        return list(runs.values())
+
+    def get_file(self, run_id: str, table: str) -> Optional[str]:
+        """Path of a finished export file, or None"""
+        if table not in EXPORT_TABLES or os.sep in run_id or run_id.startswith("."):
+            return None
+        for ext in FILE_EXTENSIONS.values():
+            path = os.path.join(self.export_dir, f"{run_id}_{table}.{ext}")
+            if os.path.isfile(path):
+                return path
+        return None
+
+# Singleton instance
+run_exporter = RunExporter(
+    export_dir=settings.EXPORT_DIR,
+    file_format=settings.EXPORT_FORMAT,
+    row_group_size=settings.EXPORT_ROW_GROUP_SIZE,
+    enabled=settings.EXPORT_ENABLED
+)
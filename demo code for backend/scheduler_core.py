@@ -1,22 +1,38 @@
 # services/scheduler.py
-from collections import deque, defaultdict
+from collections import defaultdict
 from typing import Optional, Tuple, Dict, List
-from models.vehicle import BufferState, SystemMetrics, VehicleStatus
+from models.vehicle import BufferState, ConveyorState, SystemMetrics, VehicleStatus
+from services.sequence_planner import ConveyorSequencePlanner
+from services.occupancy_forecast import OccupancyForecaster, RISK_NORMAL, RISK_DIVERT
+from services.topology import CompiledTopology, get_plant
+from services.priority_queue import PriorityOvenQueue, make_oven_queue, peek_queue, DEFAULT_PRIORITY
+from services.maintenance_planner import MaintenancePlanner
 from config import *
 import logging
 
 logger = logging.getLogger(__name__)
 
 class PaintShopScheduler:
-    def __init__(self):
+    def __init__(self, topology: Optional[CompiledTopology] = None,
+                 overrides: Optional[Dict] = None):
+        # Settings, optionally with per-instance overrides (shadow/offline runs)
+        self.settings = settings.model_copy(update=overrides) if overrides else settings
+        
+        # Plant layout (ovens, buffers, routes)
+        self.topology = topology or get_plant()
+        
         # Buffer states
         self.buffers: Dict[str, BufferState] = {}
         self._initialize_buffers()
         
-        # Oven queues
-        self.ovens = {
-            "O1": deque(),
-            "O2": deque()
+        # Oven queues (FIFO, or priority with aging when OVEN_QUEUE_MODE = "priority")
+        self.current_tick = 0
+        self.ovens = {oven_id: self._new_oven_queue() for oven_id in self.topology.oven_ids}
+        
+        # Non-full buffers per oven zone (for cross-oven checks in O(1))
+        self.oven_free_buffers = {
+            oven_id: len(buffer_ids)
+            for oven_id, buffer_ids in self.topology.oven_buffers.items()
         }
         
         # Vehicle cache
@@ -25,21 +41,59 @@ class PaintShopScheduler:
         # Metrics
         self.metrics = SystemMetrics()
         self._initialize_buffer_states()
+        self.metrics.conveyors = {
+            conveyor_id: ConveyorState(conveyor_id=conveyor_id)
+            for conveyor_id in self.topology.conveyor_ids
+        }
         
         # Batch tracking
         self.batch_counter = defaultdict(int)
         
+        # Cars assigned per color and buffer (report color distribution)
+        self.assignment_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        
+        # Multi-step conveyor planner (PICK_STRATEGY = "planner")
+        self.planner = ConveyorSequencePlanner(
+            horizon=self.settings.PLANNER_HORIZON,
+            run_depth=self.settings.PLANNER_RUN_DEPTH,
+            max_pick=self.settings.MAX_CONVEYOR_PICK,
+            time_budget_ms=self.settings.PLANNER_TIME_BUDGET_MS
+        )
+        
+        # Overflow forecasting (refreshed once per tick in begin_tick)
+        self.forecaster = OccupancyForecaster(
+            horizon_ticks=self.settings.FORECAST_HORIZON_TICKS,
+            smoothing=self.settings.FORECAST_SMOOTHING,
+            threshold=OCCUPANCY_THRESHOLD,
+            oven_rate=self.settings.OVEN_PRODUCTION_RATE,
+            routes=self.topology.preferred_buffers
+        )
+        
+        # Planned buffer maintenance (drain schedules, phases advance in begin_tick)
+        self.maintenance = MaintenancePlanner(self)
+        
         logger.info("🎨 Paint Shop Scheduler initialized")
     
+    def _new_oven_queue(self):
+        return make_oven_queue(
+            self.settings.OVEN_QUEUE_MODE,
+            priority_of=self._priority_of,
+            clock=lambda: self.current_tick,
+            aging_ticks=self.settings.PRIORITY_AGING_TICKS
+        )
+    
+    def _priority_of(self, car_id: int) -> int:
+        priority = self.vehicles_by_id.get(car_id, {}).get('priority')
+        return DEFAULT_PRIORITY if priority is None else priority
+    
     def _initialize_buffers(self):
-        """Initialize buffer states from config"""
-        for buffer_id, capacity in BUFFER_CAPACITY.items():
-            metadata = BUFFER_METADATA[buffer_id]
-            self.buffers[buffer_id] = BufferState(
-                buffer_id=buffer_id,
-                capacity=capacity,
-                primary_colors=metadata["primary_colors"],
-                is_flex=metadata["is_flex"]
+        """Initialize buffer states from the plant topology"""
+        for spec in self.topology.spec.buffers:
+            self.buffers[spec.buffer_id] = BufferState(
+                buffer_id=spec.buffer_id,
+                capacity=spec.capacity,
+                primary_colors=list(spec.primary_colors),
+                is_flex=spec.is_flex
             )
     
     def _initialize_buffer_states(self):
@@ -48,9 +102,33 @@ class PaintShopScheduler:
             bid: buffer for bid, buffer in self.buffers.items()
         }
     
+    def begin_tick(self, tick: int):
+        """Per-tick bookkeeping before ovens and conveyor run"""
+        self.current_tick = tick
+        self.maintenance.begin_tick(tick)
+        
+        if self.settings.OVERFLOW_AVOIDANCE_ENABLED:
+            lookahead = self.settings.FORECAST_HORIZON_TICKS * self.settings.OVEN_PRODUCTION_RATE
+            queued = {
+                oven: [
+                    self.vehicles_by_id[car_id]['color']
+                    for car_id in peek_queue(queue, lookahead)
+                    if car_id in self.vehicles_by_id
+                ]
+                for oven, queue in self.ovens.items()
+            }
+            self.forecaster.update(self.buffers, queued)
+    
     def assign_oven(self, color: str) -> str:
         """Determine oven based on color"""
-        return "O1" if color in HIGH_VOLUME_COLORS else "O2"
+        return self.topology.oven_for(color)
+    
+    def _track_full_transition(self, buffer_id: str, was_full: bool):
+        """Keep per-oven non-full buffer counts in step with occupancy changes"""
+        is_full = self.buffers[buffer_id].is_full()
+        if was_full != is_full:
+            oven = self.topology.buffer_oven[buffer_id]
+            self.oven_free_buffers[oven] += 1 if was_full else -1
     
     def calculate_changeover_penalty(self, buffer: BufferState, new_color: str) -> int:
         """Calculate changeover time penalty in seconds"""
@@ -77,20 +155,42 @@ class PaintShopScheduler:
         """
         Find optimal buffer for vehicle
         Returns: (buffer_id, changeover_penalty) or None
+        
+        With OVERFLOW_AVOIDANCE_ENABLED, buffers forecast to fill are held
+        back while another lane can take the car without a changeover, and
+        buffers above OCCUPANCY_THRESHOLD only take same-color cars. Held-back
+        buffers are still used as a last resort, so avoidance never halts.
+        Buffers draining for planned maintenance are a last resort too.
         """
-        preferred_buffers = PREFERRED_BUFFERS.get(color, [])
+        candidates = self.topology.candidates.get(color, ())
         best_buffer = None
         min_penalty = float('inf')
+        avoid_overflow = self.settings.OVERFLOW_AVOIDANCE_ENABLED
+        diverted = None
+        strict_buffer = None
+        strict_penalty = float('inf')
+        draining = None
         
-        for buffer_id in preferred_buffers:
+        for buffer_id, buffer_oven, route_penalty in candidates:
             buffer = self.buffers[buffer_id]
             
             # Skip unavailable or full buffers
             if not buffer.is_available or buffer.is_full():
                 continue
             
+            # Pre-divert from buffers draining for maintenance
+            if self.maintenance.is_diverting(buffer_id):
+                draining = draining or buffer_id
+                continue
+            
+            risk = self.forecaster.risk_of(buffer_id) if avoid_overflow else RISK_NORMAL
+            
             # Priority 1: Continue existing batch (same color, no changeover)
             if buffer.current_color == color and buffer.available_space() > 0:
+                if risk == RISK_DIVERT:
+                    # Early diversion: look for another no-changeover lane first
+                    diverted = diverted or buffer_id
+                    continue
                 return (buffer_id, 0)
             
             # Priority 2: Empty buffer (no changeover)
@@ -98,24 +198,137 @@ class PaintShopScheduler:
                 return (buffer_id, 0)
             
             # Priority 3: Check cross-oven routing
-            buffer_metadata = BUFFER_METADATA[buffer_id]
-            if buffer_metadata["oven"] != oven:
-                # O1 -> O2 buffers: only if O1 buffers are full
-                if oven == "O1":
-                    o1_has_space = any(
-                        not self.buffers[b].is_full() 
-                        for b in OVEN_PRIMARY_BUFFERS["O1"]
-                    )
-                    if o1_has_space:
-                        continue  # Skip O2 buffer for now
+            if buffer_oven != oven:
+                # Overflow-only ovens use other zones only once their own buffers are full
+                if oven in self.topology.overflow_only_ovens and self.oven_free_buffers[oven] > 0:
+                    continue  # Skip other-zone buffer for now
             
-            # Priority 4: Calculate penalty and pick best
+            # Priority 4: Calculate penalty (plus route penalty) and pick best
             penalty = self.calculate_changeover_penalty(buffer, color)
+            if penalty > 0:
+                penalty += route_penalty
+            
+            # Strict color matching: don't mix colors into a filling buffer
+            if risk != RISK_NORMAL:
+                if penalty < strict_penalty:
+                    strict_penalty = penalty
+                    strict_buffer = buffer_id
+                continue
+            
             if penalty < min_penalty:
                 min_penalty = penalty
                 best_buffer = buffer_id
         
-        return (best_buffer, min_penalty) if best_buffer else None
+        if diverted:
+            return (diverted, 0)
+        if best_buffer:
+            return (best_buffer, min_penalty)
+        if strict_buffer:
+            return (strict_buffer, strict_penalty)
+        if draining:
+            return (draining, self.calculate_changeover_penalty(self.buffers[draining], color))
+        return None
+    
+    def step_oven(self, oven_name: str) -> List[Dict]:
+        """
+        Move up to OVEN_PRODUCTION_RATE cars from an oven queue into buffers.
+        Stops (and requeues the car) on buffer overflow.
+        Returns: successful assignment results
+        """
+        queue = self.ovens[oven_name]
+        results = []
+        
+        for _ in range(self.settings.OVEN_PRODUCTION_RATE):
+            if not queue:
+                break
+            
+            car_id = queue.popleft()
+            vehicle = self.vehicles_by_id.get(car_id)
+            
+            if not vehicle:
+                continue
+            
+            result = self.assign_vehicle_to_buffer(vehicle)
+            
+            if not result['success']:
+                # Buffer overflow - requeue and pause
+                queue.appendleft(car_id)
+                logger.warning(f"Buffer overflow for {car_id}, requeuing")
+                break
+            
+            results.append(result)
+        
+        return results
+    
+    def export_state(self) -> Dict:
+        """Queues and buffer contents, enough to rebuild an equivalent scheduler"""
+        queued = [car_id for queue in self.ovens.values() for car_id in queue]
+        buffered = [car_id for buffer in self.buffers.values() for car_id in buffer.vehicles]
+        return {
+            'vehicles': {
+                car_id: {
+                    key: self.vehicles_by_id[car_id].get(key)
+                    for key in ('car_id', 'color', 'oven', 'priority', 'buffer', 'batch_id')
+                }
+                for car_id in queued + buffered
+            },
+            'ovens': {oven: list(queue) for oven, queue in self.ovens.items()},
+            'buffers': {
+                buffer_id: {
+                    'vehicles': list(buffer.vehicles),
+                    'is_available': buffer.is_available,
+                    'last_color': buffer.last_color
+                }
+                for buffer_id, buffer in self.buffers.items()
+            },
+            'last_painted_color': self.metrics.last_painted_color,
+            'conveyor_colors': {
+                conveyor_id: conveyor.last_color
+                for conveyor_id, conveyor in self.metrics.conveyors.items()
+            },
+            'maintenance_plans': self.maintenance.export(),
+            'forecast_rates': {
+                'fill': dict(self.forecaster.fill_rate),
+                'drain': dict(self.forecaster.drain_rate),
+                'risk': dict(self.forecaster.risk)
+            }
+        }
+    
+    def restore_state(self, state: Dict):
+        """Load queues and buffer contents produced by export_state (metrics start at zero)"""
+        self.vehicles_by_id = {int(car_id): dict(v) for car_id, v in state['vehicles'].items()}
+        for oven, car_ids in state['ovens'].items():
+            queue = self._new_oven_queue()
+            queue.extend(car_ids)
+            self.ovens[oven] = queue
+        
+        for buffer_id, contents in state['buffers'].items():
+            buffer = self.buffers[buffer_id]
+            buffer.is_available = contents['is_available']
+            buffer.last_color = contents.get('last_color')
+            buffer.vehicles = list(contents['vehicles'])
+            buffer.current_occupancy = len(buffer.vehicles)
+            buffer.color_counts = {}
+            for car_id in buffer.vehicles:
+                color = self.vehicles_by_id[car_id]['color']
+                buffer.color_counts[color] = buffer.color_counts.get(color, 0) + 1
+            buffer.current_color = (
+                self.vehicles_by_id[buffer.vehicles[-1]]['color'] if buffer.vehicles else None
+            )
+        
+        self.oven_free_buffers = {
+            oven_id: sum(1 for b in buffer_ids if not self.buffers[b].is_full())
+            for oven_id, buffer_ids in self.topology.oven_buffers.items()
+        }
+        self.metrics.last_painted_color = state['last_painted_color']
+        for conveyor_id, color in state.get('conveyor_colors', {}).items():
+            self.metrics.conveyors[conveyor_id].last_color = color
+        self.maintenance.restore(state.get('maintenance_plans', []))
+        rates = state.get('forecast_rates')
+        if rates:
+            self.forecaster.fill_rate = dict(rates['fill'])
+            self.forecaster.drain_rate = dict(rates['drain'])
+            self.forecaster.risk = dict(rates['risk'])
     
     def assign_vehicle_to_buffer(self, vehicle: Dict) -> Dict:
         """
@@ -149,10 +362,11 @@ class PaintShopScheduler:
         if changeover_penalty > 0:
             self.metrics.total_changeovers += 1
             
-            # Track O2 stoppage if O1 routes to O2 buffers
-            if oven == "O1" and buffer_id in OVEN_PRIMARY_BUFFERS["O2"]:
+            # Track stoppage when an oven routes into another oven's zone
+            buffer_oven = self.topology.buffer_oven[buffer_id]
+            if buffer_oven != oven:
                 self.metrics.o2_stoppage_events += 1
-                logger.warning(f"⚠️ O1 -> {buffer_id} (O2 zone): Stoppage event")
+                logger.warning(f"⚠️ {oven} -> {buffer_id} ({buffer_oven} zone): Stoppage event")
         
         # Step 4: Assign batch ID
         if buffer.current_color != color or buffer.current_occupancy == 0:
@@ -163,15 +377,19 @@ class PaintShopScheduler:
         # Step 5: Update buffer state
         buffer.vehicles.append(car_id)
         buffer.current_occupancy += 1
+        self._track_full_transition(buffer_id, was_full=False)
         buffer.color_counts[color] = buffer.color_counts.get(color, 0) + 1
         buffer.last_color = buffer.current_color
         buffer.current_color = color
+        self.forecaster.record_fill(buffer_id)
         
         # Step 6: Update vehicle
         vehicle['buffer'] = buffer_id
         vehicle['status'] = VehicleStatus.IN_BUFFER.value
         vehicle['batch_id'] = batch_id
+        vehicle['buffer_tick'] = self.current_tick
         self.vehicles_by_id[car_id] = vehicle
+        self.assignment_counts[color][buffer_id] += 1
         
         self.metrics.vehicles_processed += 1
         
@@ -193,33 +411,36 @@ class PaintShopScheduler:
         Find longest continuous same-color run at front of buffer
         Returns: (color, run_length)
         """
+        runs = self.front_runs(buffer_id, max_runs=1)
+        return runs[0] if runs else (None, 0)
+    
+    def front_runs(self, buffer_id: str, max_runs: int) -> List[Tuple[str, int]]:
+        """
+        Split the front of a buffer into same-color runs
+        Returns: [(color, run_length), ...] oldest first, at most max_runs
+        """
         buffer = self.buffers[buffer_id]
-        if not buffer.vehicles:
-            return (None, 0)
-        
-        first_car = buffer.vehicles[0]
-        first_color = self.vehicles_by_id[first_car]['color']
-        run_length = 1
+        runs = []
         
-        for car_id in buffer.vehicles[1:]:
-            if self.vehicles_by_id[car_id]['color'] == first_color:
-                run_length += 1
-            else:
+        for car_id in buffer.vehicles:
+            color = self.vehicles_by_id[car_id]['color']
+            if runs and runs[-1][0] == color:
+                runs[-1][1] += 1
+            elif len(runs) == max_runs:
                 break
+            else:
+                runs.append([color, 1])
         
-        return (first_color, run_length)
+        return [(color, length) for color, length in runs]
     
-    def pick_from_conveyor(self) -> List[int]:
-        """
-        Main conveyor picks vehicles from buffer with longest same-color run
-        Returns: List of picked car_ids
-        """
+    def _select_greedy_pick(self, candidates: List[str]) -> Tuple[Optional[str], Optional[str], int]:
+        """Buffer with the longest front run, ties go to the last painted color"""
         best_buffer_id = None
         best_run_length = 0
         best_color = None
         
         # Find buffer with longest continuous run
-        for buffer_id in self.buffers.keys():
+        for buffer_id in candidates:
             color, run_length = self.best_continuous_run(buffer_id)
             
             if run_length > best_run_length:
@@ -232,12 +453,175 @@ class PaintShopScheduler:
                     best_buffer_id = buffer_id
                     best_color = color
         
-        if not best_buffer_id or best_run_length == 0:
-            return []
+        return best_buffer_id, best_color, best_run_length
+    
+    def _select_planned_pick(self, candidates: List[str]) -> Tuple[Optional[str], Optional[str], int]:
+        """First pick of the changeover-minimizing plan over the next N picks"""
+        fronts = {
+            buffer_id: self.front_runs(buffer_id, self.settings.PLANNER_RUN_DEPTH)
+            for buffer_id in candidates
+        }
+        plan = self.planner.plan(fronts, self.metrics.last_painted_color)
+        if not plan:
+            return None, None, 0
+        
+        buffer_id, color, _ = plan[0]
+        return buffer_id, color, fronts[buffer_id][0][1]
+    
+    def _effective_priority(self, buffer_id: str) -> float:
+        """Most urgent car in a buffer, aged by its wait (one level per PRIORITY_AGING_TICKS)"""
+        aging = self.settings.PRIORITY_AGING_TICKS
+        best = float('inf')
+        for car_id in self.buffers[buffer_id].vehicles:
+            vehicle = self.vehicles_by_id[car_id]
+            priority = vehicle.get('priority')
+            if priority is None:
+                priority = DEFAULT_PRIORITY
+            waited = self.current_tick - vehicle.get('buffer_tick', self.current_tick)
+            best = min(best, priority - waited / aging)
+        return best
+    
+    def _select_priority_pick(self, candidates: List[str]) -> Tuple[Optional[str], Optional[str], int]:
+        """Longest front run, traded off against urgency: run - PRIORITY_PICK_WEIGHT * priority"""
+        weight = self.settings.PRIORITY_PICK_WEIGHT
+        best = (None, None, 0)
+        best_score = float('-inf')
+        
+        for buffer_id in candidates:
+            color, run_length = self.best_continuous_run(buffer_id)
+            if run_length == 0:
+                continue
+            score = run_length - weight * self._effective_priority(buffer_id)
+            if score > best_score or (score == best_score and color == self.metrics.last_painted_color):
+                best_score = score
+                best = (buffer_id, color, run_length)
         
-        # Pick vehicles
-        pick_count = min(best_run_length, settings.MAX_CONVEYOR_PICK)
-        buffer = self.buffers[best_buffer_id]
+        return best
+    
+    def rush_vehicle(self, car_id: int, priority: int) -> Dict:
+        """Raise a car's priority; a queued car moves up without rebuilding its oven queue"""
+        vehicle = self.vehicles_by_id.get(car_id)
+        if vehicle is None:
+            raise KeyError(f"Vehicle {car_id} not found")
+        if vehicle.get('status') == VehicleStatus.PAINTED.value:
+            raise ValueError(f"Vehicle {car_id} is already painted")
+        
+        vehicle['priority'] = priority
+        queue = self.ovens.get(vehicle['oven'])
+        location = 'buffer'
+        if queue is not None and car_id in queue:
+            location = 'oven'
+            if isinstance(queue, PriorityOvenQueue):
+                queue.reprioritize(car_id, priority)
+            else:
+                queue.remove(car_id)
+                queue.appendleft(car_id)
+        
+        logger.info(f"🚀 Rush order: vehicle {car_id} -> priority {priority} ({location})")
+        return {'car_id': car_id, 'priority': priority, 'location': location}
+    
+    def _select_pick(self, candidates: List[str]) -> Tuple[Optional[str], Optional[str], int]:
+        """Single-conveyor pick by PICK_STRATEGY (urgency-weighted when PRIORITY_PICK_WEIGHT > 0)"""
+        if self.settings.PRIORITY_PICK_WEIGHT > 0:
+            return self._select_priority_pick(candidates)
+        if self.settings.PICK_STRATEGY == "planner":
+            return self._select_planned_pick(candidates)
+        return self._select_greedy_pick(candidates)
+    
+    def _assign_conveyor_picks(self, conveyor_ids: List[str], candidates: List[str],
+                               at_risk: set) -> List[Tuple[str, str, str, int]]:
+        """
+        Give each conveyor a distinct buffer run for this tick.
+        Best is, in order: most at-risk buffers drained, most conveyors busy,
+        fewest paint changeovers against each conveyor's last color, most
+        cars picked (urgency-weighted when PRIORITY_PICK_WEIGHT > 0).
+        
+        Each option scores (at_risk, 1, -changeover, value) and assignments
+        compare by the sum. An option scoring below a conveyor's K-th best
+        can never be optimal (the other K-1 conveyors block at most K-1
+        better ones), so only the rest are searched: branch and bound in
+        buffer order, seeded with a greedy assignment's score and bounded by
+        the remaining conveyors' best options. Ties go to the first
+        assignment in buffer order.
+        Returns: [(conveyor_id, buffer_id, color, run_length), ...]
+        """
+        max_pick = self.settings.MAX_CONVEYOR_PICK
+        weight = self.settings.PRIORITY_PICK_WEIGHT
+        runs = {}
+        for buffer_id in candidates:
+            color, run_length = self.best_continuous_run(buffer_id)
+            value = min(run_length, max_pick)
+            if weight > 0:
+                value -= weight * self._effective_priority(buffer_id)
+            runs[buffer_id] = (color, run_length, value)
+        
+        k = len(conveyor_ids)
+        idle = (0, 0, 0, 0.0)
+        options = []
+        for conveyor_id in conveyor_ids:
+            last_color = self.metrics.conveyors[conveyor_id].last_color
+            scored = [
+                ((1 if buffer_id in at_risk else 0, 1,
+                  -1 if last_color and runs[buffer_id][0] != last_color else 0,
+                  runs[buffer_id][2]), buffer_id)
+                for buffer_id in self.topology.conveyor_buffers[conveyor_id]
+                if buffer_id in runs
+            ]
+            if len(scored) > k:
+                cutoff = sorted((option for option, _ in scored), reverse=True)[k - 1]
+                scored = [(option, buffer_id) for option, buffer_id in scored if option >= cutoff]
+            options.append(scored)
+        
+        def add(a, b):
+            return (a[0] + b[0], a[1] + b[1], a[2] + b[2], a[3] + b[3])
+        
+        # bounds[i]: best possible score of conveyors i.. ignoring conflicts
+        bounds = [idle] * (k + 1)
+        for i in range(k - 1, -1, -1):
+            bounds[i] = add(bounds[i + 1], max(options[i])[0] if options[i] else idle)
+        
+        # Greedy lower bound: each conveyor in turn takes its best free option
+        seed, taken = idle, set()
+        for conveyor_options in options:
+            free = [entry for entry in conveyor_options if entry[1] not in taken]
+            if free:
+                option, buffer_id = max(free, key=lambda entry: entry[0])
+                seed = add(seed, option)
+                taken.add(buffer_id)
+        
+        best = {'score': seed, 'chosen': None}
+        chosen: List[Tuple[str, str]] = []
+        used = set()
+        
+        def search(i: int, score):
+            if add(score, bounds[i]) < best['score']:
+                return
+            if i == k:
+                if best['chosen'] is None or score > best['score']:
+                    best['score'] = score
+                    best['chosen'] = list(chosen)
+                return
+            search(i + 1, score)   # Conveyor idles
+            for option, buffer_id in options[i]:
+                if buffer_id in used:
+                    continue
+                used.add(buffer_id)
+                chosen.append((conveyor_ids[i], buffer_id))
+                search(i + 1, add(score, option))
+                chosen.pop()
+                used.discard(buffer_id)
+        
+        search(0, idle)
+        return [
+            (conveyor_id, buffer_id, runs[buffer_id][0], runs[buffer_id][1])
+            for conveyor_id, buffer_id in best['chosen'] or []
+        ]
+    
+    def _take_run(self, conveyor_id: str, buffer_id: str, color: str, run_length: int) -> List[int]:
+        """Move the front run of a buffer onto a conveyor"""
+        pick_count = min(run_length, self.settings.MAX_CONVEYOR_PICK)
+        buffer = self.buffers[buffer_id]
+        was_full = buffer.is_full()
         picked_cars = []
         
         for _ in range(pick_count):
@@ -248,39 +632,107 @@ class PaintShopScheduler:
                 # Update buffer state
                 buffer.current_occupancy -= 1
                 vehicle = self.vehicles_by_id[car_id]
-                color = vehicle['color']
-                buffer.color_counts[color] = max(0, buffer.color_counts.get(color, 0) - 1)
+                car_color = vehicle['color']
+                buffer.color_counts[car_color] = max(0, buffer.color_counts.get(car_color, 0) - 1)
                 
                 # Update vehicle status
                 vehicle['status'] = VehicleStatus.PAINTED.value
+                vehicle['conveyor'] = conveyor_id
+        
+        self.forecaster.record_drain(buffer_id, len(picked_cars))
+        self._track_full_transition(buffer_id, was_full)
         
         # Update buffer color
         if buffer.current_occupancy == 0:
             buffer.current_color = None
         
-        # Track changeover
-        if self.metrics.last_painted_color and best_color != self.metrics.last_painted_color:
+        # Track changeover (per paint line)
+        conveyor = self.metrics.conveyors[conveyor_id]
+        if conveyor.last_color and color != conveyor.last_color:
             self.metrics.total_changeovers += 1
-        
-        self.metrics.last_painted_color = best_color
+            self.metrics.paint_changeovers += 1
+            conveyor.paint_changeovers += 1
+        
+        conveyor.last_color = color
+        conveyor.busy_ticks += 1
+        conveyor.picks += 1
+        conveyor.vehicles_painted += len(picked_cars)
+        self.metrics.last_painted_color = color
         self.metrics.throughput += len(picked_cars)
         
         return picked_cars
     
-    def get_metrics_dict(self) -> Dict:
-        """Export metrics as dictionary"""
+    def pick_from_conveyors(self, conveyor_ids: Optional[List[str]] = None) -> Dict[str, List[int]]:
+        """
+        Main conveyors (all, or the given ones) each pick a same-color run
+        from a distinct buffer. A single-conveyor plant picks by PICK_STRATEGY;
+        with several conveyors the picks are assigned jointly.
+        Returns: conveyor_id -> picked car_ids (conveyors that picked)
+        """
+        conveyor_ids = list(conveyor_ids or self.topology.conveyor_ids)
+        candidates = [buffer_id for buffer_id, buffer in self.buffers.items() if buffer.vehicles]
+        
+        # Drain buffers forecast to fill before they halt an oven
+        at_risk = set()
+        if self.settings.OVERFLOW_AVOIDANCE_ENABLED:
+            at_risk = {
+                buffer_id for buffer_id in candidates
+                if self.forecaster.risk_of(buffer_id) == RISK_DIVERT
+            }
+        
+        # Drain buffers due for maintenance
+        draining = self.maintenance.drain_picks(candidates)
+        
+        if len(self.topology.conveyor_ids) == 1:
+            conveyor_id = conveyor_ids[0]
+            reachable = self.topology.conveyor_buffers[conveyor_id]
+            candidates = [buffer_id for buffer_id in candidates if buffer_id in reachable]
+            candidates = (
+                [buffer_id for buffer_id in candidates if buffer_id in draining]
+                or [buffer_id for buffer_id in candidates if buffer_id in at_risk]
+                or candidates
+            )
+            buffer_id, color, run_length = self._select_pick(candidates)
+            selection = [(conveyor_id, buffer_id, color, run_length)] if buffer_id and run_length else []
+        else:
+            selection = self._assign_conveyor_picks(conveyor_ids, candidates, at_risk | set(draining))
+        
+        for conveyor_id in conveyor_ids:
+            self.metrics.conveyors[conveyor_id].ticks += 1
+        
+        return {
+            conveyor_id: self._take_run(conveyor_id, buffer_id, color, run_length)
+            for conveyor_id, buffer_id, color, run_length in selection
+        }
+    
+    def pick_from_conveyor(self) -> List[int]:
+        """
+        All main conveyors pick this tick (see pick_from_conveyors)
+        Returns: List of picked car_ids
+        """
+        return [
+            car_id
+            for picked in self.pick_from_conveyors().values()
+            for car_id in picked
+        ]
+    
+    def refresh_metrics(self):
+        """Recompute derived metrics (zone occupancy, efficiency, lost time, conveyor utilization)"""
         # Calculate zone occupancy
-        o1_occupancy = sum(
-            self.buffers[b].current_occupancy 
-            for b in OVEN_PRIMARY_BUFFERS["O1"]
-        )
-        o2_occupancy = sum(
-            self.buffers[b].current_occupancy 
-            for b in OVEN_PRIMARY_BUFFERS["O2"]
-        )
+        self.metrics.oven_occupancy = {
+            oven_id: sum(self.buffers[b].current_occupancy for b in buffer_ids)
+            for oven_id, buffer_ids in self.topology.oven_buffers.items()
+        }
+        self.metrics.oven_capacity = dict(self.topology.oven_capacity)
         
-        self.metrics.oven1_occupancy = o1_occupancy
-        self.metrics.oven2_occupancy = o2_occupancy
+        # First two zones keep the original oven1_*/oven2_* fields
+        oven_ids = self.topology.oven_ids
+        if len(oven_ids) > 0:
+            self.metrics.oven1_occupancy = self.metrics.oven_occupancy[oven_ids[0]]
+            self.metrics.oven1_capacity = self.metrics.oven_capacity[oven_ids[0]]
+        if len(oven_ids) > 1:
+            self.metrics.oven2_occupancy = self.metrics.oven_occupancy[oven_ids[1]]
+            self.metrics.oven2_capacity = self.metrics.oven_capacity[oven_ids[1]]
         
         # Calculate efficiency
         changeover_time = self.metrics.total_changeovers * CHANGEOVER_PENALTIES["base"]
@@ -291,7 +743,27 @@ class PaintShopScheduler:
         self.metrics.efficiency_percent = max(0, 100 - (total_lost / 28800 * 100))
         self.metrics.total_lost_time_seconds = total_lost
         
+        # Conveyor utilization
+        max_pick = self.settings.MAX_CONVEYOR_PICK
+        for conveyor in self.metrics.conveyors.values():
+            if conveyor.ticks:
+                conveyor.utilization_percent = round(conveyor.busy_ticks / conveyor.ticks * 100, 1)
+                conveyor.capacity_percent = round(
+                    conveyor.vehicles_painted / (conveyor.ticks * max_pick) * 100, 1
+                )
+    
+    def get_metrics_dict(self) -> Dict:
+        """Export metrics as dictionary"""
+        self.refresh_metrics()
         return self.metrics.dict()
 
-# Singleton instance
-scheduler = PaintShopScheduler()
\ No newline at end of file
+# Singleton instance (built on first use, not at import)
+_scheduler: Optional[PaintShopScheduler] = None
+
+
+def get_scheduler() -> PaintShopScheduler:
+    """The live scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PaintShopScheduler()
+    return _scheduler
\ No newline at end of file
@@ -0,0 +1,174 @@
+# services/sequence_planner.py
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (color, run_length) at the front of a buffer, oldest first
+Run = Tuple[str, int]
+
+# (buffer_id, color, pick_count)
+PlannedPick = Tuple[str, str, int]
+
+
+class _PlannerTimeout(Exception):
+    pass
+
+
+class ConveyorSequencePlanner:
+    """
+    Branch-and-bound planner for the main conveyor.
+
+    Looks several runs deep into every buffer front and searches the next
+    `horizon` picks for the sequence with the fewest paint-line changeovers
+    (ties broken by most cars painted). The search is bounded by a hard time
+    budget, checked before every expansion; when it runs out the best
+    complete plan found so far (at worst the greedy seed) is used.
+    """
+
+    def __init__(self, horizon: int = 6, run_depth: int = 3,
+                 max_pick: int = 10, time_budget_ms: float = 5.0):
+        self.horizon = horizon
+        self.run_depth = run_depth
+        self.max_pick = max_pick
+        self.time_budget_ms = time_budget_ms
+
+        # Stats of the last plan and totals (exposed through the API)
+        self.last_stats: Dict = {}
+        self.plans = 0
+        self.timeouts = 0
+        self.max_elapsed_ms = 0.0
+
+    def plan(self, fronts: Dict[str, List[Run]],
+             last_color: Optional[str]) -> List[PlannedPick]:
+        """
+        Plan the next picks.
+        fronts: buffer_id -> runs at the front of the buffer (oldest first)
+        Returns: list of (buffer_id, color, pick_count), empty if nothing to pick
+        """
+        started = time.perf_counter()
+        self._deadline = started + self.time_budget_ms / 1000.0
+        self._nodes = 0
+        self._seen: Dict[Tuple, Tuple[int, int]] = {}
+
+        self._buffer_ids = [bid for bid, runs in fronts.items() if runs]
+        self._runs = [fronts[bid][:self.run_depth] for bid in self._buffer_ids]
+
+        # Per buffer position: (run_index, cars left in that run)
+        start = tuple((0, runs[0][1]) for runs in self._runs)
+
+        # Seed the incumbent with a greedy rollout so a timeout still yields a plan
+        self._best_cost, self._best_path = self._greedy_rollout(start, last_color)
+
+        timed_out = False
+        try:
+            self._search(start, last_color, self.horizon, 0, 0, [])
+        except _PlannerTimeout:
+            timed_out = True
+        # Free the search table now, so its teardown counts against this plan
+        self._seen = {}
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.plans += 1
+        self.timeouts += timed_out
+        self.max_elapsed_ms = max(self.max_elapsed_ms, elapsed_ms)
+        self.last_stats = {
+            'nodes': self._nodes,
+            'timed_out': timed_out,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'planned_changeovers': self._best_cost[0],
+            'planned_cars': -self._best_cost[1],
+            'plan': [
+                {'buffer': bid, 'color': color, 'count': count}
+                for bid, color, count in self._best_path
+            ]
+        }
+
+        if timed_out:
+            logger.debug(f"Planner hit time budget after {self._nodes} nodes")
+
+        return list(self._best_path)
+
+    def stats(self) -> Dict:
+        """Totals since start; a high timeout rate means plans are mostly the greedy seed"""
+        return {
+            'plans': self.plans,
+            'timeouts': self.timeouts,
+            'timeout_rate': round(self.timeouts / self.plans, 3) if self.plans else 0.0,
+            'max_elapsed_ms': round(self.max_elapsed_ms, 3)
+        }
+
+    def _moves(self, positions: Tuple, last_color: Optional[str]):
+        """Candidate picks, same-color and longest runs first"""
+        moves = []
+        for i, (run_index, left) in enumerate(positions):
+            if run_index >= len(self._runs[i]):
+                continue
+            color = self._runs[i][run_index][0]
+            take = min(left, self.max_pick)
+            changeover = 1 if last_color and color != last_color else 0
+            moves.append((changeover, -take, i, color, take))
+        moves.sort()
+        return moves
+
+    def _advance(self, positions: Tuple, i: int, take: int) -> Tuple:
+        run_index, left = positions[i]
+        left -= take
+        if left == 0:
+            run_index += 1
+            runs = self._runs[i]
+            left = runs[run_index][1] if run_index < len(runs) else 0
+        return positions[:i] + ((run_index, left),) + positions[i + 1:]
+
+    def _greedy_rollout(self, positions: Tuple,
+                        last_color: Optional[str]) -> Tuple[Tuple[int, int], List[PlannedPick]]:
+        changeovers = 0
+        cars = 0
+        path: List[PlannedPick] = []
+        for _ in range(self.horizon):
+            moves = self._moves(positions, last_color)
+            if not moves:
+                break
+            changeover, _, i, color, take = moves[0]
+            changeovers += changeover
+            cars += take
+            path.append((self._buffer_ids[i], color, take))
+            positions = self._advance(positions, i, take)
+            last_color = color
+        return (changeovers, -cars), path
+
+    def _search(self, positions: Tuple, last_color: Optional[str], depth: int,
+                changeovers: int, cars: int, path: List[PlannedPick]):
+        self._nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise _PlannerTimeout()
+
+        # Bound: even painting max_pick cars per remaining pick can't beat the incumbent
+        if (changeovers, -(cars + depth * self.max_pick)) >= self._best_cost:
+            return
+
+        # Dominance: same state reached before with an equal or better prefix
+        key = (positions, last_color, depth)
+        seen = self._seen.get(key)
+        if seen is not None and seen <= (changeovers, -cars):
+            return
+        self._seen[key] = (changeovers, -cars)
+
+        moves = self._moves(positions, last_color) if depth > 0 else []
+        if not moves:
+            cost = (changeovers, -cars)
+            if cost < self._best_cost:
+                self._best_cost = cost
+                self._best_path = list(path)
+            return
+
+        for changeover, _, i, color, take in moves:
+            if time.perf_counter() > self._deadline:
+                raise _PlannerTimeout()
+            path.append((self._buffer_ids[i], color, take))
+            self._search(
+                self._advance(positions, i, take), color, depth - 1,
+                changeovers + changeover, cars + take, path
+            )
+            path.pop()
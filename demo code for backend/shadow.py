@@ -0,0 +1,275 @@
+# services/shadow.py
+import multiprocessing as mp
+import queue
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from config import settings, Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters compared between live and shadow schedulers (since shadow start)
+COMPARED_METRICS = (
+    'throughput', 'total_changeovers', 'paint_changeovers',
+    'buffer_overflow_events', 'o2_stoppage_events', 'total_lost_time_seconds'
+)
+
+SHIFT_SECONDS = 28800
+
+# Time a stopped shadow process gets to exit before it is terminated
+STOP_GRACE_SECONDS = 2.0
+
+
+def _metrics_summary(metrics) -> Dict:
+    return {field: getattr(metrics, field) for field in COMPARED_METRICS}
+
+
+def _apply_maintenance(shadow, event: tuple):
+    """Apply one live maintenance event to a shadow scheduler"""
+    kind, buffer_id = event[0], event[1]
+    if kind == "availability":
+        shadow.buffers[buffer_id].is_available = event[2]
+    elif kind == "plan":
+        # The shadow drains the buffer with its own strategy, as the live one does
+        _, _, start_tick, end_tick, drain = event
+        shadow.maintenance.schedule(buffer_id, max(start_tick, shadow.current_tick), end_tick, drain)
+    elif kind == "cancel":
+        shadow.maintenance.cancel(buffer_id)
+
+
+def _shadow_worker(candidates: List[Dict], initial_state: Dict,
+                   events: mp.Queue, results: mp.Queue, report_every: int):
+    """
+    Shadow process: replays the live event stream into one scheduler per
+    candidate configuration and reports their metrics back.
+    """
+    from services.scheduler import PaintShopScheduler
+
+    schedulers = {}
+    for candidate in candidates:
+        shadow = PaintShopScheduler(overrides=candidate.get('overrides') or {})
+        shadow.restore_state(initial_state)
+        schedulers[candidate['name']] = shadow
+
+    while True:
+        message = events.get()
+        if message is None:
+            break
+
+        tick, maintenance, arrivals, step = message
+        for shadow in schedulers.values():
+            for event in maintenance:
+                _apply_maintenance(shadow, event)
+
+            if step:
+                shadow.begin_tick(tick)
+                for oven_name in shadow.ovens:
+                    shadow.step_oven(oven_name)
+                shadow.pick_from_conveyor()
+            # Nobody reports a shadow's availability changes
+            shadow.maintenance.take_changes()
+
+            for vehicle in arrivals:
+                shadow.vehicles_by_id[vehicle['car_id']] = dict(vehicle)
+                shadow.ovens[vehicle['oven']].append(vehicle['car_id'])
+
+        if tick % report_every == 0:
+            summaries = {}
+            for name, shadow in schedulers.items():
+                shadow.refresh_metrics()
+                summaries[name] = _metrics_summary(shadow.metrics)
+            try:
+                results.put_nowait((tick, summaries))
+            except queue.Full:
+                pass
+
+
+class ShadowEvaluator:
+    """
+    Runs candidate scheduler configurations in a separate process, fed the
+    same arrivals and maintenance events as the live scheduler.
+
+    The live side only does non-blocking queue puts, once per tick. If the
+    shadow process falls behind and its queue fills up, the shadows are
+    marked desynced rather than slowing the production tick.
+    """
+
+    def __init__(self, queue_size: int = 2000, report_every: int = 10, history_size: int = 500):
+        self.queue_size = queue_size
+        self.report_every = report_every
+        self._ctx = mp.get_context("spawn")
+        self._process: Optional[mp.Process] = None
+        self._exiting: List[tuple] = []   # (process, terminate_at) of stopped shadows
+        self._events: Optional[mp.Queue] = None
+        self._results: Optional[mp.Queue] = None
+
+        self.candidates: List[Dict] = []
+        self.desynced = False
+        self.started_at_tick: Optional[int] = None
+
+        # Events collected during the current tick
+        self._maintenance: List = []
+        self._arrivals: List[Dict] = []
+
+        # Live metrics since shadow start, by tick (for aligned diffs)
+        self._baseline: Dict = {}
+        self._live: deque = deque(maxlen=history_size)
+        self._latest: Optional[tuple] = None
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self, candidates: List[Dict], live_scheduler, tick: int):
+        """Spawn the shadow process, seeded with the live scheduler's current state"""
+        if self.running:
+            raise RuntimeError("Shadow evaluation already running")
+        if not candidates:
+            raise ValueError("At least one candidate configuration is required")
+        for candidate in candidates:
+            unknown = set(candidate.get('overrides') or {}) - set(Settings.model_fields)
+            if unknown:
+                raise ValueError(f"Unknown settings in {candidate['name']}: {sorted(unknown)}")
+
+        self._reap()
+        self._events = self._ctx.Queue(maxsize=self.queue_size)
+        self._results = self._ctx.Queue(maxsize=self.queue_size)
+        process = self._ctx.Process(
+            target=_shadow_worker,
+            args=(candidates, live_scheduler.export_state(), self._events,
+                  self._results, self.report_every),
+            daemon=True,
+            name="shadow-evaluator"
+        )
+        # Only a started process is ever stopped
+        process.start()
+        self._process = process
+
+        self.candidates = candidates
+        self.desynced = False
+        self.started_at_tick = tick
+        self._maintenance = []
+        self._arrivals = []
+        self._baseline = _metrics_summary(live_scheduler.metrics)
+        self._live.clear()
+        self._latest = None
+        logger.info(f"👥 Shadow evaluation started at tick {tick}: {[c['name'] for c in candidates]}")
+
+    def stop(self):
+        """Signal the shadow process to exit; it is reaped later, so the tick never waits"""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            self._events.put_nowait(None)
+        except queue.Full:
+            process.terminate()
+        self._exiting.append((process, time.monotonic() + STOP_GRACE_SECONDS))
+        self._reap()
+        logger.info("👥 Shadow evaluation stopped")
+
+    def _reap(self):
+        """Join stopped shadow processes that exited; terminate those past their grace time"""
+        now = time.monotonic()
+        exiting = []
+        for process, terminate_at in self._exiting:
+            if process.is_alive() and now >= terminate_at:
+                process.terminate()
+            if process.is_alive():
+                exiting.append((process, terminate_at))
+            else:
+                process.join()
+        self._exiting = exiting
+
+    def record_arrivals(self, vehicles: List[Dict]):
+        if self.running:
+            self._arrivals.extend(
+                {key: v.get(key) for key in ('car_id', 'color', 'oven', 'priority')}
+                for v in vehicles
+            )
+
+    def record_maintenance(self, buffer_id: str, is_available: bool):
+        if self.running:
+            self._maintenance.append(("availability", buffer_id, is_available))
+
+    def record_maintenance_plan(self, plan: Dict):
+        """Forward a scheduled maintenance plan; each shadow drains for it itself"""
+        if self.running:
+            self._maintenance.append(
+                ("plan", plan['buffer_id'], plan['start_tick'], plan['end_tick'], plan['drain'])
+            )
+
+    def record_maintenance_cancel(self, buffer_id: str):
+        if self.running:
+            self._maintenance.append(("cancel", buffer_id))
+
+    def end_tick(self, tick: int, live_metrics, step: bool = True):
+        """
+        Forward this tick's events to the shadows (never blocks).
+        step=False only delivers events, e.g. the initial load before tick 1.
+        """
+        if self._exiting:
+            self._reap()
+        if not self.running or self.desynced:
+            return
+
+        message = (tick, self._maintenance, self._arrivals, step)
+        self._maintenance = []
+        self._arrivals = []
+        try:
+            self._events.put_nowait(message)
+        except queue.Full:
+            self.desynced = True
+            logger.warning("👥 Shadow queue full - shadows desynced, stop and restart to resume")
+            return
+
+        if tick % self.report_every == 0:
+            live = _metrics_summary(live_metrics)
+            self._live.append((tick, {
+                field: live[field] - self._baseline[field]
+                for field in COMPARED_METRICS
+            }))
+
+    def _drain_results(self):
+        while self._results is not None:
+            try:
+                self._latest = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+    def report(self) -> Dict:
+        """Latest shadow metrics with diffs against live metrics at the same tick"""
+        self._drain_results()
+        report = {
+            'running': self.running,
+            'desynced': self.desynced,
+            'started_at_tick': self.started_at_tick,
+            'candidates': [c['name'] for c in self.candidates],
+            'tick': None,
+            'live': None,
+            'shadows': {}
+        }
+        if self._latest is None:
+            return report
+
+        tick, summaries = self._latest
+        live = next((m for t, m in reversed(self._live) if t == tick), None)
+        report['tick'] = tick
+        report['live'] = live
+        for name, metrics in summaries.items():
+            diff = None
+            if live:
+                diff = {field: metrics[field] - live[field] for field in COMPARED_METRICS}
+                # Efficiency is linear in lost time over an 8-hour shift
+                diff['efficiency_percent'] = round(
+                    -diff['total_lost_time_seconds'] / SHIFT_SECONDS * 100, 3
+                )
+            report['shadows'][name] = {'metrics': metrics, 'diff': diff}
+        return report
+
+# Singleton instance
+shadow_evaluator = ShadowEvaluator(
+    queue_size=settings.SHADOW_QUEUE_SIZE,
+    report_every=settings.SHADOW_REPORT_EVERY_TICKS
+)
@@ -1,10 +1,20 @@
 # services/simulation_engine.py
 import asyncio
-import random
-from typing import List, Dict
-from services.scheduler import scheduler
+import time
+from collections import deque
+from typing import List, Dict, Optional
+from services.scheduler import get_scheduler
 from services.firestore_service import firestore_service
-from config import settings, COLOR_DISTRIBUTION
+from services.metrics_history import metrics_history
+from services.run_export import run_exporter
+from services.state_actor import get_state_actor, report_availability_changes
+from services.profiler import profiler
+from services.shadow import shadow_evaluator
+from services.realtime_publisher import realtime_publisher
+from services.status_buckets import status_buckets
+from services.priority_queue import latency_tracker, DEFAULT_PRIORITY
+from services.vehicle_generator import make_generator
+from config import settings
 from models.vehicle import VehicleStatus
 import logging
 
@@ -12,171 +22,262 @@ logger = logging.getLogger(__name__)
 
 class SimulationEngine:
     def __init__(self):
+        self.scheduler = get_scheduler()
+        self.state_actor = get_state_actor()
         self.running = False
         self.tick = 0
         self.task = None
+        # Bucketed status layout: vehicle docs keep their seeded status, so load
+        # progress is tracked here and persisted with each status bucket
+        self.load_cursor: Optional[int] = None  # Last loaded car_id
+        self._resume_car_ids: List[int] = []    # Loaded before a restart, never reached a buffer
+        self._resume_checked = False
+        
+        # How late each tick started versus TICK_RATE_SECONDS (recent ticks)
+        self.tick_lag: deque = deque(maxlen=2000)
+        self._last_tick_started: Optional[float] = None
     
-    def generate_vehicles(self, num_vehicles: int = None) -> List[Dict]:
-        """Generate vehicle queue based on color distribution"""
+    async def seed_data(self, num_vehicles: int = None, seed: Optional[int] = None,
+                        mode: Optional[str] = None, pattern: Optional[str] = None):
+        """Seed vehicles to Firestore, one generator chunk at a time"""
         if num_vehicles is None:
             num_vehicles = settings.NUM_VEHICLES
         
-        vehicles = []
-        color_counts = {}
-        
-        # Calculate counts per color
-        for color, pct in COLOR_DISTRIBUTION.items():
-            count = int(num_vehicles * pct)
-            color_counts[color] = count
-        
-        # Adjust to exact total
-        diff = num_vehicles - sum(color_counts.values())
-        color_counts['C1'] += diff
-        
-        # Generate vehicles
-        car_id = 1
-        for color, count in color_counts.items():
-            for _ in range(count):
-                vehicles.append({
-                    'car_id': car_id,
-                    'color': color,
-                    'oven': scheduler.assign_oven(color),
-                    'buffer': None,
-                    'status': VehicleStatus.WAITING.value,
-                    'batch_id': None,
-                    'priority': int(color[1:])
-                })
-                car_id += 1
-        
-        # Shuffle for realistic arrival
-        random.shuffle(vehicles)
-        logger.info(f"Generated {len(vehicles)} vehicles")
-        return vehicles
-    
-    async def seed_data(self, num_vehicles: int = None):
-        """Seed vehicles to Firestore"""
-        vehicles = self.generate_vehicles(num_vehicles)
-        success = firestore_service.seed_vehicles(vehicles)
+        generator = make_generator(self.scheduler.assign_oven, seed, mode, pattern)
+        success = True
+        for batch in generator.iter_batches(num_vehicles):
+            if not firestore_service.seed_vehicles(batch):
+                success = False
+                break
         
         if success:
-            logger.info("Data seeding complete")
+            logger.info(f"Data seeding complete ({generator.mode}/{generator.pattern}, seed={generator.seed})")
         return success
     
     async def load_waiting_vehicles(self, limit: int = 500) -> int:
         """Load waiting vehicles into oven queues"""
-        vehicles = firestore_service.get_waiting_vehicles(limit)
-        count = 0
+        if settings.VEHICLE_STATUS_LAYOUT == "buckets":
+            if not self._resume_checked:
+                self._resume_from_storage()
+            vehicles = []
+            if self._resume_car_ids:
+                vehicles = firestore_service.get_vehicles_by_ids(self._resume_car_ids[:limit])
+                self._resume_car_ids = self._resume_car_ids[limit:]
+            if len(vehicles) < limit:
+                # Page through the seeded vehicles by car_id
+                more = firestore_service.get_vehicles_after(self.load_cursor, limit - len(vehicles))
+                if more:
+                    self.load_cursor = more[-1]['car_id']
+                vehicles += more
+        else:
+            vehicles = firestore_service.get_waiting_vehicles(limit)
         
+        count = self.queue_vehicles(vehicles)
+        logger.info(f"Loaded {count} vehicles into oven queues")
+        return count
+    
+    def _resume_from_storage(self):
+        """Pick up load progress persisted by a previous process (bucketed layout)"""
+        meta = firestore_service.get_status_meta()
+        self._resume_checked = firestore_service.connected
+        if not meta:
+            return
+        self.load_cursor = meta.get('load_cursor')
+        self._resume_car_ids = list(meta.get('queued_car_ids', []))
+        status_buckets.seq = max(status_buckets.seq, meta.get('seq', 0))
+        logger.info(
+            f"Resuming after car {self.load_cursor} "
+            f"({len(self._resume_car_ids)} queued cars reloaded first)"
+        )
+    
+    def status_meta(self) -> Dict:
+        """Load progress stored with each status bucket"""
+        # Cars after load_cursor and in queued_car_ids have no transition written yet
+        queued = [car_id for queue in self.scheduler.ovens.values() for car_id in queue]
+        return {
+            'load_cursor': self.load_cursor,
+            'queued_car_ids': sorted(queued) + self._resume_car_ids
+        }
+    
+    def queue_vehicles(self, vehicles: List[Dict]) -> int:
+        """Put vehicles into their oven queues, arriving at the current tick"""
+        arrival_time = time.time()
         for vehicle in vehicles:
             car_id = vehicle['car_id']
-            oven = vehicle['oven']
-            scheduler.ovens[oven].append(car_id)
-            scheduler.vehicles_by_id[car_id] = vehicle
-            count += 1
+            vehicle['arrival_tick'] = self.tick
+            vehicle['arrival_time'] = arrival_time
+            self.scheduler.vehicles_by_id[car_id] = vehicle
+            self.scheduler.ovens[vehicle['oven']].append(car_id)
         
-        logger.info(f"Loaded {count} vehicles into oven queues")
-        return count
+        shadow_evaluator.record_arrivals(vehicles)
+        return len(vehicles)
     
     async def oven_step(self, oven_name: str):
         """Process one oven: move vehicles from oven to buffers"""
-        for _ in range(settings.OVEN_PRODUCTION_RATE):
-            if not scheduler.ovens[oven_name]:
-                return
-            
-            car_id = scheduler.ovens[oven_name].popleft()
-            vehicle = scheduler.vehicles_by_id.get(car_id)
-            
-            if not vehicle:
-                continue
-            
-            # Assign to buffer
-            result = scheduler.assign_vehicle_to_buffer(vehicle)
-            
-            if not result['success']:
-                # Buffer overflow - requeue and pause
-                scheduler.ovens[oven_name].appendleft(car_id)
-                logger.warning(f"Buffer overflow for {car_id}, requeuing")
-                return
+        for result in self.scheduler.step_oven(oven_name):
+            car_id = result['car_id']
+            vehicle = self.scheduler.vehicles_by_id[car_id]
+            vehicle['buffer_time'] = time.time()
             
             # Update Firestore
-            firestore_service.update_vehicle(car_id, {
-                'buffer': result['buffer'],
-                'status': VehicleStatus.IN_BUFFER.value,
-                'batch_id': result['batch_id']
-            })
+            if settings.VEHICLE_STATUS_LAYOUT == "buckets":
+                status_buckets.record(self.tick, car_id, VehicleStatus.IN_BUFFER.value,
+                                      result['buffer'], result['batch_id'])
+            else:
+                firestore_service.update_vehicle(car_id, {
+                    'buffer': result['buffer'],
+                    'status': VehicleStatus.IN_BUFFER.value,
+                    'batch_id': result['batch_id']
+                })
     
     async def conveyor_step(self):
         """Main conveyor picks and processes vehicles"""
-        picked_cars = scheduler.pick_from_conveyor()
+        picked_cars = self.scheduler.pick_from_conveyor()
         
         if picked_cars:
+            painted_time = time.time()
+            painted = []
+            for car_id in picked_cars:
+                vehicle = self.scheduler.vehicles_by_id[car_id]
+                vehicle['painted_tick'] = self.tick
+                vehicle['painted_time'] = painted_time
+                painted.append(vehicle)
+                if vehicle.get('arrival_tick') is not None:
+                    latency_tracker.record(
+                        vehicle.get('priority', DEFAULT_PRIORITY),
+                        self.tick - vehicle['arrival_tick'],
+                        painted_time - vehicle['arrival_time']
+                    )
+            run_exporter.record_painted(painted)
+            
             # Batch update Firestore
-            updates = [
-                (car_id, {'status': VehicleStatus.PAINTED.value, 'buffer': None})
-                for car_id in picked_cars
-            ]
-            firestore_service.batch_update_vehicles(updates)
+            if settings.VEHICLE_STATUS_LAYOUT == "buckets":
+                for car_id in picked_cars:
+                    status_buckets.record(self.tick, car_id, VehicleStatus.PAINTED.value)
+            else:
+                updates = [
+                    (car_id, {'status': VehicleStatus.PAINTED.value, 'buffer': None})
+                    for car_id in picked_cars
+                ]
+                firestore_service.batch_update_vehicles(updates)
             
             logger.debug(f"Conveyor picked {len(picked_cars)} vehicles")
     
-    async def update_realtime_state(self):
-        """Push current state to Firestore for frontend"""
-        # Update metrics
-        metrics = scheduler.get_metrics_dict()
-        metrics['current_tick'] = self.tick
-        metrics['simulation_running'] = self.running
-        firestore_service.update_metrics(metrics)
-        
-        # Update buffer states
-        for buffer_id, buffer in scheduler.buffers.items():
-            firestore_service.update_buffer_state(buffer_id, buffer.dict())
+    async def update_realtime_state(self, force: bool = False):
+        """Push the latest published snapshot to Firestore for frontend (adaptive cadence)"""
+        realtime_publisher.publish(self.state_actor.snapshot, force=force)
     
     async def simulation_loop(self):
         """Main simulation loop"""
         logger.info("Starting simulation loop")
         self.running = True
+        self.state_actor.ticking = True
         
-        # Initial load
-        await self.load_waiting_vehicles(500)
-        
-        while self.running:
-            self.tick += 1
-            
-            # Process ovens
-            await self.oven_step("O1")
-            await self.oven_step("O2")
+        try:
+            run_exporter.start_run(list(self.scheduler.buffers.keys()))
             
-            # Process conveyor
-            await self.conveyor_step()
+            # Initial load
+            await self.load_waiting_vehicles(500)
+            shadow_evaluator.end_tick(self.tick, self.scheduler.metrics, step=False)
+            self._last_tick_started = None
             
-            # Reload if ovens empty
-            if not scheduler.ovens["O1"] and not scheduler.ovens["O2"]:
-                loaded = await self.load_waiting_vehicles(200)
-                if loaded == 0:
-                    # Check if buffers are also empty
-                    total_occupancy = sum(
-                        b.current_occupancy for b in scheduler.buffers.values()
+            while self.running:
+                tick_started = time.perf_counter()
+                if self._last_tick_started is not None:
+                    self.tick_lag.append(max(
+                        0.0, tick_started - self._last_tick_started - settings.TICK_RATE_SECONDS
+                    ))
+                self._last_tick_started = tick_started
+                self.tick += 1
+                
+                # Apply queued API mutations at the tick boundary
+                self.state_actor.tick = self.tick
+                self.state_actor.drain()
+                self.scheduler.begin_tick(self.tick)
+                report_availability_changes()
+                
+                # Process ovens
+                with profiler.phase("oven_step"):
+                    for oven_name in self.scheduler.ovens:
+                        await self.oven_step(oven_name)
+                
+                # Process conveyor
+                with profiler.phase("conveyor_step"):
+                    await self.conveyor_step()
+                
+                # Publish read snapshot and record history point
+                with profiler.phase("publish"):
+                    self.state_actor.publish(self.tick, self.running)
+                    metrics_history.record(self.tick, self.scheduler.metrics, self.scheduler.buffers)
+                    run_exporter.record_tick(self.tick, self.scheduler.metrics, self.scheduler.buffers)
+                
+                # Reload if ovens empty
+                if not any(self.scheduler.ovens.values()):
+                    loaded = await self.load_waiting_vehicles(200)
+                    if loaded == 0:
+                        # Check if buffers are also empty
+                        total_occupancy = sum(
+                            b.current_occupancy for b in self.scheduler.buffers.values()
+                        )
+                        if total_occupancy == 0:
+                            logger.info("Simulation complete - all vehicles processed")
+                            self.running = False
+                            break
+                
+                # Update real-time state when the publisher is due
+                with profiler.phase("realtime_publish"):
+                    await self.update_realtime_state()
+                
+                if self.tick % 10 == 0:
+                    logger.info(
+                        f"Tick {self.tick}: Throughput={self.scheduler.metrics.throughput}, "
+                        f"Changeovers={self.scheduler.metrics.total_changeovers}"
                     )
-                    if total_occupancy == 0:
-                        logger.info("Simulation complete - all vehicles processed")
-                        self.running = False
-                        break
-            
-            # Update real-time state every 10 ticks
-            if self.tick % 10 == 0:
-                await self.update_realtime_state()
-                logger.info(
-                    f"Tick {self.tick}: Throughput={scheduler.metrics.throughput}, "
-                    f"Changeovers={scheduler.metrics.total_changeovers}"
-                )
-            
-            # Tick rate
-            await asyncio.sleep(settings.TICK_RATE_SECONDS)
-        
-        # Final state update
-        await self.update_realtime_state()
+                
+                status_buckets.end_tick(self.tick)
+                shadow_evaluator.end_tick(self.tick, self.scheduler.metrics)
+                profiler.end_tick(self.tick, {'vehicles_cached': len(self.scheduler.vehicles_by_id)})
+                
+                # Tick rate
+                await asyncio.sleep(settings.TICK_RATE_SECONDS)
+        except Exception as e:
+            logger.exception(f"❌ Simulation loop failed at tick {self.tick}: {e}")
+        finally:
+            # Also on failure, so queued commands are applied instead of waiting forever
+            self.running = False
+            self.state_actor.ticking = False
+            self.state_actor.drain()
+            await self._finish()
         logger.info("Simulation stopped")
     
+    async def _finish(self):
+        """Final state update and flushes; each step runs even if another fails"""
+        try:
+            self.state_actor.publish(self.tick, running=False)
+            await self.update_realtime_state(force=True)
+        except Exception as e:
+            logger.error(f"Final state update failed: {e}")
+        try:
+            status_buckets.flush()
+        except Exception as e:
+            logger.error(f"Status bucket flush failed: {e}")
+        try:
+            run_exporter.finish_run()
+        except Exception as e:
+            logger.error(f"Run export finish failed: {e}")
+    
+    def tick_lag_report(self) -> Dict:
+        """Percentiles of recent tick lateness, in milliseconds"""
+        samples = sorted(self.tick_lag)
+        report = {'samples': len(samples), 'tick_rate_ms': settings.TICK_RATE_SECONDS * 1000}
+        if not samples:
+            return report
+        last = len(samples) - 1
+        for p in (50, 95, 99):
+            report[f'p{p}_ms'] = round(samples[min(last, int(p / 100 * len(samples)))] * 1000, 2)
+        report['max_ms'] = round(samples[-1] * 1000, 2)
+        return report
+    
     async def start(self):
         """Start simulation"""
         if self.running:
@@ -200,13 +301,36 @@ class SimulationEngine:
         # Clear Firestore
         firestore_service.clear_collection('vehicles')
         firestore_service.clear_collection('buffers')
+        firestore_service.clear_collection('vehicle_status')
+        firestore_service.clear_collection('vehicle_status_meta')
+        
+        # Shadows were seeded from the old state; their diffs would be stale
+        shadow_evaluator.stop()
         
         # Reset scheduler
-        scheduler.__init__()
+        self.scheduler.__init__()
+        metrics_history.clear()
+        realtime_publisher.reset()
+        latency_tracker.clear()
+        self.tick_lag.clear()
         self.tick = 0
+        self.load_cursor = None
+        self._resume_car_ids = []
+        self._resume_checked = True
+        status_buckets.reset()
+        self.state_actor.publish(0, running=False)
         
         logger.info("Simulation reset complete")
         return {"status": "reset"}
 
-# Singleton instance
-simulation = SimulationEngine()
\ No newline at end of file
+# Singleton instance (built on first use, not at import)
+_simulation: Optional[SimulationEngine] = None
+
+
+def get_simulation() -> SimulationEngine:
+    """The live simulation engine"""
+    global _simulation
+    if _simulation is None:
+        _simulation = SimulationEngine()
+        status_buckets.meta_provider = _simulation.status_meta
+    return _simulation
@@ -0,0 +1,216 @@
+# services/state_actor.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from services.scheduler import get_scheduler
+from services.firestore_service import firestore_service
+from services.shadow import shadow_evaluator
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StateSnapshot(NamedTuple):
+    """Read-only view of scheduler state, published once per tick"""
+    tick: int
+    running: bool
+    published_at: float
+    metrics: Dict
+    buffers: Dict[str, Dict]
+    color_distribution: Dict[str, Dict[str, int]]
+    planner: Dict
+    forecasts: Dict[str, Dict]
+    maintenance_plans: List[Dict]
+
+
+class SchedulerCommand:
+    def __init__(self, seq: int, name: str, payload: Dict, future: asyncio.Future):
+        self.seq = seq
+        self.name = name
+        self.payload = payload
+        self.future = future
+        self.submitted_at = time.time()
+
+
+class SchedulerActor:
+    """
+    Single writer for scheduler state.
+
+    API handlers submit mutations as commands; while the simulation is
+    ticking they are applied in submission order at the next tick boundary,
+    otherwise right away. Reads are served from the last published
+    StateSnapshot, which is rebuilt (never mutated) after each tick.
+    """
+
+    def __init__(self, audit_size: int = 500):
+        self._handlers: Dict[str, Callable[[Dict], Any]] = {}
+        self._pending: deque = deque()
+        self._seq = 0
+        self.audit: deque = deque(maxlen=audit_size)
+        self.ticking = False
+        self.tick = 0
+        self.snapshot: Optional[StateSnapshot] = None
+
+    def register(self, name: str, handler: Callable[[Dict], Any]):
+        self._handlers[name] = handler
+
+    async def submit(self, name: str, payload: Dict) -> Any:
+        """Queue a command and wait until it has been applied"""
+        if name not in self._handlers:
+            raise ValueError(f"Unknown command: {name}")
+
+        self._seq += 1
+        command = SchedulerCommand(self._seq, name, payload, asyncio.get_running_loop().create_future())
+        self._pending.append(command)
+
+        if not self.ticking:
+            self.drain()
+            self.publish(self.tick, running=False)
+
+        return await command.future
+
+    def drain(self) -> int:
+        """Apply all pending commands in order (tick boundary)"""
+        applied = 0
+        while self._pending:
+            command = self._pending.popleft()
+            entry = {
+                'seq': command.seq,
+                'command': command.name,
+                'payload': command.payload,
+                'submitted_at': command.submitted_at,
+                'applied_tick': self.tick
+            }
+            try:
+                result = self._handlers[command.name](command.payload)
+                entry['status'] = 'applied'
+                if not command.future.done():
+                    command.future.set_result(result)
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+                logger.error(f"Command {command.name} #{command.seq} failed: {e}")
+                if not command.future.done():
+                    command.future.set_exception(e)
+            self.audit.append(entry)
+            applied += 1
+        return applied
+
+    def publish(self, tick: int, running: bool) -> StateSnapshot:
+        """Build and publish a fresh snapshot of scheduler state"""
+        scheduler = get_scheduler()
+        self.tick = tick
+        metrics = scheduler.get_metrics_dict()
+        metrics['current_tick'] = tick
+        metrics['simulation_running'] = running
+
+        self.snapshot = StateSnapshot(
+            tick=tick,
+            running=running,
+            published_at=time.time(),
+            metrics=metrics,
+            buffers=metrics['buffer_states'],
+            color_distribution={
+                color: dict(counts)
+                for color, counts in scheduler.assignment_counts.items()
+            },
+            planner={
+                **scheduler.planner.stats(),
+                'last_plan': dict(scheduler.planner.last_stats)
+            },
+            forecasts={
+                buffer_id: dict(forecast)
+                for buffer_id, forecast in scheduler.forecaster.forecasts.items()
+            },
+            maintenance_plans=scheduler.maintenance.export()
+        )
+        return self.snapshot
+
+    def recent_commands(self, limit: int = 100) -> List[Dict]:
+        return list(self.audit)[-limit:]
+
+
+# ============================================
+# COMMAND HANDLERS
+# ============================================
+
+def report_availability_changes():
+    """Store buffer availability changes made by maintenance plans"""
+    # Shadows get the plans themselves and make these changes on their own
+    scheduler = get_scheduler()
+    for buffer_id, is_available in scheduler.maintenance.take_changes():
+        firestore_service.update_buffer_state(buffer_id, scheduler.buffers[buffer_id].dict())
+
+
+def _set_buffer_maintenance(payload: Dict) -> Dict:
+    buffer = get_scheduler().buffers.get(payload['buffer_id'])
+    if buffer is None:
+        raise KeyError(f"Buffer {payload['buffer_id']} not found")
+
+    buffer.is_available = payload['is_available']
+    shadow_evaluator.record_maintenance(buffer.buffer_id, buffer.is_available)
+    state = buffer.dict()
+    firestore_service.update_buffer_state(buffer.buffer_id, state)
+    return state
+
+
+def _plan_maintenance(payload: Dict) -> Dict:
+    scheduler = get_scheduler()
+    # The window was projected from an earlier tick; if its start has passed
+    # meanwhile, shift it to now and keep its length
+    start_tick = max(payload['start_tick'], scheduler.current_tick)
+    end_tick = payload.get('end_tick')
+    if end_tick is not None:
+        end_tick += start_tick - payload['start_tick']
+    plan = scheduler.maintenance.schedule(
+        payload['buffer_id'], start_tick, end_tick, payload.get('drain', True)
+    ).to_dict()
+    shadow_evaluator.record_maintenance_plan(plan)
+    report_availability_changes()
+    return plan
+
+
+def _cancel_maintenance(payload: Dict) -> Dict:
+    plan = get_scheduler().maintenance.cancel(payload['buffer_id'])
+    if plan is None:
+        raise KeyError(f"No maintenance plan for {payload['buffer_id']}")
+    shadow_evaluator.record_maintenance_cancel(payload['buffer_id'])
+    report_availability_changes()
+    return plan.to_dict()
+
+
+def _rush_vehicle(payload: Dict) -> Dict:
+    return get_scheduler().rush_vehicle(payload['car_id'], payload['priority'])
+
+
+def _start_shadow(payload: Dict) -> Dict:
+    # Runs at a tick boundary, so shadows start from a consistent state
+    tick = get_state_actor().tick
+    shadow_evaluator.start(payload['candidates'], get_scheduler(), tick)
+    return {'started_at_tick': tick}
+
+
+def _stop_shadow(payload: Dict) -> Dict:
+    shadow_evaluator.stop()
+    return {'stopped_at_tick': get_state_actor().tick}
+
+
+# Singleton instance (built with its first snapshot on first use, not at import)
+_state_actor: Optional[SchedulerActor] = None
+
+
+def get_state_actor() -> SchedulerActor:
+    """The scheduler actor, with all command handlers registered"""
+    global _state_actor
+    if _state_actor is None:
+        actor = SchedulerActor()
+        actor.register("set_buffer_maintenance", _set_buffer_maintenance)
+        actor.register("rush_vehicle", _rush_vehicle)
+        actor.register("plan_maintenance", _plan_maintenance)
+        actor.register("cancel_maintenance", _cancel_maintenance)
+        actor.register("start_shadow", _start_shadow)
+        actor.register("stop_shadow", _stop_shadow)
+        actor.publish(0, running=False)
+        _state_actor = actor
+    return _state_actor
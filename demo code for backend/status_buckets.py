@@ -0,0 +1,125 @@
+# services/status_buckets.py
+from typing import Callable, Dict, Iterable, List, Optional
+from services.firestore_service import firestore_service
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_LAYOUTS = ("documents", "buckets")
+
+
+class StatusBucketWriter:
+    """
+    Packs vehicle status transitions into one document per tick range
+    (VEHICLE_STATUS_LAYOUT = "buckets"), instead of one write per car.
+
+    A bucket holds parallel arrays (car_ids, statuses, buffers, batch_ids,
+    ticks) in transition order. It is written when its tick range ends,
+    when it reaches max_entries, or on flush(). Bucket ids start with a
+    sequence number that survives restarts (kept in the writer's meta doc,
+    together with meta_provider's load progress), so ids never collide.
+    """
+
+    def __init__(self, bucket_ticks: int = 10, max_entries: int = 2000):
+        self.bucket_ticks = max(1, bucket_ticks)
+        self.max_entries = max_entries
+        self._start_tick: Optional[int] = None
+        self._last_tick: Optional[int] = None
+        self._entries: Dict[str, List] = self._empty()
+        self.seq = 0
+        self.meta_provider: Optional[Callable[[], Dict]] = None
+
+        self.buckets_written = 0
+        self.transitions_written = 0
+        self.failed_writes = 0
+
+    @staticmethod
+    def _empty() -> Dict[str, List]:
+        return {'car_ids': [], 'statuses': [], 'buffers': [], 'batch_ids': [], 'ticks': []}
+
+    def record(self, tick: int, car_id: int, status: str,
+               buffer: Optional[str] = None, batch_id: Optional[str] = None):
+        if self._start_tick is not None and tick // self.bucket_ticks != self._start_tick // self.bucket_ticks:
+            self.flush()
+        if self._start_tick is None:
+            self._start_tick = tick
+        self._last_tick = tick
+
+        entries = self._entries
+        entries['car_ids'].append(car_id)
+        entries['statuses'].append(status)
+        entries['buffers'].append(buffer)
+        entries['batch_ids'].append(batch_id)
+        entries['ticks'].append(tick)
+
+        if len(entries['car_ids']) >= self.max_entries:
+            self.flush()
+
+    def end_tick(self, tick: int):
+        """Write the open bucket once its tick range is over"""
+        if self._start_tick is not None and (tick + 1) % self.bucket_ticks == 0:
+            self.flush()
+
+    def flush(self) -> bool:
+        if self._start_tick is None:
+            return True
+
+        self.seq += 1
+        count = len(self._entries['car_ids'])
+        bucket_id = f"{self.seq:09d}-{self._start_tick:09d}-{self._last_tick:09d}"
+        payload = {'seq': self.seq, 'start_tick': self._start_tick, 'end_tick': self._last_tick,
+                   'count': count, **self._entries}
+        meta = {'seq': self.seq, **(self.meta_provider() if self.meta_provider else {})}
+        self._start_tick = None
+        self._last_tick = None
+        self._entries = self._empty()
+
+        if not firestore_service.write_status_bucket(bucket_id, payload, meta):
+            self.failed_writes += 1
+            return False
+        self.buckets_written += 1
+        self.transitions_written += count
+        return True
+
+    def reset(self):
+        """Drop unwritten transitions and restart the sequence (storage cleared)"""
+        self._start_tick = None
+        self._last_tick = None
+        self._entries = self._empty()
+        self.seq = 0
+
+    def stats(self) -> Dict:
+        return {
+            'bucket_ticks': self.bucket_ticks,
+            'seq': self.seq,
+            'buckets_written': self.buckets_written,
+            'transitions_written': self.transitions_written,
+            'pending': len(self._entries['car_ids']),
+            'failed_writes': self.failed_writes
+        }
+
+
+def reconstruct_vehicle_views(vehicles: Iterable[Dict], buckets: Iterable[Dict]) -> Dict[int, Dict]:
+    """
+    Per-vehicle documents as the "documents" layout would hold them:
+    seeded vehicle docs with the bucketed status transitions applied in order.
+    """
+    views = {vehicle['car_id']: dict(vehicle) for vehicle in vehicles}
+
+    for bucket in sorted(buckets, key=lambda b: (b.get('seq', 0), b['start_tick'], b['end_tick'])):
+        for car_id, status, buffer, batch_id, tick in zip(
+            bucket['car_ids'], bucket['statuses'], bucket['buffers'],
+            bucket['batch_ids'], bucket['ticks']
+        ):
+            view = views.setdefault(car_id, {'car_id': car_id})
+            view['status'] = status
+            view['buffer'] = buffer
+            if batch_id is not None:
+                view['batch_id'] = batch_id
+            view['status_tick'] = tick
+
+    return views
+
+# Singleton instance
+status_buckets = StatusBucketWriter(bucket_ticks=settings.STATUS_BUCKET_TICKS)
@@ -0,0 +1,135 @@
+# tests/test_event_simulation.py
+import json
+import numpy as np
+import pytest
+from models.process_times import DurationSpec, ProcessTimes
+from services.event_simulation import (
+    DISTRIBUTIONS, EventSimulation, load_process_times, make_sampler, run_event_simulation
+)
+
+
+def fixed_times(oven: float = 60.0, conveyor: float = 0.0, changeover: float = 0.0) -> ProcessTimes:
+    return ProcessTimes(
+        oven_default=DurationSpec(mean=oven),
+        conveyor_per_car=DurationSpec(mean=conveyor),
+        changeover_seconds=changeover
+    )
+
+
+def without_wall_time(report: dict) -> dict:
+    return {key: value for key, value in report.items() if key != 'wall_ms'}
+
+
+def test_fixed_sampler_returns_mean():
+    sampler = make_sampler(DurationSpec(mean=42.0), np.random.default_rng(0))
+
+    assert [sampler() for _ in range(3)] == [42.0, 42.0, 42.0]
+
+
+@pytest.mark.parametrize("dist", [d for d in DISTRIBUTIONS if d != "fixed"])
+def test_random_samplers_match_mean_and_stay_non_negative(dist):
+    spec = DurationSpec(dist=dist, mean=30.0, cv=0.5, low=10.0, high=50.0)
+    sampler = make_sampler(spec, np.random.default_rng(1))
+    draws = np.array([sampler() for _ in range(20000)])
+
+    assert draws.min() >= 0
+    assert abs(draws.mean() - 30.0) < 1.0
+
+
+def test_normal_sampler_respects_floor():
+    sampler = make_sampler(DurationSpec(dist="normal", mean=10.0, cv=2.0, low=5.0), np.random.default_rng(2))
+
+    assert min(sampler() for _ in range(1000)) == 5.0
+
+
+def test_unknown_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        make_sampler(DurationSpec(dist="weibull"), np.random.default_rng(0))
+
+
+def test_load_process_times(tmp_path):
+    path = tmp_path / "times.json"
+    path.write_text(json.dumps({"changeover_seconds": 90, "colors": {"C1": {"mean": 45}}}))
+
+    times = load_process_times(str(path))
+
+    assert times.changeover_seconds == 90
+    assert times.colors["C1"].mean == 45
+    assert load_process_times("") == ProcessTimes()
+
+
+def test_every_car_is_painted():
+    report = run_event_simulation(300, seed=1)
+
+    assert report['completed']
+    assert report['arrived'] == report['painted'] == 300
+    assert sum(oven['processed'] for oven in report['ovens'].values()) == 300
+    assert sum(conveyor['painted'] for conveyor in report['conveyors'].values()) == 300
+
+
+def test_same_seed_same_run():
+    times = ProcessTimes(
+        oven_default=DurationSpec(dist="lognormal", mean=60.0, cv=0.3),
+        conveyor_per_car=DurationSpec(dist="exponential", mean=10.0)
+    )
+    first = run_event_simulation(200, seed=7, process_times=times)
+    second = run_event_simulation(200, seed=7, process_times=times)
+    other = run_event_simulation(200, seed=8, process_times=times)
+
+    assert without_wall_time(first) == without_wall_time(second)
+    assert first['simulated_seconds'] != other['simulated_seconds']
+
+
+def test_fixed_times_give_oven_bound_makespan():
+    # Instant conveyor: no oven ever blocks, so the busiest oven sets the pace
+    report = run_event_simulation(120, seed=3, process_times=fixed_times(oven=60.0))
+    busiest = max(oven['processed'] for oven in report['ovens'].values())
+
+    assert report['simulated_seconds'] == busiest * 60.0
+    assert all(oven['blocked_episodes'] == 0 for oven in report['ovens'].values())
+    assert max(oven['utilization_percent'] for oven in report['ovens'].values()) == 100.0
+
+
+def test_slow_conveyor_blocks_ovens():
+    report = run_event_simulation(300, seed=3, process_times=fixed_times(oven=10.0, conveyor=30.0, changeover=60.0))
+
+    assert report['completed']
+    assert sum(oven['blocked_episodes'] for oven in report['ovens'].values()) > 0
+
+
+def test_horizon_stops_the_run_early():
+    report = run_event_simulation(300, seed=4, process_times=fixed_times(), horizon_seconds=600.0)
+
+    assert report['simulated_seconds'] == 600.0
+    assert not report['completed']
+    assert report['painted'] < 300
+
+
+def test_interarrival_supply_paints_every_car():
+    times = fixed_times()
+    times.interarrival = DurationSpec(dist="exponential", mean=40.0)
+    report = run_event_simulation(150, seed=5, process_times=times)
+
+    assert report['completed']
+    assert report['arrived'] == 150
+
+
+def test_maintenance_window_still_completes():
+    simulation = EventSimulation(process_times=fixed_times(), seed=6)
+    buffer_id = simulation.scheduler.topology.buffer_ids[0]
+
+    report = simulation.run(200, seed=6, maintenance=[(0.0, buffer_id, False), (3000.0, buffer_id, True)])
+
+    assert report['completed']
+    assert simulation.scheduler.buffers[buffer_id].is_available
+
+
+def test_invalid_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        EventSimulation(overrides={"NOT_A_SETTING": 1})
+    with pytest.raises(ValueError):
+        EventSimulation(process_times=ProcessTimes(ovens={"nowhere": DurationSpec()}))
+    with pytest.raises(ValueError):
+        EventSimulation(seed=0).run(10, maintenance=[(0.0, "nowhere", False)])
+    with pytest.raises(ValueError):
+        run_event_simulation(10 ** 9)
@@ -0,0 +1,232 @@
+# tests/test_maintenance_planner.py
+import pytest
+from models.topology import PlantTopology
+from services.maintenance_planner import (
+    DRAINING, MAINTENANCE, SCHEDULED, MaintenancePlanner, capture_projection_base, project_impact
+)
+from services.scheduler import PaintShopScheduler
+from services.topology import CompiledTopology
+
+MARGIN = 5
+
+
+def two_lane_plant() -> CompiledTopology:
+    # C1 and C3 run in L1 (C1 may spill into L2), C2 only in L2
+    return CompiledTopology(PlantTopology(
+        name="two-lane",
+        ovens=[{"oven_id": "O1", "colors": ["C1", "C2", "C3"]}],
+        buffers=[
+            {"buffer_id": "L1", "capacity": 20, "oven": "O1"},
+            {"buffer_id": "L2", "capacity": 20, "oven": "O1"}
+        ],
+        routes={
+            "C1": [{"buffer_id": "L1"}, {"buffer_id": "L2"}],
+            "C2": [{"buffer_id": "L2"}],
+            "C3": [{"buffer_id": "L1"}]
+        }
+    ))
+
+
+def make_scheduler() -> PaintShopScheduler:
+    return PaintShopScheduler(
+        topology=two_lane_plant(),
+        overrides={"MAINTENANCE_DRAIN_MARGIN_TICKS": MARGIN, "OVERFLOW_AVOIDANCE_ENABLED": False}
+    )
+
+
+def next_car_id(scheduler: PaintShopScheduler) -> int:
+    return len(scheduler.vehicles_by_id) + 1
+
+
+def buffer_cars(scheduler: PaintShopScheduler, *runs):
+    """Add (color, count) runs straight into their buffers"""
+    for color, count in runs:
+        for _ in range(count):
+            car_id = next_car_id(scheduler)
+            vehicle = {"car_id": car_id, "color": color, "priority": 10}
+            scheduler.vehicles_by_id[car_id] = vehicle
+            assert scheduler.assign_vehicle_to_buffer(vehicle)['success']
+
+
+def test_drain_ticks_counts_picks_per_run():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 3), ("C3", 12))
+
+    # One pick for the C1 run, two for the 12 C3 cars (10 per pick)
+    assert scheduler.maintenance.drain_ticks("L1") == 3
+    assert scheduler.maintenance.drain_ticks("L2") == 0
+
+
+def test_phases_follow_the_window():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 3), ("C3", 12))
+    planner = scheduler.maintenance
+    plan = planner.schedule("L1", start_tick=20, end_tick=30)
+
+    # Draining starts drain_ticks (3) + margin (5) ticks ahead of the window
+    scheduler.begin_tick(11)
+    assert plan.phase == SCHEDULED
+    scheduler.begin_tick(12)
+    assert plan.phase == DRAINING
+    assert plan.drain_started_tick == 12
+    assert planner.is_diverting("L1")
+    assert planner.take_changes() == []
+
+    scheduler.begin_tick(20)
+    assert plan.phase == MAINTENANCE
+    assert plan.cars_at_start == 15
+    assert not scheduler.buffers["L1"].is_available
+    assert planner.take_changes() == [("L1", False)]
+
+    scheduler.begin_tick(30)
+    assert "L1" not in planner.plans
+    assert scheduler.buffers["L1"].is_available
+    assert planner.take_changes() == [("L1", True)]
+
+
+def test_window_starting_now_goes_offline_at_once():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 2))
+
+    plan = scheduler.maintenance.schedule("L1", start_tick=0)
+
+    assert plan.phase == MAINTENANCE
+    assert plan.cars_at_start == 2
+    assert not scheduler.buffers["L1"].is_available
+
+
+def test_without_drain_the_buffer_runs_until_the_window():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 5))
+    plan = scheduler.maintenance.schedule("L1", start_tick=10, drain=False)
+
+    scheduler.begin_tick(9)
+    assert plan.phase == SCHEDULED
+    assert not scheduler.maintenance.is_diverting("L1")
+    scheduler.begin_tick(10)
+    assert plan.phase == MAINTENANCE
+    # No end_tick: stays offline until cancelled
+    scheduler.begin_tick(1000)
+    assert not scheduler.buffers["L1"].is_available
+
+
+def test_draining_buffer_diverts_arrivals():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 2))
+    scheduler.maintenance.schedule("L1", start_tick=1)
+    assert scheduler.maintenance.is_diverting("L1")
+
+    buffer_cars(scheduler, ("C1", 1))
+    assert scheduler.buffers["L2"].vehicles == [3]
+    # C3 has nowhere else to go, so the draining buffer is the last resort
+    buffer_cars(scheduler, ("C3", 1))
+    assert scheduler.buffers["L1"].vehicles[-1] == 4
+
+
+def test_drain_picks_wait_for_slack_or_matching_color():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 3), ("C2", 3))
+    planner = scheduler.maintenance
+    planner.schedule("L1", start_tick=MARGIN + 1)
+
+    conveyor = next(iter(scheduler.metrics.conveyors.values()))
+    conveyor.last_color = "C2"
+    assert planner.drain_picks(["L1", "L2"]) == []
+    # The run continues the last painted color: take it now
+    conveyor.last_color = "C1"
+    assert planner.drain_picks(["L1", "L2"]) == ["L1"]
+    # No slack left: take it whatever the color
+    conveyor.last_color = "C2"
+    scheduler.current_tick = MARGIN
+    assert planner.drain_picks(["L1", "L2"]) == ["L1"]
+
+
+def test_scheduled_plan_is_not_drained_yet():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 3))
+    scheduler.maintenance.schedule("L1", start_tick=100)
+
+    assert scheduler.maintenance.drain_picks(["L1"]) == []
+
+
+def test_drain_empties_buffer_before_the_window():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 4), ("C3", 4), ("C2", 10), ("C2", 10))
+    plan = scheduler.maintenance.schedule("L1", start_tick=3)
+
+    for tick in range(1, 4):
+        scheduler.begin_tick(tick)
+        scheduler.pick_from_conveyor()
+
+    # Greedy alone would take the longer C2 runs in L2 first
+    assert plan.phase == MAINTENANCE
+    assert plan.cars_at_start == 0
+
+
+def test_cancel_restores_availability():
+    scheduler = make_scheduler()
+    planner = scheduler.maintenance
+    planner.schedule("L1", start_tick=0)
+    planner.take_changes()
+
+    assert planner.cancel("L1").phase == MAINTENANCE
+    assert scheduler.buffers["L1"].is_available
+    assert planner.take_changes() == [("L1", True)]
+    assert planner.cancel("L1") is None
+
+    # A plan not started yet leaves availability alone
+    planner.schedule("L2", start_tick=50)
+    planner.cancel("L2")
+    assert planner.take_changes() == []
+
+
+def test_invalid_windows_are_rejected():
+    scheduler = make_scheduler()
+    scheduler.current_tick = 10
+    planner = scheduler.maintenance
+
+    with pytest.raises(KeyError):
+        planner.schedule("nowhere", start_tick=20)
+    with pytest.raises(ValueError):
+        planner.schedule("L1", start_tick=5)
+    with pytest.raises(ValueError):
+        planner.schedule("L1", start_tick=20, end_tick=20)
+
+
+def test_export_and_restore_keep_phase():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 2))
+    scheduler.maintenance.schedule("L1", start_tick=0, end_tick=40)
+    scheduler.maintenance.schedule("L2", start_tick=30, drain=False)
+
+    restored = MaintenancePlanner(scheduler)
+    restored.restore(scheduler.maintenance.export())
+
+    assert restored.export() == scheduler.maintenance.export()
+    assert restored.plans["L1"].cars_at_start == 2
+
+
+def test_project_impact_compares_scenarios():
+    scheduler = make_scheduler()
+    buffer_cars(scheduler, ("C1", 4), ("C3", 4), ("C2", 10))
+    for color in ["C1", "C3", "C2"] * 5:
+        car_id = next_car_id(scheduler)
+        scheduler.vehicles_by_id[car_id] = {"car_id": car_id, "color": color, "oven": "O1", "priority": 10}
+        scheduler.ovens["O1"].append(car_id)
+    base = capture_projection_base(scheduler)
+
+    impact = project_impact(base, "L1", start_tick=10, end_tick=20)
+    scenarios = impact['scenarios']
+
+    assert impact['horizon_ticks'] == 20 - 0 + 20
+    assert scenarios['planned']['cars_in_buffer_at_start'] <= scenarios['unplanned']['cars_in_buffer_at_start']
+    assert scenarios['no_maintenance']['cars_in_buffer_at_start'] is None
+    assert impact['planned_cost']['throughput'] == (
+        scenarios['planned']['throughput'] - scenarios['no_maintenance']['throughput']
+    )
+    # The live scheduler is untouched
+    assert scheduler.maintenance.plans == {}
+    assert scheduler.metrics.throughput == 0
+
+    with pytest.raises(KeyError):
+        project_impact(base, "nowhere", start_tick=10)
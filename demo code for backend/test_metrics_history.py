@@ -0,0 +1,113 @@
+# tests/test_metrics_history.py
+import random
+from models.vehicle import BufferState, SystemMetrics
+from services.metrics_history import MetricsHistory, RingSeries
+
+
+def test_ring_overwrites_oldest():
+    series = RingSeries(5)
+    for i in range(8):
+        series.append(float(i), (i,))
+
+    assert series.size == 5
+    assert series.oldest() == 3.0
+    assert [point for _, point in series.query(0, 100, 10)] == [(3,), (4,), (5,), (6,), (7,)]
+
+
+def test_ring_range_queries_match_a_scan():
+    rng = random.Random(7)
+    series = RingSeries(50)
+    timestamps = []
+    t = 0.0
+    for i in range(130):       # Wraps around more than twice
+        t += rng.choice([0.5, 1.0, 2.0])
+        series.append(t, (i,))
+        timestamps.append(t)
+    kept = timestamps[-50:]
+
+    for _ in range(200):
+        from_ts = rng.uniform(0, t + 5)
+        to_ts = from_ts + rng.uniform(0, 40)
+        expected = [ts for ts in kept if from_ts <= ts <= to_ts]
+
+        assert [ts for ts, _ in series.query(from_ts, to_ts, 1000)] == expected
+        assert series.count(from_ts, to_ts) == len(expected)
+
+
+def test_ring_bounds_are_inclusive():
+    series = RingSeries(10)
+    for i in range(10):
+        series.append(float(i), (i,))
+
+    assert [ts for ts, _ in series.query(2.0, 4.0, 10)] == [2.0, 3.0, 4.0]
+    assert series.count(2.0, 4.0) == 3
+
+
+def test_ring_limit_keeps_newest_points():
+    series = RingSeries(10)
+    for i in range(10):
+        series.append(float(i), (i,))
+
+    assert [ts for ts, _ in series.query(0.0, 9.0, 3)] == [7.0, 8.0, 9.0]
+
+
+def record_ticks(history, seconds, start=0.0, tick_seconds=1.0):
+    buffers = {"L1": BufferState(buffer_id="L1", capacity=10)}
+    metrics = SystemMetrics()
+    tick = 0
+    t = start
+    while t < start + seconds:
+        tick += 1
+        metrics.throughput = tick
+        metrics.efficiency_percent = float(tick % 2)   # Averages to 0.5
+        buffers["L1"].current_occupancy = tick % 10
+        history.record(tick, metrics, buffers, timestamp=t)
+        t += tick_seconds
+    return tick
+
+
+def test_minute_level_keeps_last_counter_and_mean_gauge():
+    history = MetricsHistory(tick_points=1000, minute_points=10, ten_minute_points=10)
+    record_ticks(history, 120)
+
+    result = history.query(0.0, 119.0, step="1m")
+    first, second = result["points"]
+
+    assert [first["t"], second["t"]] == [0.0, 60.0]
+    assert first["tick"] == 60
+    assert first["metrics"]["throughput"] == 60
+    assert first["metrics"]["efficiency_percent"] == 0.5
+    assert first["buffers"]["L1"] == 4.5
+    # The minute still filling is included
+    assert second["tick"] == 120
+
+
+def test_step_resolves_to_finest_complete_level():
+    history = MetricsHistory(tick_points=100, minute_points=100, ten_minute_points=100)
+    record_ticks(history, 600)
+
+    # The tick ring only holds the last 100 seconds
+    assert history.resolve_step(None, 550.0, 599.0) == "tick"
+    assert history.resolve_step(None, 0.0, 599.0) == "1m"
+    assert history.resolve_step("90", 0.0, 599.0) == "1m"
+    assert history.resolve_step("tick", 0.0, 599.0) == "tick"
+
+
+def test_query_over_max_points_is_truncated():
+    history = MetricsHistory(tick_points=1000, max_query_points=50)
+    record_ticks(history, 200)
+
+    result = history.query(100.0, 199.0, step="tick")
+
+    assert result["truncated"]
+    assert result["count"] == 50
+    assert result["points"][-1]["t"] == 199.0
+
+
+def test_clear_forgets_everything():
+    history = MetricsHistory()
+    record_ticks(history, 120)
+    history.clear()
+
+    assert history.first_timestamp is None
+    assert history.query(0.0, 1000.0)["count"] == 0
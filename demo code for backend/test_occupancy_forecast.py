@@ -0,0 +1,87 @@
+# tests/test_occupancy_forecast.py
+import pytest
+from models.vehicle import BufferState
+from services.occupancy_forecast import (
+    OccupancyForecaster, RISK_NORMAL, RISK_STRICT, RISK_DIVERT
+)
+
+
+def make_buffers(**occupancy):
+    return {
+        buffer_id: BufferState(buffer_id=buffer_id, capacity=10, current_occupancy=count)
+        for buffer_id, count in occupancy.items()
+    }
+
+
+def test_rates_are_exponentially_smoothed():
+    forecaster = OccupancyForecaster(horizon_ticks=10, smoothing=0.5)
+    buffers = make_buffers(L1=0)
+
+    forecaster.record_fill("L1", 2)
+    forecaster.record_drain("L1", 4)
+    forecaster.update(buffers, {})
+    assert forecaster.fill_rate["L1"] == 1.0
+    assert forecaster.drain_rate["L1"] == 2.0
+
+    # Counters are per tick: nothing recorded halves the rates
+    forecaster.update(buffers, {})
+    assert forecaster.fill_rate["L1"] == 0.5
+    assert forecaster.drain_rate["L1"] == 1.0
+
+
+def test_ticks_to_full_from_net_rate():
+    forecaster = OccupancyForecaster(horizon_ticks=5, smoothing=1.0)
+    buffers = make_buffers(L1=4)
+
+    forecaster.record_fill("L1", 3)
+    forecaster.record_drain("L1", 1)
+    forecaster.update(buffers, {})
+
+    forecast = forecaster.forecasts["L1"]
+    assert forecast["ticks_to_full"] == 3.0     # 6 free slots at 2 cars/tick
+    assert forecast["risk"] == RISK_DIVERT
+    assert forecaster.risk_of("L1") == RISK_DIVERT
+
+
+def test_draining_buffer_never_fills():
+    forecaster = OccupancyForecaster(horizon_ticks=5, smoothing=1.0, threshold=0.85)
+    buffers = make_buffers(L1=9)
+
+    forecaster.record_drain("L1", 2)
+    forecaster.update(buffers, {})
+
+    assert forecaster.forecasts["L1"]["ticks_to_full"] is None
+    # Not filling, but above the occupancy threshold
+    assert forecaster.risk_of("L1") == RISK_STRICT
+
+
+def test_queued_cars_routed_to_first_preferred_lane_with_room():
+    routes = {"C1": ["L1", "L2"]}
+    forecaster = OccupancyForecaster(horizon_ticks=4, smoothing=0.2, oven_rate=1, routes=routes)
+    buffers = make_buffers(L1=8, L2=0)
+
+    # Lookahead is horizon * oven_rate = 4 cars; L1 takes two, L2 the rest
+    forecaster.update(buffers, {"O1": ["C1"] * 6})
+
+    assert forecaster.forecasts["L1"]["queued_arrivals"] == 2
+    assert forecaster.forecasts["L2"]["queued_arrivals"] == 2
+    # Known arrivals fill L1 within the horizon
+    assert forecaster.risk_of("L1") == RISK_DIVERT
+    assert forecaster.risk_of("L2") == RISK_NORMAL
+
+
+def test_unavailable_lane_gets_no_queued_cars():
+    routes = {"C1": ["L1", "L2"]}
+    forecaster = OccupancyForecaster(horizon_ticks=4, routes=routes)
+    buffers = make_buffers(L1=0, L2=0)
+    buffers["L1"].is_available = False
+
+    forecaster.update(buffers, {"O1": ["C1", "C1"]})
+
+    assert forecaster.forecasts["L1"]["queued_arrivals"] == 0
+    assert forecaster.forecasts["L2"]["queued_arrivals"] == 2
+
+
+def test_horizon_must_be_positive():
+    with pytest.raises(ValueError):
+        OccupancyForecaster(horizon_ticks=0)
@@ -0,0 +1,111 @@
+# tests/test_optimality.py
+import random
+import pandas as pd
+import pytest
+from config import settings
+from models.topology import PlantTopology
+from services.optimality import ChangeoverBoundSolver, gap_report, replay_changeovers
+from services.topology import CompiledTopology
+
+
+def small_plant(capacity: int = 3) -> CompiledTopology:
+    colors = ["C1", "C2", "C3"]
+    return CompiledTopology(PlantTopology(
+        name="small",
+        ovens=[{"oven_id": "O1", "colors": colors}],
+        buffers=[
+            {"buffer_id": "L1", "capacity": capacity, "oven": "O1"},
+            {"buffer_id": "L2", "capacity": capacity, "oven": "O1"}
+        ],
+        routes={color: [{"buffer_id": "L1"}, {"buffer_id": "L2"}] for color in colors}
+    ))
+
+
+def solver_for(topology: CompiledTopology, **options) -> ChangeoverBoundSolver:
+    return ChangeoverBoundSolver(
+        topology=topology, oven_rate=settings.OVEN_PRODUCTION_RATE,
+        max_pick=settings.MAX_CONVEYOR_PICK, **options
+    )
+
+
+def test_single_color_needs_no_changeover():
+    result = solver_for(small_plant()).solve([("C1", "O1")] * 6)
+
+    assert result == {**result, 'lower_bound': 0, 'optimal': True}
+
+
+def test_every_color_is_painted_at_least_once():
+    sequence = [("C1", "O1"), ("C2", "O1"), ("C3", "O1")]
+    result = solver_for(small_plant()).solve(sequence)
+
+    assert result['optimal']
+    assert result['lower_bound'] == 2
+
+
+def test_interleaved_colors_are_separated_into_lanes():
+    sequence = [("C1", "O1"), ("C2", "O1")] * 3
+    solver = ChangeoverBoundSolver(topology=small_plant(), max_pick=10)
+
+    # One car per tick is picked as soon as it arrives: every car changes color
+    solver.oven_rate = 1
+    assert solver.solve(sequence)['lower_bound'] == 5
+    # Two cars per tick go to separate lanes, so each color collects
+    solver.oven_rate = 2
+    assert solver.solve(sequence)['lower_bound'] == 1
+
+
+def test_optimum_never_exceeds_live_strategies():
+    rng = random.Random(2)
+    topology = small_plant()
+    solver = solver_for(topology)
+    for _ in range(15):
+        sequence = [(rng.choice(["C1", "C2", "C3"]), "O1") for _ in range(rng.randint(4, 10))]
+        result = solver.solve(sequence)
+        assert result['optimal']
+        for strategy in ("greedy", "planner"):
+            replay = replay_changeovers(sequence, strategy, topology=topology)
+            assert replay['completed']
+            assert result['lower_bound'] <= replay['paint_changeovers']
+
+
+def test_exhausted_budget_still_gives_a_lower_bound():
+    rng = random.Random(4)
+    topology = small_plant()
+    sequence = [(rng.choice(["C1", "C2", "C3"]), "O1") for _ in range(10)]
+
+    exact = solver_for(topology).solve(sequence)
+    partial = solver_for(topology, max_states=3).solve(sequence)
+
+    assert exact['optimal']
+    assert not partial['optimal']
+    assert partial['lower_bound'] <= exact['lower_bound']
+
+
+def test_unroutable_color_is_rejected():
+    with pytest.raises(ValueError):
+        solver_for(small_plant()).solve([("C9", "O1")])
+
+
+def test_gap_report_sums_windows():
+    rng = random.Random(6)
+    frame = pd.DataFrame({
+        "color": [rng.choice(["C1", "C2", "C3"]) for _ in range(20)],
+        "oven": ["O1"] * 20
+    })
+    report = gap_report(frame, window=8, solver=solver_for(small_plant()))
+
+    assert report['windows_total'] == 3
+    assert report['vehicles'] == 20
+    assert not report['truncated']
+    assert report['lower_bound'] == sum(row['lower_bound'] for row in report['windows'])
+    for result in report['strategies'].values():
+        assert result['gap'] >= 0
+
+
+def test_gap_report_stops_at_time_budget():
+    frame = pd.DataFrame({"color": ["C1", "C2"] * 10, "oven": ["O1"] * 20})
+    report = gap_report(frame, window=8, solver=solver_for(small_plant()), time_budget_s=0.0)
+
+    assert report['truncated']
+    assert report['vehicles'] == 0
+    assert report['vehicles_requested'] == 20
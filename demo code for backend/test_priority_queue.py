@@ -0,0 +1,148 @@
+# tests/test_priority_queue.py
+import random
+from collections import deque
+import pytest
+from services.priority_queue import (
+    LatencyTracker, PriorityOvenQueue, make_oven_queue, peek_queue
+)
+
+
+class Clock:
+    def __init__(self):
+        self.tick = 0
+
+    def __call__(self) -> int:
+        return self.tick
+
+
+def make_queue(priorities, aging_ticks: int = 20):
+    clock = Clock()
+    return PriorityOvenQueue(priorities.__getitem__, clock, aging_ticks), clock
+
+
+def assert_heap_consistent(queue: PriorityOvenQueue):
+    heap = queue._heap
+    for position, (key, car_id) in enumerate(heap):
+        assert queue._index[car_id] == position
+        if position:
+            assert heap[(position - 1) >> 1][0] <= key
+    assert len(queue._index) == len(heap) == len(queue._enqueued)
+
+
+def drain(queue):
+    return [queue.popleft() for _ in range(len(queue))]
+
+
+def test_same_tick_serves_by_priority_then_arrival():
+    queue, _ = make_queue({1: 10, 2: 1, 3: 5, 4: 1})
+    queue.extend([1, 2, 3, 4])
+
+    assert drain(queue) == [2, 4, 3, 1]
+
+
+def test_aging_bounds_how_long_a_car_waits():
+    priorities = {0: 10}
+    queue, clock = make_queue(priorities, aging_ticks=20)
+    queue.append(0)
+    # Rush cars keep arriving; the normal car's key is 0 + 10 * 20 = 200
+    for car_id in range(1, 300):
+        clock.tick = car_id
+        priorities[car_id] = 1
+        queue.append(car_id)
+
+    order = drain(queue)
+    # Only rush cars queued before tick 180 (key < 180 + 20) go first; ties
+    # go to the car queued earlier
+    assert order.index(0) == 179
+
+
+def test_reprioritize_moves_car_and_keeps_heap():
+    priorities = {car_id: 10 for car_id in range(20)}
+    queue, clock = make_queue(priorities)
+    for car_id in range(20):
+        clock.tick = car_id
+        queue.append(car_id)
+
+    queue.reprioritize(15, 0)
+    assert_heap_consistent(queue)
+    assert queue.peek(1) == [15]
+
+    queue.reprioritize(15, 20)
+    assert_heap_consistent(queue)
+    assert list(queue)[-1] == 15
+
+    with pytest.raises(ValueError):
+        queue.reprioritize(99, 1)
+
+
+def test_random_operations_keep_heap_order():
+    rng = random.Random(8)
+    priorities = {}
+    queue, clock = make_queue(priorities, aging_ticks=5)
+    next_id = 0
+    for step in range(3000):
+        clock.tick = step // 10
+        op = rng.random()
+        if op < 0.5 or not queue:
+            priorities[next_id] = rng.randint(1, 10)
+            queue.append(next_id)
+            next_id += 1
+        elif op < 0.7:
+            expected = min(queue._heap)[1]
+            assert queue.popleft() == expected
+        elif op < 0.8:
+            queue.remove(rng.choice(list(queue._index)))
+        elif op < 0.95:
+            queue.reprioritize(rng.choice(list(queue._index)), rng.randint(0, 10))
+        else:
+            car_id = queue.popleft()
+            queue.appendleft(car_id)
+            assert queue.peek(1) == [car_id]
+        assert_heap_consistent(queue)
+
+    order = list(queue)
+    assert queue.peek(25) == order[:25]
+    assert drain(queue) == order
+
+
+def test_remove_and_contains():
+    queue, _ = make_queue({1: 5, 2: 5, 3: 5})
+    queue.extend([1, 2, 3])
+    queue.remove(2)
+
+    assert 2 not in queue
+    assert 1 in queue
+    assert drain(queue) == [1, 3]
+    with pytest.raises(ValueError):
+        queue.remove(2)
+    with pytest.raises(IndexError):
+        queue.popleft()
+
+
+def test_make_oven_queue_modes():
+    clock = Clock()
+    assert isinstance(make_oven_queue("fifo", int, clock), deque)
+    assert isinstance(make_oven_queue("priority", int, clock), PriorityOvenQueue)
+    with pytest.raises(ValueError):
+        make_oven_queue("lifo", int, clock)
+
+
+def test_peek_queue_works_for_both_queue_types():
+    fifo = deque([5, 3, 9])
+    queue, _ = make_queue({5: 10, 3: 1, 9: 5})
+    queue.extend(fifo)
+
+    assert peek_queue(fifo, 2) == [5, 3]
+    assert peek_queue(queue, 2) == [3, 9]
+
+
+def test_latency_percentiles_per_priority():
+    tracker = LatencyTracker(max_samples=100)
+    for latency in range(1, 101):
+        tracker.record(1, latency, latency / 10)
+    tracker.record(10, 7)
+
+    report = tracker.report()
+    assert report[1]['samples'] == 100
+    assert report[1]['ticks'] == {'p50': 51, 'p90': 91, 'p95': 96, 'p99': 100}
+    assert report[10]['seconds'] is None
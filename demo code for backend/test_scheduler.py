@@ -0,0 +1,123 @@
+# tests/test_scheduler.py
+import itertools
+import random
+import pytest
+from models.topology import PlantTopology
+from services.scheduler import PaintShopScheduler
+from services.topology import CompiledTopology
+
+COLORS = ["C1", "C2", "C3"]
+BUFFERS = ["L1", "L2", "L3", "L4", "L5", "L6"]
+
+
+def multi_conveyor_plant() -> CompiledTopology:
+    return CompiledTopology(PlantTopology(
+        name="multi-conveyor",
+        ovens=[{"oven_id": "O1", "colors": COLORS}],
+        buffers=[{"buffer_id": b, "capacity": 30, "oven": "O1"} for b in BUFFERS],
+        routes={color: [{"buffer_id": b} for b in BUFFERS] for color in COLORS},
+        conveyors=[
+            {"conveyor_id": "M1", "buffers": ["L1", "L2", "L3"]},
+            {"conveyor_id": "M2", "buffers": ["L2", "L3", "L4", "L5"]},
+            {"conveyor_id": "M3", "buffers": ["L5", "L6"]}
+        ]
+    ))
+
+
+def fill(scheduler: PaintShopScheduler, rng: random.Random):
+    """Random same-color runs straight into random buffers"""
+    car_id = 0
+    for buffer_id in rng.sample(BUFFERS, rng.randint(1, len(BUFFERS))):
+        buffer = scheduler.buffers[buffer_id]
+        for _ in range(rng.randint(1, 3)):
+            color = rng.choice(COLORS)
+            for _ in range(rng.randint(1, 14)):
+                car_id += 1
+                scheduler.vehicles_by_id[car_id] = {
+                    "car_id": car_id, "color": color, "priority": rng.randint(1, 10), "buffer_tick": 0
+                }
+                buffer.vehicles.append(car_id)
+                buffer.current_occupancy += 1
+    for conveyor in scheduler.metrics.conveyors.values():
+        conveyor.last_color = rng.choice(COLORS + [None])
+
+
+def score(scheduler: PaintShopScheduler, assignment, at_risk: set):
+    """(at-risk drained, conveyors busy, -changeovers, cars picked) of an assignment"""
+    weight = scheduler.settings.PRIORITY_PICK_WEIGHT
+    total = [0, 0, 0, 0.0]
+    for conveyor_id, buffer_id in assignment:
+        color, run_length = scheduler.best_continuous_run(buffer_id)
+        last_color = scheduler.metrics.conveyors[conveyor_id].last_color
+        value = min(run_length, scheduler.settings.MAX_CONVEYOR_PICK)
+        if weight > 0:
+            value -= weight * scheduler._effective_priority(buffer_id)
+        total[0] += buffer_id in at_risk
+        total[1] += 1
+        total[2] -= 1 if last_color and color != last_color else 0
+        total[3] += value
+    return tuple(total)
+
+
+def brute_force(scheduler: PaintShopScheduler, candidates, at_risk: set):
+    """Best score over every assignment of distinct reachable buffers (or idle)"""
+    conveyor_ids = scheduler.topology.conveyor_ids
+    choices = [
+        [None] + [b for b in scheduler.topology.conveyor_buffers[c] if b in candidates]
+        for c in conveyor_ids
+    ]
+    best = None
+    for picks in itertools.product(*choices):
+        chosen = [b for b in picks if b is not None]
+        if len(chosen) != len(set(chosen)):
+            continue
+        assignment = [(c, b) for c, b in zip(conveyor_ids, picks) if b is not None]
+        result = score(scheduler, assignment, at_risk)
+        if best is None or result > best:
+            best = result
+    return best
+
+
+@pytest.mark.parametrize("weight", [0.0, 0.5])
+def test_assignment_matches_exhaustive_search(weight):
+    rng = random.Random(12)
+    for _ in range(200):
+        scheduler = PaintShopScheduler(
+            topology=multi_conveyor_plant(), overrides={"PRIORITY_PICK_WEIGHT": weight}
+        )
+        fill(scheduler, rng)
+        candidates = [b for b, buffer in scheduler.buffers.items() if buffer.vehicles]
+        at_risk = set(rng.sample(candidates, rng.randint(0, min(2, len(candidates)))))
+
+        selection = scheduler._assign_conveyor_picks(list(scheduler.topology.conveyor_ids), candidates, at_risk)
+        assignment = [(conveyor_id, buffer_id) for conveyor_id, buffer_id, _, _ in selection]
+
+        buffers = [buffer_id for _, buffer_id in assignment]
+        assert len(buffers) == len(set(buffers))
+        for conveyor_id, buffer_id, color, run_length in selection:
+            assert buffer_id in scheduler.topology.conveyor_buffers[conveyor_id]
+            assert (color, run_length) == scheduler.best_continuous_run(buffer_id)
+        assert score(scheduler, assignment, at_risk) == pytest.approx(brute_force(scheduler, candidates, at_risk))
+
+
+def test_conveyors_share_out_contested_buffers():
+    scheduler = PaintShopScheduler(topology=multi_conveyor_plant())
+    for car_id, (buffer_id, color) in enumerate([("L2", "C1")] * 10 + [("L5", "C2")] * 8 + [("L1", "C3")] * 2, 1):
+        scheduler.vehicles_by_id[car_id] = {"car_id": car_id, "color": color, "priority": 10}
+        scheduler.buffers[buffer_id].vehicles.append(car_id)
+        scheduler.buffers[buffer_id].current_occupancy += 1
+
+    selection = scheduler._assign_conveyor_picks(["M1", "M2", "M3"], ["L1", "L2", "L5"], set())
+
+    # Three conveyors busy beats M1 and M2 both wanting the long L2 run
+    assert {(c, b) for c, b, _, _ in selection} == {("M1", "L1"), ("M2", "L2"), ("M3", "L5")}
+
+
+def test_picks_from_all_conveyors_in_one_tick():
+    scheduler = PaintShopScheduler(topology=multi_conveyor_plant())
+    fill(scheduler, random.Random(3))
+    picked = scheduler.pick_from_conveyors()
+
+    assert set(picked) <= {"M1", "M2", "M3"}
+    assert scheduler.metrics.throughput == sum(len(cars) for cars in picked.values())
+    assert all(conveyor.ticks == 1 for conveyor in scheduler.metrics.conveyors.values())
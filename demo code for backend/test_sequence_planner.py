@@ -0,0 +1,108 @@
+# tests/test_sequence_planner.py
+import random
+from services.sequence_planner import ConveyorSequencePlanner
+
+
+def brute_force_cost(fronts, last_color, horizon, max_pick):
+    """Best (changeovers, -cars) over every pick sequence, by exhaustive search"""
+    buffer_ids = [bid for bid, runs in fronts.items() if runs]
+
+    def search(positions, last, depth):
+        moves = [
+            (i, runs[run_index])
+            for i, (runs, (run_index, _)) in enumerate(zip(
+                (fronts[bid] for bid in buffer_ids), positions
+            ))
+            if run_index < len(runs)
+        ] if depth > 0 else []
+        if not moves:
+            return (0, 0)
+        best = None
+        for i, (color, _) in moves:
+            run_index, left = positions[i]
+            take = min(left, max_pick)
+            left -= take
+            if left == 0:
+                run_index += 1
+                runs = fronts[buffer_ids[i]]
+                left = runs[run_index][1] if run_index < len(runs) else 0
+            changeovers, cars = search(
+                positions[:i] + ((run_index, left),) + positions[i + 1:], color, depth - 1
+            )
+            cost = (changeovers + (1 if last and color != last else 0), cars - take)
+            if best is None or cost < best:
+                best = cost
+        return best
+
+    start = tuple((0, fronts[bid][0][1]) for bid in buffer_ids)
+    return search(start, last_color, horizon)
+
+
+def plan_cost(plan, last_color):
+    changeovers = 0
+    for _, color, _ in plan:
+        changeovers += 1 if last_color and color != last_color else 0
+        last_color = color
+    return (changeovers, -sum(count for _, _, count in plan))
+
+
+def random_fronts(rng, buffers=4, depth=3):
+    colors = ["C1", "C2", "C3", "C4"]
+    return {
+        f"L{b}": [(rng.choice(colors), rng.randint(1, 12)) for _ in range(rng.randint(0, depth))]
+        for b in range(1, buffers + 1)
+    }
+
+
+def test_plan_matches_exhaustive_search():
+    rng = random.Random(3)
+    planner = ConveyorSequencePlanner(horizon=4, run_depth=3, max_pick=10, time_budget_ms=10000)
+    for _ in range(200):
+        fronts = random_fronts(rng)
+        last_color = rng.choice([None, "C1", "C2"])
+        plan = planner.plan(fronts, last_color)
+
+        assert not planner.last_stats['timed_out']
+        assert plan_cost(plan, last_color) == brute_force_cost(fronts, last_color, 4, 10)
+
+
+def test_plan_looks_past_the_greedy_choice():
+    # After C1, greedy takes the first 10-car run (C3) and then C2 (two
+    # changeovers); the planner paints both C2 runs back to back (one)
+    fronts = {"L1": [("C1", 1), ("C3", 10)], "L2": [("C2", 10)], "L3": [("C2", 10)]}
+    planner = ConveyorSequencePlanner(horizon=3, run_depth=3, max_pick=10, time_budget_ms=10000)
+    plan = planner.plan(fronts, "C1")
+
+    assert [color for _, color, _ in plan] == ["C1", "C2", "C2"]
+    assert plan_cost(plan, "C1") == (1, -21)
+
+
+def test_plan_picks_are_valid():
+    rng = random.Random(5)
+    planner = ConveyorSequencePlanner(horizon=6, run_depth=3, max_pick=4, time_budget_ms=10000)
+    for _ in range(50):
+        fronts = random_fronts(rng)
+        remaining = {bid: [list(run) for run in runs[:3]] for bid, runs in fronts.items()}
+        for buffer_id, color, count in planner.plan(fronts, None):
+            run = remaining[buffer_id][0]
+            assert run[0] == color
+            assert count == min(run[1], 4)
+            run[1] -= count
+            if run[1] == 0:
+                remaining[buffer_id].pop(0)
+
+
+def test_timeout_falls_back_to_greedy_seed():
+    fronts = {f"L{i}": [("C1", 3), ("C2", 3), ("C3", 3)] for i in range(1, 9)}
+    planner = ConveyorSequencePlanner(horizon=6, run_depth=3, max_pick=10, time_budget_ms=0.0)
+    plan = planner.plan(fronts, "C2")
+
+    assert planner.last_stats['timed_out']
+    assert len(plan) == 6
+    assert planner.stats()['timeouts'] == 1
+    assert planner.stats()['timeout_rate'] == 1.0
+
+
+def test_empty_fronts_plan_nothing():
+    planner = ConveyorSequencePlanner()
+    assert planner.plan({"L1": [], "L2": []}, "C1") == []
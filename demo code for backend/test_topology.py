@@ -0,0 +1,100 @@
+# tests/test_topology.py
+import json
+import pytest
+from config import BUFFER_CAPACITY, PREFERRED_BUFFERS
+from models.topology import PlantTopology
+from services.scheduler import PaintShopScheduler
+from services.topology import (
+    CompiledTopology, MAX_MAIN_CONVEYORS, default_topology, load_topology
+)
+
+
+def three_oven_spec(**changes) -> dict:
+    spec = {
+        "name": "three-oven",
+        "ovens": [
+            {"oven_id": "A", "colors": ["C1"]},
+            {"oven_id": "B", "colors": ["C2"]},
+            {"oven_id": "C", "colors": ["C3"]}
+        ],
+        "buffers": [
+            {"buffer_id": "A1", "capacity": 4, "oven": "A"},
+            {"buffer_id": "B1", "capacity": 4, "oven": "B"},
+            {"buffer_id": "B2", "capacity": 2, "oven": "B"},
+            {"buffer_id": "C1", "capacity": 3, "oven": "C"}
+        ],
+        "routes": {
+            "C1": [{"buffer_id": "A1"}],
+            "C2": [{"buffer_id": "B2"}, {"buffer_id": "B1", "penalty": 30}],
+            "C3": [{"buffer_id": "C1"}]
+        },
+        "conveyors": [
+            {"conveyor_id": "M1", "buffers": ["A1", "B1"]},
+            {"conveyor_id": "M2"}
+        ],
+        "default_oven": "C"
+    }
+    spec.update(changes)
+    return spec
+
+
+def test_default_topology_matches_config():
+    plant = CompiledTopology(default_topology())
+
+    assert set(plant.buffer_ids) == set(BUFFER_CAPACITY)
+    assert plant.preferred_buffers == {color: list(b) for color, b in PREFERRED_BUFFERS.items()}
+    assert sum(plant.oven_capacity.values()) == sum(BUFFER_CAPACITY.values())
+    for oven_id, buffer_ids in plant.oven_buffers.items():
+        assert all(plant.buffer_oven[b] == oven_id for b in buffer_ids)
+
+
+def test_compiled_indexes():
+    plant = CompiledTopology(PlantTopology(**three_oven_spec()))
+
+    assert plant.oven_ids == ("A", "B", "C")
+    assert plant.oven_buffers["B"] == ("B1", "B2")
+    assert plant.oven_capacity == {"A": 4, "B": 6, "C": 3}
+    assert [(c.buffer_id, c.oven, c.penalty) for c in plant.candidates["C2"]] == [
+        ("B2", "B", 0), ("B1", "B", 30)
+    ]
+    # An empty buffer list means the conveyor reaches every buffer
+    assert plant.conveyor_buffers == {"M1": ("A1", "B1"), "M2": plant.buffer_ids}
+    assert plant.oven_for("C2") == "B"
+    assert plant.oven_for("C99") == "C"
+    assert plant.colors_of("B") == ["C2"]
+
+
+@pytest.mark.parametrize("changes", [
+    {"buffers": [{"buffer_id": "A1", "capacity": 4, "oven": "Z"}]},
+    {"routes": {"C1": [{"buffer_id": "nowhere"}]}},
+    {"conveyors": [{"conveyor_id": "M1", "buffers": ["nowhere"]}]},
+    {"conveyors": [{"conveyor_id": f"M{i}"} for i in range(MAX_MAIN_CONVEYORS + 1)]},
+    {"conveyors": []},
+    {"default_oven": "Z"},
+])
+def test_invalid_topology_is_rejected(changes):
+    with pytest.raises(ValueError):
+        CompiledTopology(PlantTopology(**three_oven_spec(**changes)))
+
+
+def test_load_from_json(tmp_path):
+    path = tmp_path / "plant.json"
+    path.write_text(json.dumps(three_oven_spec()))
+
+    plant = load_topology(str(path))
+
+    assert plant.spec.name == "three-oven"
+    assert plant.buffer_ids == ("A1", "B1", "B2", "C1")
+
+
+def test_scheduler_routes_by_compiled_topology():
+    plant = CompiledTopology(PlantTopology(**three_oven_spec()))
+    scheduler = PaintShopScheduler(topology=plant)
+
+    assert set(scheduler.ovens) == {"A", "B", "C"}
+    assert set(scheduler.buffers) == {"A1", "B1", "B2", "C1"}
+    assert scheduler.assign_oven("C2") == "B"
+
+    vehicle = {"car_id": 1, "color": "C2", "oven": "B", "priority": 10}
+    scheduler.vehicles_by_id[1] = vehicle
+    assert scheduler.assign_vehicle_to_buffer(vehicle)['buffer'] == "B2"
@@ -0,0 +1,95 @@
+# tests/test_vehicle_generator.py
+from collections import Counter
+import pytest
+from services.vehicle_generator import ARRIVAL_PATTERNS, VehicleGenerator
+
+
+def oven_for(color: str) -> str:
+    return "O1" if color in ("C1", "C2") else "O2"
+
+
+def generate(num_vehicles: int, **options):
+    generator = VehicleGenerator(oven_for, **options)
+    return generator, [v for batch in generator.iter_batches(num_vehicles) for v in batch]
+
+
+@pytest.mark.parametrize("num_vehicles", [1, 7, 900, 12345])
+def test_exact_counts_sum_and_round(num_vehicles):
+    generator = VehicleGenerator(oven_for)
+    counts = generator.exact_counts(num_vehicles)
+    quotas = generator.probabilities * num_vehicles
+
+    assert counts.sum() == num_vehicles
+    # Largest remainder: every count is its quota rounded down or up
+    assert all(int(q) <= c <= int(q) + 1 for q, c in zip(quotas, counts))
+
+
+@pytest.mark.parametrize("pattern", ARRIVAL_PATTERNS)
+def test_exact_mode_hits_distribution_across_chunks(pattern):
+    generator, vehicles = generate(2500, seed=11, pattern=pattern, chunk_size=300)
+    expected = dict(zip(generator.colors, generator.exact_counts(2500).tolist()))
+
+    assert Counter(v['color'] for v in vehicles) == {c: n for c, n in expected.items() if n}
+
+
+def test_car_ids_are_contiguous_across_chunks():
+    _, vehicles = generate(1000, seed=1, chunk_size=64)
+
+    assert [v['car_id'] for v in vehicles] == list(range(1, 1001))
+
+
+def test_chunks_respect_chunk_size():
+    generator = VehicleGenerator(oven_for, seed=1, chunk_size=64)
+
+    assert [len(batch) for batch in generator.iter_batches(200)] == [64, 64, 64, 8]
+
+
+def test_same_seed_same_sequence():
+    _, first = generate(500, seed=42, pattern="bursty")
+    _, second = generate(500, seed=42, pattern="bursty")
+    _, other = generate(500, seed=43, pattern="bursty")
+
+    assert first == second
+    assert first != other
+
+
+def test_vehicle_fields_follow_color():
+    _, vehicles = generate(200, seed=3)
+
+    for vehicle in vehicles:
+        assert vehicle['oven'] == oven_for(vehicle['color'])
+        assert vehicle['priority'] == int(vehicle['color'][1:])
+        assert vehicle['status'] == "waiting"
+
+
+def test_bursty_pattern_groups_colors():
+    _, shuffled = generate(5000, seed=5, pattern="shuffled")
+    _, bursty = generate(5000, seed=5, pattern="bursty", burst_mean=6.0)
+
+    def color_changes(vehicles):
+        return sum(a['color'] != b['color'] for a, b in zip(vehicles, vehicles[1:]))
+
+    assert color_changes(bursty) < color_changes(shuffled) / 2
+
+
+def test_sequenced_pattern_has_one_block_per_color_per_chunk():
+    _, vehicles = generate(1000, seed=5, pattern="sequenced", chunk_size=1000)
+    blocks = 1 + sum(a['color'] != b['color'] for a, b in zip(vehicles, vehicles[1:]))
+
+    assert blocks == len({v['color'] for v in vehicles})
+
+
+def test_iid_mode_is_close_to_distribution():
+    generator, vehicles = generate(20000, seed=9, mode="iid")
+    counts = Counter(v['color'] for v in vehicles)
+
+    for color, probability in zip(generator.colors, generator.probabilities):
+        assert abs(counts[color] / 20000 - probability) < 0.01
+
+
+def test_unknown_mode_or_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        VehicleGenerator(oven_for, mode="nope")
+    with pytest.raises(ValueError):
+        VehicleGenerator(oven_for, pattern="nope")
+
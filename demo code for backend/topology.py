@@ -0,0 +1,145 @@
+# services/topology.py
+import json
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from models.topology import (
+    PlantTopology, OvenSpec, BufferSpec, RouteSpec, ConveyorSpec
+)
+from config import *
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Joint pick assignment searches up to K^K conveyor -> buffer options per tick
+# (about 30 ms at K=6 with 20 full buffers); keep it well inside a tick
+MAX_MAIN_CONVEYORS = 6
+
+
+class RouteCandidate(NamedTuple):
+    buffer_id: str
+    oven: str       # Oven zone the buffer belongs to
+    penalty: int    # Route penalty in seconds
+
+
+class CompiledTopology:
+    """
+    Indexed routing structures built once from a PlantTopology, so
+    per-car decisions only touch the candidate buffers of that color.
+    """
+
+    def __init__(self, spec: PlantTopology):
+        self.spec = spec
+        self.oven_ids: Tuple[str, ...] = tuple(o.oven_id for o in spec.ovens)
+        self.buffer_ids: Tuple[str, ...] = tuple(b.buffer_id for b in spec.buffers)
+        self.conveyor_ids: Tuple[str, ...] = tuple(c.conveyor_id for c in spec.conveyors)
+
+        if not self.oven_ids or not self.buffer_ids or not self.conveyor_ids:
+            raise ValueError("Topology needs at least one oven, buffer and conveyor")
+        if len(self.conveyor_ids) > MAX_MAIN_CONVEYORS:
+            raise ValueError(f"Topology has {len(self.conveyor_ids)} main conveyors (max {MAX_MAIN_CONVEYORS})")
+
+        self.buffers: Dict[str, BufferSpec] = {b.buffer_id: b for b in spec.buffers}
+        self.buffer_oven: Dict[str, str] = {}
+        self.oven_buffers: Dict[str, Tuple[str, ...]] = {}
+        self.oven_capacity: Dict[str, int] = {}
+        for oven_id in self.oven_ids:
+            own = tuple(b.buffer_id for b in spec.buffers if b.oven == oven_id)
+            self.oven_buffers[oven_id] = own
+            self.oven_capacity[oven_id] = sum(self.buffers[b].capacity for b in own)
+        for buffer in spec.buffers:
+            if buffer.oven not in self.oven_buffers:
+                raise ValueError(f"Buffer {buffer.buffer_id} references unknown oven {buffer.oven}")
+            self.buffer_oven[buffer.buffer_id] = buffer.oven
+
+        # Buffers each main conveyor can reach
+        self.conveyor_buffers: Dict[str, Tuple[str, ...]] = {}
+        for conveyor in spec.conveyors:
+            unknown = set(conveyor.buffers) - set(self.buffers)
+            if unknown:
+                raise ValueError(f"Conveyor {conveyor.conveyor_id} references unknown buffers {sorted(unknown)}")
+            self.conveyor_buffers[conveyor.conveyor_id] = tuple(conveyor.buffers) or self.buffer_ids
+
+        self.oven_of_color: Dict[str, str] = {}
+        for oven in spec.ovens:
+            for color in oven.colors:
+                self.oven_of_color[color] = oven.oven_id
+        self.default_oven = spec.default_oven or self.oven_ids[-1]
+        if self.default_oven not in self.oven_buffers:
+            raise ValueError(f"Unknown default oven {self.default_oven}")
+
+        self.overflow_only_ovens = frozenset(
+            o.oven_id for o in spec.ovens if o.cross_oven_overflow_only
+        )
+
+        self.candidates: Dict[str, Tuple[RouteCandidate, ...]] = {}
+        for color, routes in spec.routes.items():
+            compiled = []
+            for route in routes:
+                if route.buffer_id not in self.buffer_oven:
+                    raise ValueError(f"Route {color} -> {route.buffer_id}: unknown buffer")
+                compiled.append(RouteCandidate(
+                    route.buffer_id, self.buffer_oven[route.buffer_id], route.penalty
+                ))
+            self.candidates[color] = tuple(compiled)
+
+        # Plain preference lists (color -> buffer ids), for planners/forecasts
+        self.preferred_buffers: Dict[str, List[str]] = {
+            color: [c.buffer_id for c in candidates]
+            for color, candidates in self.candidates.items()
+        }
+
+    def oven_for(self, color: str) -> str:
+        return self.oven_of_color.get(color, self.default_oven)
+
+    def colors_of(self, oven_id: str) -> List[str]:
+        return [color for color in self.candidates if self.oven_for(color) == oven_id]
+
+
+def default_topology() -> PlantTopology:
+    """The two-oven, nine-lane plant described by the config constants"""
+    return PlantTopology(
+        name="default",
+        ovens=[
+            OvenSpec(oven_id="O1", colors=list(HIGH_VOLUME_COLORS), cross_oven_overflow_only=True),
+            OvenSpec(oven_id="O2", colors=[
+                c for c in COLOR_DISTRIBUTION if c not in HIGH_VOLUME_COLORS
+            ]),
+        ],
+        buffers=[
+            BufferSpec(
+                buffer_id=buffer_id,
+                capacity=capacity,
+                oven=BUFFER_METADATA[buffer_id]["oven"],
+                primary_colors=BUFFER_METADATA[buffer_id]["primary_colors"],
+                is_flex=BUFFER_METADATA[buffer_id]["is_flex"]
+            )
+            for buffer_id, capacity in BUFFER_CAPACITY.items()
+        ],
+        routes={
+            color: [RouteSpec(buffer_id=b) for b in buffers]
+            for color, buffers in PREFERRED_BUFFERS.items()
+        },
+        conveyors=[ConveyorSpec(conveyor_id="M1")],
+        default_oven="O2"
+    )
+
+
+def load_topology(path: Optional[str] = None) -> CompiledTopology:
+    """Compile the topology at path (JSON), or the default plant"""
+    if path:
+        with open(path) as f:
+            spec = PlantTopology(**json.load(f))
+        logger.info(f"🏭 Loaded plant topology '{spec.name}' from {path}")
+    else:
+        spec = default_topology()
+    return CompiledTopology(spec)
+
+# Singleton instance (loaded on first use, not at import)
+_plant: Optional[CompiledTopology] = None
+
+
+def get_plant() -> CompiledTopology:
+    """The plant topology from PLANT_TOPOLOGY_PATH"""
+    global _plant
+    if _plant is None:
+        _plant = load_topology(settings.PLANT_TOPOLOGY_PATH)
+    return _plant
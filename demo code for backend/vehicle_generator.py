@@ -0,0 +1,135 @@
+# services/vehicle_generator.py
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
+from models.vehicle import VehicleStatus
+from config import settings, COLOR_DISTRIBUTION
+import logging
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_MODES = ("exact", "iid")
+ARRIVAL_PATTERNS = ("shuffled", "bursty", "sequenced")
+
+
+class VehicleGenerator:
+    """
+    Seeded, chunked arrival-sequence generator.
+
+    mode "exact" hits the color distribution exactly (largest-remainder
+    rounding) while still streaming: each chunk draws its color counts from
+    what is left with a multivariate hypergeometric sample. mode "iid" draws
+    every car independently from the distribution.
+
+    pattern "shuffled" is uniformly random order, "bursty" groups cars into
+    same-color runs of geometric length (mean burst_mean), and "sequenced"
+    orders each chunk by color, as if pre-sorted upstream.
+    """
+
+    def __init__(self, oven_for: Callable[[str], str],
+                 distribution: Dict[str, float] = COLOR_DISTRIBUTION,
+                 seed: Optional[int] = None, mode: str = "exact",
+                 pattern: str = "shuffled", chunk_size: int = 10000,
+                 burst_mean: float = 6.0):
+        if mode not in GENERATOR_MODES:
+            raise ValueError(f"Unknown generator mode: {mode}")
+        if pattern not in ARRIVAL_PATTERNS:
+            raise ValueError(f"Unknown arrival pattern: {pattern}")
+
+        self.colors = list(distribution.keys())
+        weights = np.array(list(distribution.values()), dtype=np.float64)
+        self.probabilities = weights / weights.sum()
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.mode = mode
+        self.pattern = pattern
+        self.chunk_size = chunk_size
+        self.burst_mean = max(burst_mean, 1.0)
+
+        # Per-color lookups, so per-car work is array indexing only
+        self._ovens = [oven_for(color) for color in self.colors]
+        self._priorities = [int(color[1:]) for color in self.colors]
+
+    def exact_counts(self, num_vehicles: int) -> np.ndarray:
+        """Per-color counts summing to num_vehicles (largest remainder)"""
+        quotas = self.probabilities * num_vehicles
+        counts = np.floor(quotas).astype(np.int64)
+        remainder = num_vehicles - int(counts.sum())
+        if remainder > 0:
+            # Largest fractional parts first, larger shares win ties
+            order = np.lexsort((-self.probabilities, -(quotas - counts)))
+            counts[order[:remainder]] += 1
+        return counts
+
+    def _bursts(self, counts: np.ndarray) -> np.ndarray:
+        """Rearrange a chunk into same-color runs of geometric length"""
+        p = 1.0 / self.burst_mean
+        run_colors = []
+        run_lengths = []
+        for index in np.flatnonzero(counts):
+            count = int(counts[index])
+            lengths = self.rng.geometric(p, size=int(count * p) + 1)
+            while lengths.sum() < count:
+                lengths = np.concatenate([lengths, self.rng.geometric(p, size=int(count * p) + 1)])
+            ends = np.minimum(np.cumsum(lengths), count)
+            ends = ends[:np.searchsorted(ends, count) + 1]
+            run_lengths.append(np.diff(ends, prepend=0))
+            run_colors.append(np.full(len(ends), index))
+        run_colors = np.concatenate(run_colors)
+        run_lengths = np.concatenate(run_lengths)
+        order = self.rng.permutation(len(run_colors))
+        return np.repeat(run_colors[order], run_lengths[order])
+
+    def _chunk_colors(self, size: int, remaining: Optional[np.ndarray]) -> np.ndarray:
+        """Color indices for the next `size` arrivals"""
+        if self.mode == "exact":
+            counts = self.rng.multivariate_hypergeometric(remaining, size)
+            remaining -= counts
+        else:
+            counts = np.bincount(
+                self.rng.choice(len(self.colors), size=size, p=self.probabilities),
+                minlength=len(self.colors)
+            )
+
+        if self.pattern == "bursty":
+            return self._bursts(counts)
+        if self.pattern == "sequenced":
+            block_order = self.rng.permutation(len(self.colors))
+            return np.repeat(block_order, counts[block_order])
+        return self.rng.permutation(np.repeat(np.arange(len(self.colors)), counts))
+
+    def iter_batches(self, num_vehicles: int, start_id: int = 1) -> Iterator[List[Dict]]:
+        """Yield vehicle dicts chunk by chunk; never holds the whole sequence"""
+        remaining = self.exact_counts(num_vehicles) if self.mode == "exact" else None
+        produced = 0
+
+        while produced < num_vehicles:
+            size = min(self.chunk_size, num_vehicles - produced)
+            color_index = self._chunk_colors(size, remaining).tolist()
+            first_id = start_id + produced
+
+            yield [
+                {
+                    'car_id': first_id + i,
+                    'color': self.colors[c],
+                    'oven': self._ovens[c],
+                    'buffer': None,
+                    'status': VehicleStatus.WAITING.value,
+                    'batch_id': None,
+                    'priority': self._priorities[c]
+                }
+                for i, c in enumerate(color_index)
+            ]
+            produced += size
+
+
+def make_generator(oven_for: Callable[[str], str], seed: Optional[int] = None,
+                   mode: Optional[str] = None, pattern: Optional[str] = None) -> VehicleGenerator:
+    """Generator configured from settings, with optional per-call overrides"""
+    return VehicleGenerator(
+        oven_for=oven_for,
+        seed=seed if seed is not None else settings.GENERATOR_SEED,
+        mode=mode or settings.GENERATOR_MODE,
+        pattern=pattern or settings.ARRIVAL_PATTERN,
+        chunk_size=settings.GENERATOR_CHUNK_SIZE,
+        burst_mean=settings.BURST_MEAN_LENGTH
+    )